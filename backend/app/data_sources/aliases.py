@@ -0,0 +1,75 @@
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Tuple
+
+from app.data_sources.osv_cve_data_source import OsvCveDataSource
+from database.async_db import AsyncDb
+from utils import run_sync
+
+
+@dataclass(frozen=True)
+class AliasGroup:
+    """
+    The ids a vulnerability is known by across databases (e.g., a GO advisory
+    and its CVE and GHSA aliases), with the canonical id first. The
+    canonical id keys the evaluations of the vulnerability (`ssvc_results`,
+    `llm_evaluator_cache`), so evaluating any of its ids reuses them.
+    """
+    ids: Tuple[str, ...]
+
+    @property
+    def canonical(self) -> str:
+        return self.ids[0]
+
+    @classmethod
+    def of(cls, cve_id: str, aliases: Iterable[str]) -> 'AliasGroup':
+        """
+        A CVE id is its own canonical id. Any other id is canonicalized to its
+        (lowest) CVE alias, or to its GHSA alias, or is kept if it has neither.
+        """
+        aliases = set(aliases) - {cve_id}
+        canonical = cve_id
+        if not cve_id.startswith('CVE-'):
+            for prefix in ('CVE-', 'GHSA-'):
+                candidates = sorted(x for x in aliases if x.startswith(prefix))
+                if len(candidates) > 0:
+                    canonical = candidates[0]
+                    break
+
+        return cls((canonical,) + tuple(sorted((aliases | {cve_id}) - {canonical})))
+
+
+def resolve_aliases(cve_ids: List[str]) -> Dict[str, AliasGroup]:
+    return run_sync(resolve_aliases_async(cve_ids))
+
+
+async def resolve_aliases_async(cve_ids: List[str]) -> Dict[str, AliasGroup]:
+    """
+    The alias group of every id, from the `aliases` of the OSV entries in
+    `osv_aliases` (see `OsvArchiveImporter` and `OsvCveDataSource`). Non-CVE
+    ids that were never seen are looked up in OSV, whose entry lists their
+    aliases, and are recorded for the next time.
+    """
+    cve_ids = list(dict.fromkeys(x.upper() for x in cve_ids))
+    if len(cve_ids) == 0:
+        return dict()
+
+    known: Dict[str, set] = {x: {x} for x in cve_ids}
+
+    async with AsyncDb() as db:
+        for row in await db.all(
+                """
+                SELECT a.alias AS cve_id, b.alias
+                FROM osv_aliases a
+                         JOIN osv_aliases b ON b.osv_id = a.osv_id
+                WHERE a.alias = ANY(%s)
+                """,
+                (cve_ids,)):
+            known[row['cve_id']].add(row['alias'])
+
+    unresolved = [x for x, aliases in known.items() if len(aliases) == 1 and not x.startswith('CVE-')]
+    if len(unresolved) > 0:
+        for cve_id, entry in (await OsvCveDataSource().load_many_async(unresolved)).items():
+            if entry is not None:
+                known[cve_id].update(x.upper() for x in [entry['id']] + entry.get('aliases', []))
+
+    return {x: AliasGroup.of(x, aliases) for x, aliases in known.items()}
@@ -1,11 +1,22 @@
+import asyncio
+from datetime import timedelta
 from typing import Optional, List
 
-import requests
-
 from app.data_sources.cve_data_source import CveDataSource
+from app.data_sources.kev_catalog import kev_catalog
+from app.data_sources.presence_index import MemberPresenceIndex
+
+
+async def _kev_cve_ids() -> List[str]:
+    return await asyncio.to_thread(kev_catalog.cve_ids)
 
 
 class CisaKevCveDataSource(CveDataSource):
+    # Rebuilding only copies the ids of the in-memory catalog, so it is done
+    # often to keep up with the refreshes of the catalog.
+    _presence_index = MemberPresenceIndex('kev', _kev_cve_ids, refresh_interval=300)
+    _id_prefixes = ('CVE-',)
+
     def __init__(self):
         super().__init__()
 
@@ -13,11 +24,14 @@ class CisaKevCveDataSource(CveDataSource):
     def name() -> str:
         return 'kev'
 
-    def _load_data(self, cve_id: str) -> Optional[dict]:
-        url = 'https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json'
-        response = requests.get(url)
-        db = response.json()
+    async def _load_data(self, cve_id: str) -> Optional[dict]:
+        # The lookup is in memory, but may block on a refresh of the catalog.
+        return await asyncio.to_thread(kev_catalog.get, cve_id)
+
+    def _ttl(self) -> Optional[timedelta]:
+        # Revalidating only re-reads the catalog, keep up with its refreshes.
+        return timedelta(hours=1)
 
-        vulnerabilities: List[dict] = db['vulnerabilities']
-        cve_data = next((x for x in vulnerabilities if x['cveID'] == cve_id), None)
-        return cve_data
+    def _miss_ttl(self) -> Optional[timedelta]:
+        # The in-memory catalog already answers misses without a round trip.
+        return None
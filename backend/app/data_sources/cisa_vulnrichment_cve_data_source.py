@@ -1,11 +1,24 @@
+import asyncio
 import base64
 import json
+import logging
 import os
-from typing import Optional, List
+import time
+from datetime import timedelta
+from typing import Optional, List, Dict, Tuple
 
-import requests
+from app.data_sources.cve_data_source import CveDataSource, MAX_RATE_LIMIT_WAIT
+from app.data_sources.presence_index import MemberPresenceIndex
+from database.async_db import AsyncDb
+from utils import async_http_get
 
-from app.data_sources.cve_data_source import CveDataSource
+_REPO_CONTENTS_URL = 'https://api.github.com/repos/cisagov/vulnrichment/contents'
+_REPO_TREE_URL = 'https://api.github.com/repos/cisagov/vulnrichment/git/trees/develop?recursive=1'
+
+# The root and year directory listings of the repository, shared by all the
+# cves, by url: (expiry, listing). Refreshed as often as the presence index.
+_LISTING_TTL = 6 * 3600
+_listings: Dict[str, Tuple[float, asyncio.Future]] = dict()
 
 
 def _is_int(s):
@@ -54,46 +67,130 @@ def extract_data_from_vulnrichment_json(cve_json: dict, cve_url: str) -> Optiona
             return result
 
 
+def vulnrichment_cve_url(year: str, group: str, cve_id: str) -> str:
+    return f'{_REPO_CONTENTS_URL}/{year}/{group}/{cve_id}.json'
+
+
+async def _list_directory(url: str, headers: dict, logger: logging.Logger) -> List[dict]:
+    """
+    A directory listing of the repository, fetched once per `_LISTING_TTL`
+    on the running event loop; concurrent callers share the request, and a
+    failed request is not kept.
+    """
+    loop = asyncio.get_running_loop()
+    cached = _listings.get(url)
+
+    if cached is None or cached[0] <= time.monotonic() or cached[1].get_loop() is not loop:
+        future = asyncio.ensure_future(_fetch_listing(url, headers, logger))
+        cached = _listings[url] = (time.monotonic() + _LISTING_TTL, future)
+
+        def forget_failure(done: asyncio.Future):
+            if (done.cancelled() or done.exception() is not None) and _listings.get(url, (None, None))[1] is done:
+                del _listings[url]
+
+        future.add_done_callback(forget_failure)
+
+    # Shielded, so a caller that times out does not cancel the request of the others.
+    return await asyncio.shield(cached[1])
+
+
+async def _fetch_listing(url: str, headers: dict, logger: logging.Logger) -> List[dict]:
+    response = await async_http_get(url, headers=headers, logger=logger, max_rate_limit_wait=MAX_RATE_LIMIT_WAIT)
+    response.raise_for_status()
+    return await response.json()
+
+
+async def _vulnrichment_cve_ids() -> Optional[List[str]]:
+    """
+    The cves listed in the tree of the repository, with a single api call
+    (None if GitHub truncated the listing). None once an archive was
+    imported: a lookup in the local mirror is as cheap as the index, and
+    sees the files imported since the last refresh.
+    """
+    if await CisaVulnrichmentCveDataSource._mirror_available():
+        return None
+
+    headers = {
+        'Authorization': f'Bearer {os.getenv("GITHUB_PAT")}'
+    } if os.getenv('GITHUB_PAT') is not None else {}
+
+    response = await async_http_get(_REPO_TREE_URL, headers=headers, timeout=120)
+    response.raise_for_status()
+    tree = await response.json()
+
+    if tree.get('truncated', False):
+        return None
+
+    return [x['path'].split('/')[-1][:-len('.json')] for x in tree['tree']
+            if x['type'] == 'blob' and x['path'].split('/')[-1].startswith('CVE-') and x['path'].endswith('.json')]
+
+
 class CisaVulnrichmentCveDataSource(CveDataSource):
+    _has_mirror = False
+
+    # The repository is updated a few times a day.
+    _presence_index = MemberPresenceIndex('vulnrichment', _vulnrichment_cve_ids, refresh_interval=6 * 3600)
+    _id_prefixes = ('CVE-',)
+
     @staticmethod
     def name() -> str:
         return 'vulnrichment'
 
-    def _load_data(self, cve_id: str) -> Optional[dict]:
+    async def _load_data(self, cve_id: str) -> Optional[dict]:
         tokens = cve_id.split('-')
         if len(tokens) != 3:
             return None
 
+        # Once an archive has been imported (see `VulnrichmentArchiveImporter`)
+        # the local mirror is authoritative and the GitHub api is never called.
+        if await self._mirror_available():
+            async with AsyncDb() as db:
+                mirrored = await db.first('SELECT data FROM vulnrichment_index WHERE cve_id = %s', (cve_id,))
+
+            return None if mirrored is None or mirrored['data'] is None else json.loads(mirrored['data'])
+
         [_, year, sub_id] = cve_id.split('-')
 
-        base_url = 'https://api.github.com'
-        owner = 'cisagov'
-        repo = 'vulnrichment'
         headers = {
             'Authorization': f'Bearer {os.getenv("GITHUB_PAT")}'
         } if os.getenv('GITHUB_PAT') is not None else {}
 
         # Load the available years
-        repo_root_url = f'{base_url}/repos/{owner}/{repo}/contents'
-        top_level = requests.get(repo_root_url, headers=headers).json()
+        repo_root_url = _REPO_CONTENTS_URL
+        top_level = await _list_directory(repo_root_url, headers, self._logger)
         years = [x['name'] for x in top_level if x['type'] == 'dir' and _is_int(x['name'])]
         if year not in years:
             return None
 
         # Load the available groups in that year
         year_url = f'{repo_root_url}/{year}'
-        year_level = requests.get(year_url, headers=headers).json()
+        year_level = await _list_directory(year_url, headers, self._logger)
         group = next((x for x in year_level if sub_id.startswith(x['name'].replace('x', ''))), None)
         if group is None:
             return None
 
         # Load the cve data from the group
-        cve_url = f'{year_url}/{group["name"]}/{cve_id}.json'
-        cve_response = requests.get(cve_url, headers=headers)
+        cve_url = vulnrichment_cve_url(year, group['name'], cve_id)
+        cve_response = await async_http_get(cve_url, headers=headers, logger=self._logger,
+                                            max_rate_limit_wait=MAX_RATE_LIMIT_WAIT)
 
-        if 400 <= cve_response.status_code:
+        if cve_response.status == 404:
             return None
 
-        cve_level = cve_response.json()
+        cve_response.raise_for_status()
+
+        cve_level = await cve_response.json()
         cve_json = json.loads(base64.b64decode(cve_level['content']).decode('utf-8'))
         return extract_data_from_vulnrichment_json(cve_json, cve_url)
+
+    def _ttl(self) -> Optional[timedelta]:
+        # Once mirrored, every import rewrites the files that changed (see `VulnrichmentArchiveImporter`).
+        return None if self._has_mirror else super()._ttl()
+
+    @classmethod
+    async def _mirror_available(cls) -> bool:
+        if not cls._has_mirror:
+            async with AsyncDb() as db:
+                cls._has_mirror = await db.first('SELECT 1 FROM vulnrichment_index LIMIT 1') is not None
+
+        return cls._has_mirror
@@ -1,49 +1,178 @@
+import asyncio
 import json
 import logging
+import os
 from abc import abstractmethod
-from typing import Optional
+from datetime import timedelta
+from typing import Optional, Dict, List, Tuple, Set, Sequence
 
-from database.db import Db
+from app.data_sources.presence_index import PresenceIndex
+from app.data_sources.projections import projection_enabled, project
+from database.async_db import AsyncDb
+from single_flight import SingleFlight
+from utils import run_sync
+
+# How long a fetch waits for the rate limit of an api before failing (the
+# failure is not remembered as a miss), so that a bulk load does not stall
+# for hours on an exhausted quota.
+MAX_RATE_LIMIT_WAIT = float(os.getenv('DATA_SOURCE_MAX_RATE_LIMIT_WAIT', 60))
 
 
 class CveDataSource:
+    """
+    The loading logic is asyncio-native (`load_async`/`load_many_async`),
+    so thousands of cves can be fetched over a single event loop. `load` and
+    `load_many` are thin wrappers that run them on the process-wide
+    background loop (see `utils.run_sync`).
+
+    Cached entries older than the source's `_ttl` are stale: they are still
+    served immediately, while a background task refetches and replaces them
+    (stale-while-revalidate). `reload` refetches synchronously, but the
+    cached entry is only replaced once the fetch succeeded.
+
+    Sources with a `_presence_index` answer the uncached cves the index
+    knows they cannot have as missing, rather than fetching them, unless
+    reloading. The cache is always read first, so a cve the source added
+    after the last refresh of the index is served once it was cached (e.g.,
+    by an importer).
+    """
+
+    # Shared by all sources, the source name is part of the key.
+    _single_flight = SingleFlight()
+
+    # The (source, cve id) pairs being revalidated, and the tasks doing it
+    # (the event loop only keeps weak references to its tasks).
+    _revalidating: Set[Tuple[str, str]] = set()
+    _revalidation_tasks: Set[asyncio.Task] = set()
+
+    # Process-wide, set by the sources that can tell which cves they do not have.
+    _presence_index: Optional[PresenceIndex] = None
+
+    # The forms of id the source is keyed by, e.g., `CVE-`, or None for any.
+    _id_prefixes: Optional[Tuple[str, ...]] = None
+
     def __init__(self):
         self._source_name = self.__class__.name()
 
         self._logger = logging.getLogger(self.__class__.__name__)
 
     def load(self, cve_id: str, reload: bool = False) -> Optional[dict]:
+        return run_sync(self.load_async(cve_id, reload))
+
+    def load_many(self, cve_ids: List[str], reload: bool = False, max_workers: int = 16) -> Dict[str, Optional[dict]]:
+        return run_sync(self.load_many_async(cve_ids, reload, concurrency=max_workers))
+
+    async def load_async(self, cve_id: str, reload: bool = False) -> Optional[dict]:
+        """
+        Concurrent loads of the same cve from the same source (e.g., by the
+        aggregators of a single evaluation) share one lookup and fetch.
+        """
         cve_id = cve_id.upper()
+        return await self._single_flight.do_async((self._source_name, cve_id, reload),
+                                                  lambda: self._load_async(cve_id, reload))
+
+    async def load_many_async(
+            self,
+            cve_ids: List[str],
+            reload: bool = False,
+            concurrency: int = 16) -> Dict[str, Optional[dict]]:
+        """
+        Loads many cves at once: cached cves are read with a single query, the
+        rest are fetched from the data source, at most `concurrency` at a time,
+        and written back with a single multi-row insert. A cve that could not
+        be fetched because of an error maps to None but, unlike a miss, is not
+        remembered.
+        """
+        cve_ids = list(dict.fromkeys(x.upper() for x in cve_ids))
+        if len(cve_ids) == 0:
+            return dict()
+
+        miss_ttl = self._miss_ttl()
+        results: Dict[str, Optional[dict]] = dict()
+
         if not reload:
-            with Db() as db:
-                cached_data = db.first('SELECT * FROM cve_cache WHERE cve_id = %s AND source = %s',
-                                       (cve_id, self._source_name))
+            stale = []
 
-            if cached_data is not None:
-                return json.loads(cached_data['data'])
+            async with AsyncDb() as db:
+                for row in await db.all(
+                        f"""
+                        SELECT cve_id, data, {self._stale_column()} AS stale
+                        FROM cve_cache WHERE cve_id = ANY(%s) AND source = %s
+                        """,
+                        self._with_ttl((cve_ids, self._source_name))):
+                    results[row['cve_id']] = json.loads(row['data'])
+                    if row['stale']:
+                        stale.append(row['cve_id'])
 
-            self._logger.info(f'No cached data was found for cve {cve_id}, loading from data source.')
+                uncached = [x for x in cve_ids if x not in results]
+                if len(uncached) > 0 and miss_ttl is not None:
+                    for row in await db.all(
+                            """
+                            SELECT cve_id FROM cve_cache_misses
+                            WHERE cve_id = ANY(%s) AND source = %s
+                              AND modified_time > CURRENT_TIMESTAMP - %s::interval
+                            """,
+                            (uncached, self._source_name, miss_ttl)):
+                        results[row['cve_id']] = None
 
-        else:
-            with Db() as db:
-                db.execute('DELETE FROM cve_cache WHERE cve_id = %s AND source = %s',
-                           (cve_id, self._source_name))
+            self._revalidate_in_background(stale, concurrency)
 
-        cve_data = self._load_data(cve_id)
+        pending = [x for x in cve_ids if x not in results]
 
-        if cve_data is None:
-            return None
+        present: Dict[str, Optional[bool]] = dict()
+        if not reload and self._presence_index is not None:
+            present = {x: await self._presence_index.lookup(x) for x in pending}
+            results.update({x: None for x in pending if present[x] is False})
+            pending = [x for x in pending if present[x] is not False]
 
-        # cache the data
-        with Db() as db:
-            db.execute(
-                """
-                INSERT INTO cve_cache(cve_id, source, data) VALUES (%s, %s, %s) 
-                ON CONFLICT (cve_id, source) DO NOTHING;
-                """,
-                (cve_id, self._source_name, json.dumps(cve_data)))
+        if len(pending) == 0:
+            return results
 
-        return cve_data
+        self._logger.info(f'{len(cve_ids) - len(pending)}/{len(cve_ids)} cves were cached, '
+                          f'loading {len(pending)} from data source.')
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(cve_id: str) -> Tuple[str, Optional[dict], bool]:
+            async with semaphore:
+                try:
+                    return cve_id, await self._fetch(cve_id), True
+                except Exception as e:
+                    self._logger.error(f'Failed to load cve {cve_id}. {e}')
+                    return cve_id, None, False
+
+        found: Dict[str, dict] = dict()
+        missing: List[str] = []
+
+        for cve_id, cve_data, succeeded in await asyncio.gather(*[fetch(x) for x in pending]):
+            results[cve_id] = cve_data
+            if cve_data is not None:
+                found[cve_id] = cve_data
+            elif succeeded:
+                missing.append(cve_id)
+                if present.get(cve_id):
+                    self._presence_index.record_false_positive()
+
+        await self._store(found, missing, replace=reload)
+        return results
+
+    def source_id(self, aliases: Sequence[str]) -> Optional[str]:
+        """
+        The id to look the vulnerability up by in this source, given all its
+        aliases with the canonical id first (see `AliasGroup`), or None if
+        the source is not keyed by any of them.
+        """
+        if self._id_prefixes is None:
+            return aliases[0]
+
+        return next((x for x in aliases if x.startswith(self._id_prefixes)), None)
+
+    def presence_index_stats(self) -> Optional[Dict]:
+        return None if self._presence_index is None else self._presence_index.stats()
+
+    @staticmethod
+    def single_flight_stats() -> Dict[str, int]:
+        return CveDataSource._single_flight.stats()
 
     @staticmethod
     @abstractmethod
@@ -51,5 +180,155 @@ class CveDataSource:
         pass
 
     @abstractmethod
-    def _load_data(self, cve_id: str) -> Optional[dict]:
+    async def _load_data(self, cve_id: str) -> Optional[dict]:
+        """
+        Loads the cve from the data source. Returns None only when the source
+        does not have the cve; transient failures (rate limits, server errors,
+        timeouts) should raise, so they are not remembered as misses.
+        """
         pass
+
+    async def _fetch(self, cve_id: str) -> Optional[dict]:
+        cve_data = await self._load_data(cve_id)
+        return cve_data if cve_data is None or not projection_enabled() else project(self._source_name, cve_data)
+
+    def _ttl(self) -> Optional[timedelta]:
+        """
+        How long a cached entry is fresh, based on its `modified_time`.
+        Returning None keeps entries fresh forever.
+        """
+        return timedelta(days=1)
+
+    def _miss_ttl(self) -> Optional[timedelta]:
+        """
+        How long a cve that the source does not have is remembered as missing.
+        Returning None disables negative caching for the source.
+        """
+        return timedelta(days=1)
+
+    async def _load_async(self, cve_id: str, reload: bool) -> Optional[dict]:
+        miss_ttl = self._miss_ttl()
+
+        if not reload:
+            async with AsyncDb() as db:
+                cached_data = await db.first(
+                    f'SELECT data, {self._stale_column()} AS stale FROM cve_cache WHERE cve_id = %s AND source = %s',
+                    self._with_ttl((cve_id, self._source_name)))
+
+                cached_miss = None
+                if cached_data is None and miss_ttl is not None:
+                    cached_miss = await db.first(
+                        """
+                        SELECT 1 FROM cve_cache_misses
+                        WHERE cve_id = %s AND source = %s AND modified_time > CURRENT_TIMESTAMP - %s::interval
+                        """,
+                        (cve_id, self._source_name, miss_ttl))
+
+            if cached_data is not None:
+                if cached_data['stale']:
+                    self._revalidate_in_background([cve_id])
+                return json.loads(cached_data['data'])
+
+            if cached_miss is not None:
+                return None
+
+            self._logger.info(f'No cached data was found for cve {cve_id}, loading from data source.')
+
+        present = None
+        if not reload and self._presence_index is not None:
+            present = await self._presence_index.lookup(cve_id)
+            if present is False:
+                return None
+
+        cve_data = await self._fetch(cve_id)
+
+        if cve_data is None:
+            if present:
+                self._presence_index.record_false_positive()
+            await self._store({}, [cve_id], replace=reload)
+            return None
+
+        await self._store({cve_id: cve_data}, [], replace=reload)
+        return cve_data
+
+    def _stale_column(self) -> str:
+        return 'FALSE' if self._ttl() is None else 'modified_time < CURRENT_TIMESTAMP - %s::interval'
+
+    def _with_ttl(self, data: Tuple) -> Tuple:
+        """Prepends the ttl to the parameters of a query that selects `_stale_column`."""
+        return data if self._ttl() is None else (self._ttl(),) + data
+
+    def _revalidate_in_background(self, cve_ids: List[str], concurrency: int = 16):
+        cve_ids = [x for x in cve_ids if (self._source_name, x) not in self._revalidating]
+        if len(cve_ids) == 0:
+            return
+
+        self._logger.info(f'Serving {len(cve_ids)} stale cves, revalidating them in the background.')
+
+        self._revalidating.update((self._source_name, x) for x in cve_ids)
+        task = asyncio.ensure_future(self._revalidate(cve_ids, concurrency))
+        self._revalidation_tasks.add(task)
+        task.add_done_callback(self._revalidation_tasks.discard)
+
+    async def _revalidate(self, cve_ids: List[str], concurrency: int):
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(cve_id: str) -> Tuple[str, Optional[dict], bool]:
+            async with semaphore:
+                try:
+                    return cve_id, await self._fetch(cve_id), True
+                except Exception as e:
+                    # The stale entry is kept, and revalidated again on the next access.
+                    self._logger.error(f'Failed to revalidate cve {cve_id}. {e}')
+                    return cve_id, None, False
+
+        try:
+            fetched = await asyncio.gather(*[fetch(x) for x in cve_ids])
+            await self._store({cve_id: data for cve_id, data, _ in fetched if data is not None},
+                              [cve_id for cve_id, data, succeeded in fetched if data is None and succeeded],
+                              replace=True)
+        except Exception as e:
+            self._logger.error(f'Failed to store {len(cve_ids)} revalidated cves. {e}')
+        finally:
+            self._revalidating.difference_update((self._source_name, x) for x in cve_ids)
+
+    async def _index(self, db: AsyncDb, found: Dict[str, dict], removed: List[str]):
+        """
+        Keeps the tables derived from the source's payloads in sync with
+        `cve_cache`, in the same connection that stored `found` and removed
+        the entries of `removed`.
+        """
+        pass
+
+    async def _store(self, found: Dict[str, dict], missing: List[str], replace: bool = False):
+        """
+        Caches loaded cves, replacing (and refreshing the `modified_time` of)
+        previously cached entries, and remembers the ones the source does not
+        have, so that they are not requested again until the miss expires.
+        With `replace` (a reload or a revalidation), previously cached entries
+        of the missing cves and previously remembered misses of the found cves
+        are removed as well.
+        """
+        remember_missing = len(missing) > 0 and self._miss_ttl() is not None
+        if len(found) == 0 and not remember_missing and not (replace and len(missing) > 0):
+            return
+
+        async with AsyncDb() as db:
+            await db.bulk_upsert('cve_cache', ['cve_id', 'source', 'data'],
+                                 [(cve_id, self._source_name, json.dumps(data)) for cve_id, data in found.items()],
+                                 ['cve_id', 'source'], 'DO UPDATE SET data = EXCLUDED.data')
+
+            if replace and len(found) > 0:
+                await db.execute('DELETE FROM cve_cache_misses WHERE cve_id = ANY(%s) AND source = %s',
+                                 (list(found), self._source_name))
+
+            if replace and len(missing) > 0:
+                await db.execute('DELETE FROM cve_cache WHERE cve_id = ANY(%s) AND source = %s',
+                                 (missing, self._source_name))
+
+            await self._index(db, found, missing if replace else [])
+
+            if remember_missing:
+                await db.bulk_upsert('cve_cache_misses', ['cve_id', 'source'],
+                                     [(cve_id, self._source_name) for cve_id in missing],
+                                     ['cve_id', 'source'], 'DO UPDATE SET modified_time = CURRENT_TIMESTAMP')
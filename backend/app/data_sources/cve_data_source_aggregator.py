@@ -1,4 +1,8 @@
-from typing import List
+import asyncio
+import logging
+import os
+import time
+from typing import List, Optional, Tuple, Dict, Union, Sequence
 
 from app.data_sources.cisa_kev_cve_data_source import CisaKevCveDataSource
 from app.data_sources.cisa_vulnrichment_cve_data_source import CisaVulnrichmentCveDataSource
@@ -6,10 +10,11 @@ from app.data_sources.cve_data_source import CveDataSource
 from app.data_sources.nist_cve_data_source import NistCveDataSource
 from app.data_sources.osv_cve_data_source import OsvCveDataSource
 from app.data_sources.vulners_cve_data_source import VulnersCveDataSource
+from utils import run_sync
 
 
 class CveDataSourceAggregator:
-    def __init__(self):
+    def __init__(self, timeout: Optional[float] = None):
         self._data_sources: List[CveDataSource] = [
             # VulnersCveDataSource(),
             NistCveDataSource(),
@@ -18,15 +23,145 @@ class CveDataSourceAggregator:
             OsvCveDataSource(),
         ]
 
-    def load(self, cve_id: str) -> dict:
-        aggregated_data = dict()
+        self._timeout = timeout if timeout is not None else float(os.getenv('CVE_DATA_SOURCE_TIMEOUT', 30))
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def load(self, cve_id: str, reload: bool = False, aliases: Optional[Sequence[str]] = None) -> dict:
+        return run_sync(self.load_async(cve_id, reload, aliases))
+
+    def load_many(self, cve_ids: List[str], aliases: Optional[Dict[str, Sequence[str]]] = None) -> Dict[str, dict]:
+        return run_sync(self.load_many_async(cve_ids, aliases))
+
+    def presence_index_stats(self) -> Dict[str, dict]:
+        """The lookups avoided by, and the false positives of, the presence index of every source that has one."""
+        stats = {x.name(): x.presence_index_stats() for x in self._data_sources}
+        return {name: x for name, x in stats.items() if x is not None}
+
+    async def load_async(self, cve_id: str, reload: bool = False, aliases: Optional[Sequence[str]] = None) -> dict:
+        """
+        Loads the cve from all data sources concurrently and returns whatever
+        arrived within the timeout. Sources that had no data, failed or timed
+        out are listed under `unavailable_data_sources`. With the `aliases`
+        of the cve (canonical id first, see `AliasGroup`), every source is
+        queried with the form of id it is keyed by.
+        """
+        start = time.perf_counter()
+        aliases = aliases or [cve_id.upper()]
+
+        tasks = dict()
+        for data_source in self._data_sources:
+            source_id = data_source.source_id(aliases)
+            if source_id is not None:
+                tasks[data_source] = asyncio.ensure_future(_timed_load(data_source, source_id, reload))
+
+        not_done = set()
+        if len(tasks) > 0:
+            _, not_done = await asyncio.wait(tasks.values(), timeout=self._timeout)
+
+        timings = dict()
+        loaded = dict()
 
         for data_source in self._data_sources:
-            data = data_source.load(cve_id)
+            name = data_source.name()
+            task = tasks.get(data_source)
+
+            if task is None:
+                loaded[name] = None
+                continue
 
-            if data is None:
+            if task in not_done:
+                # The source keeps loading in the background, so its result is cached for the next caller.
+                task.add_done_callback(_consume_exception)
+                loaded[name] = 'timed_out'
                 continue
 
-            aggregated_data[f'{data_source.name()}_data_source'] = data
+            try:
+                loaded[name], timings[name] = task.result()
+            except Exception as e:
+                self._logger.error(f'Failed to load cve {cve_id} from {name}. {e}')
+                loaded[name] = 'failed'
+
+        aggregated_data = _aggregate(loaded)
+
+        self._logger.info(
+            f'Loaded cve {cve_id} in {time.perf_counter() - start:.3f}s '
+            f'(per source: {", ".join(f"{k}={v:.3f}s" for k, v in timings.items())}; '
+            f'unavailable: {aggregated_data.get("unavailable_data_sources", {})})')
 
         return aggregated_data
+
+    async def load_many_async(
+            self,
+            cve_ids: List[str],
+            aliases: Optional[Dict[str, Sequence[str]]] = None) -> Dict[str, dict]:
+        """
+        Bulk version of `load_async`: every source resolves its cached cves
+        with a single query and fetches the rest concurrently (see
+        `CveDataSource.load_many_async`), and the sources run in parallel.
+        `aliases` maps a cve to its aliases, as in `load_async`.
+        """
+        cve_ids = list(dict.fromkeys(x.upper() for x in cve_ids))
+        aliases = aliases or dict()
+
+        # The id every source is queried with, per cve.
+        source_ids = {
+            data_source.name(): {
+                cve_id: data_source.source_id(aliases.get(cve_id) or [cve_id]) for cve_id in cve_ids
+            }
+            for data_source in self._data_sources
+        }
+
+        results = await asyncio.gather(
+            *[x.load_many_async([y for y in source_ids[x.name()].values() if y is not None])
+              for x in self._data_sources],
+            return_exceptions=True)
+
+        loaded_by_source = dict()
+        for data_source, result in zip(self._data_sources, results):
+            if isinstance(result, Exception):
+                self._logger.error(f'Failed to load {len(cve_ids)} cves from {data_source.name()}. {result}')
+                loaded_by_source[data_source.name()] = 'failed'
+            else:
+                loaded_by_source[data_source.name()] = result
+
+        return {
+            cve_id: _aggregate({
+                name: loaded if loaded == 'failed' else loaded.get(source_ids[name][cve_id])
+                for name, loaded in loaded_by_source.items()
+            })
+            for cve_id in cve_ids
+        }
+
+
+def _aggregate(loaded: Dict[str, Union[Optional[dict], str]]) -> dict:
+    """
+    Builds the aggregated payload from the data loaded from every source,
+    where a string marks a source that failed or timed out.
+    """
+    aggregated_data = dict()
+    unavailable = dict()
+
+    for name, data in loaded.items():
+        if isinstance(data, str):
+            unavailable[name] = data
+        elif data is None:
+            unavailable[name] = 'missing'
+        else:
+            aggregated_data[f'{name}_data_source'] = data
+
+    if len(unavailable) > 0:
+        aggregated_data['unavailable_data_sources'] = unavailable
+
+    return aggregated_data
+
+
+async def _timed_load(data_source: CveDataSource, cve_id: str, reload: bool) -> Tuple[Optional[dict], float]:
+    start = time.perf_counter()
+    data = await data_source.load_async(cve_id, reload)
+    return data, time.perf_counter() - start
+
+
+def _consume_exception(task: asyncio.Future):
+    if not task.cancelled():
+        task.exception()
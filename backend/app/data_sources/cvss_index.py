@@ -0,0 +1,93 @@
+import json
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from database.db import Db
+from ssvc.utils import CVSS_METRICS, extract_cvss_from_nist, parse_cvss
+
+# The metrics stored in their own columns of `cve_cvss`, by their standardized name.
+CVSS_COLUMNS = list(CVSS_METRICS)
+
+# The columns of a `cve_cvss` row, as returned by `cvss_row`, and how a row
+# replaces the existing one (see `Db.bulk_upsert`).
+CVSS_ROW_COLUMNS = ['cve_id', 'version', 'vector'] + [x.lower() for x in CVSS_COLUMNS]
+CVSS_ON_CONFLICT = f"""
+    DO UPDATE SET
+        version = EXCLUDED.version,
+        vector = EXCLUDED.vector,
+        {', '.join(f'{x.lower()} = EXCLUDED.{x.lower()}' for x in CVSS_COLUMNS)}
+    WHERE cve_cvss.vector IS DISTINCT FROM EXCLUDED.vector
+"""
+
+
+def cvss_row(cve_id: str, nist_data: dict) -> Optional[Tuple]:
+    """
+    The `cve_cvss` row of a nist record: the vector chosen by
+    `extract_cvss_from_nist` and its parsed metrics, or None if the record
+    has no cvss vector.
+    """
+    vector = extract_cvss_from_nist(nist_data)
+    if vector is None:
+        return None
+
+    try:
+        cvss = parse_cvss(vector)
+    except ValueError:
+        logging.getLogger('cvss_index').warning(f'Could not parse the cvss vector {vector} of {cve_id}.')
+        return None
+
+    return (cve_id, cvss.version, vector) + tuple(getattr(cvss, x.lower()) for x in CVSS_COLUMNS)
+
+
+def split_cvss_rows(found: Dict[str, dict]) -> Tuple[List[Tuple], List[str]]:
+    """
+    The `cve_cvss` rows of the nist records, and the ids of the records that
+    have no (valid) cvss vector, e.g., REJECTED cves whose metrics NVD
+    stripped, whose previously indexed rows must be deleted.
+    """
+    rows = []
+    vectorless = []
+    for cve_id, data in found.items():
+        row = cvss_row(cve_id, data)
+        if row is None:
+            vectorless.append(cve_id)
+        else:
+            rows.append(row)
+
+    return rows, vectorless
+
+
+def backfill_cvss_index(batch_size: int = 1000) -> int:
+    """
+    Extracts the cvss of the nist records that were cached before `cve_cvss`
+    existed, in batches of `batch_size` records. Returns the number of rows
+    written.
+    """
+    logger = logging.getLogger('backfill_cvss_index')
+    last_cve_id = ''
+    written = 0
+
+    while True:
+        with Db() as db:
+            records = db.all(
+                """
+                SELECT cve_id, data FROM cve_cache
+                WHERE source = 'nist' AND cve_id > %s
+                ORDER BY cve_id
+                LIMIT %s
+                """,
+                (last_cve_id, batch_size))
+
+        if len(records) == 0:
+            return written
+
+        rows, vectorless = split_cvss_rows(
+            {x['cve_id']: json.loads(x['data']) for x in records if x['data'] is not None})
+        with Db() as db:
+            db.bulk_upsert('cve_cvss', CVSS_ROW_COLUMNS, rows, ['cve_id'], CVSS_ON_CONFLICT)
+            if len(vectorless) > 0:
+                db.execute('DELETE FROM cve_cvss WHERE cve_id = ANY(%s)', (vectorless,))
+
+        last_cve_id = records[-1]['cve_id']
+        written += len(rows)
+        logger.info(f'Indexed the cvss of {written} nist records, up to {last_cve_id}.')
@@ -0,0 +1,118 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+import requests
+
+from utils import http_get
+
+_KEV_FEED_URL = 'https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json'
+
+
+class KevCatalog:
+    """
+    A process-wide, in-memory snapshot of the CISA KEV catalog keyed by
+    cve id. The snapshot is refreshed every `KEV_REFRESH_INTERVAL` seconds
+    using a conditional request (ETag/If-Modified-Since), and a rebuilt
+    snapshot replaces the previous one in a single assignment so readers
+    never observe a partially built catalog.
+
+    Examples:
+        >>> kev_catalog.contains('CVE-2021-44228')
+        >>> True
+    """
+
+    def __init__(self, url: Optional[str] = None, refresh_interval: Optional[float] = None):
+        self._url = url or os.getenv('KEV_FEED_URL', _KEV_FEED_URL)
+        self._refresh_interval = refresh_interval if refresh_interval is not None \
+            else float(os.getenv('KEV_REFRESH_INTERVAL', 3600))
+
+        self._entries: Optional[Dict[str, dict]] = None
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def get(self, cve_id: str) -> Optional[dict]:
+        return self._snapshot().get(cve_id.upper())
+
+    def contains(self, cve_id: str) -> bool:
+        return cve_id.upper() in self._snapshot()
+
+    def cve_ids(self) -> List[str]:
+        return list(self._snapshot())
+
+    def refresh(self, force: bool = False) -> None:
+        """
+        Re-downloads the feed if the current snapshot is older than the refresh
+        interval (or unconditionally when `force` is set). A `304 Not Modified`
+        response keeps the current snapshot and only resets its age.
+        """
+        with self._lock:
+            if not force and not self._is_stale():
+                # Another thread refreshed the snapshot while we were waiting.
+                return
+
+            self._refresh()
+
+    def _refresh(self) -> None:
+        """Downloads the feed, the caller holds `self._lock`."""
+        headers = {}
+        if self._entries is not None:
+            if self._etag is not None:
+                headers['If-None-Match'] = self._etag
+            if self._last_modified is not None:
+                headers['If-Modified-Since'] = self._last_modified
+
+        try:
+            response = http_get(self._url, headers=headers, timeout=60, logger=self._logger)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except requests.RequestException as e:
+            if self._entries is None:
+                raise
+
+            # Keep serving the previous snapshot and retry on the next interval.
+            self._logger.error(f'Failed to refresh the KEV catalog, serving the previous snapshot. {e}')
+            self._refreshed_at = time.monotonic()
+            return
+
+        if response.status_code == 304:
+            self._logger.info('KEV catalog not modified since the last refresh.')
+        else:
+            vulnerabilities = response.json()['vulnerabilities']
+            self._entries = {x['cveID'].upper(): x for x in vulnerabilities}
+            self._etag = response.headers.get('ETag')
+            self._last_modified = response.headers.get('Last-Modified')
+            self._logger.info(f'Loaded {len(self._entries)} entries into the KEV catalog.')
+
+        self._refreshed_at = time.monotonic()
+
+    def _snapshot(self) -> Dict[str, dict]:
+        entries = self._entries
+
+        if entries is None:
+            self.refresh()
+            return self._entries
+
+        if self._is_stale() and self._lock.acquire(blocking=False):
+            # Only one thread pays for the refresh, the others keep
+            # reading the current snapshot in the meantime.
+            try:
+                if self._is_stale():
+                    self._refresh()
+            finally:
+                self._lock.release()
+            return self._entries
+
+        return entries
+
+    def _is_stale(self) -> bool:
+        return self._entries is None or time.monotonic() - self._refreshed_at >= self._refresh_interval
+
+
+kev_catalog = KevCatalog()
@@ -1,25 +1,70 @@
-from typing import Optional
+import os
+from datetime import timedelta
+from typing import Optional, Dict, List, Tuple
 
-import requests
-
-from app.data_sources.cve_data_source import CveDataSource
+from app.data_sources.cve_data_source import CveDataSource, MAX_RATE_LIMIT_WAIT
+from app.data_sources.cvss_index import CVSS_ON_CONFLICT, CVSS_ROW_COLUMNS, split_cvss_rows
+from app.data_sources.presence_index import PrefixPresenceIndex
+from database.async_db import AsyncDb
+from importers.nist_bulk_syncer import NistBulkSyncer
+from utils import async_http_get
 
 
 class NistCveDataSource(CveDataSource):
+    # NVD never has the ids of other databases, e.g., GHSA-, GO- or PYSEC-.
+    _id_prefixes = ('CVE-',)
+    _presence_index = PrefixPresenceIndex('nist', _id_prefixes)
+
     @staticmethod
     def name() -> str:
         return 'nist'
 
-    def _load_data(self, cve_id: str) -> Optional[dict]:
+    async def _load_data(self, cve_id: str) -> Optional[dict]:
         base_url = 'https://services.nvd.nist.gov/rest/json/cves/2.0'
         url = f'{base_url}?cveId={cve_id}'
 
-        response = requests.get(url)
+        headers = {'apiKey': os.getenv('NIST_API_KEY')} if os.getenv('NIST_API_KEY') is not None else {}
+        response = await async_http_get(url, headers=headers, logger=self._logger,
+                                        max_rate_limit_wait=MAX_RATE_LIMIT_WAIT)
 
-        if response.status_code != 200:
+        if response.status == 404:
             return None
 
-        try:
-            return dict(response.json()['vulnerabilities'][0]['cve'])
-        except:
+        response.raise_for_status()
+
+        vulnerabilities = (await response.json()).get('vulnerabilities', [])
+        if len(vulnerabilities) == 0:
             return None
+
+        return dict(vulnerabilities[0]['cve'])
+
+    async def _index(self, db: AsyncDb, found: Dict[str, dict], removed: List[str]):
+        # The cvss is extracted once here, rather than from the whole record on every evaluation.
+        rows, vectorless = split_cvss_rows(found)
+        await db.bulk_upsert('cve_cvss', CVSS_ROW_COLUMNS, rows, ['cve_id'], CVSS_ON_CONFLICT)
+
+        # A refreshed record may have lost its vector, e.g., a rejected cve.
+        removed = removed + vectorless
+        if len(removed) > 0:
+            await db.execute('DELETE FROM cve_cvss WHERE cve_id = ANY(%s)', (removed,))
+
+    def _stale_column(self) -> str:
+        # The bulk syncer (see `NistBulkSyncer`) applied every change NVD made
+        # before its high-water mark. Once that mark is within the ttl, an entry
+        # written after it is no staler than the ttl allows. During a backfill or
+        # after a crashed sync, the plain ttl applies.
+        if self._ttl() is None:
+            return super()._stale_column()
+
+        return f"""{super()._stale_column()} AND NOT EXISTS (
+            SELECT 1 FROM ingestion_checkpoints
+            WHERE source = '{NistBulkSyncer.checkpoint_name}'
+              AND (state->>'high_water_mark')::timestamptz > CURRENT_TIMESTAMP - %s::interval
+              AND cve_cache.modified_time >= (state->>'high_water_mark')::timestamptz)"""
+
+    def _with_ttl(self, data: Tuple) -> Tuple:
+        return super()._with_ttl(data) if self._ttl() is None else (self._ttl(),) + super()._with_ttl(data)
+
+    def _miss_ttl(self) -> Optional[timedelta]:
+        # Reserved cves are published to NVD continuously.
+        return timedelta(hours=6)
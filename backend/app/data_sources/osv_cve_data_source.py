@@ -1,8 +1,10 @@
-from typing import Optional
-
-import requests
+import json
+from datetime import timedelta
+from typing import Optional, Sequence, Dict, List
 
 from app.data_sources.cve_data_source import CveDataSource
+from database.async_db import AsyncDb
+from utils import async_http_get
 
 
 class OsvCveDataSource(CveDataSource):
@@ -10,11 +12,49 @@ class OsvCveDataSource(CveDataSource):
     def name() -> str:
         return 'osv'
 
-    def _load_data(self, cve_id: str) -> Optional[dict]:
+    async def _load_data(self, cve_id: str) -> Optional[dict]:
+        # Entries imported from the ecosystem exports (see `OsvArchiveImporter`)
+        # are found through any of their aliases without calling the api.
+        # The entry whose own id was requested is preferred.
+        async with AsyncDb() as db:
+            imported = await db.first(
+                """
+                SELECT c.data
+                FROM osv_aliases a
+                         JOIN cve_cache c ON c.cve_id = a.osv_id AND c.source = 'osv'
+                WHERE a.alias = %s
+                ORDER BY a.osv_id = a.alias DESC, a.osv_id
+                LIMIT 1
+                """,
+                (cve_id,))
+
+        if imported is not None:
+            return json.loads(imported['data'])
+
         url = f'https://api.osv.dev/v1/vulns/{cve_id}'
-        response = requests.get(url)
+        response = await async_http_get(url, logger=self._logger)
 
-        if not (200 <= response.status_code < 300):
+        if response.status == 404:
             return None
 
-        return response.json()
+        response.raise_for_status()
+
+        return await response.json()
+
+    def _ttl(self) -> Optional[timedelta]:
+        # The imported entries are rewritten by every import of the exports
+        # (see `OsvArchiveImporter`), a week leaves room for a missed import.
+        return timedelta(days=7)
+
+    def source_id(self, aliases: Sequence[str]) -> Optional[str]:
+        # The entries are keyed by their own ids (GHSA-, GO-, PYSEC-, ...),
+        # CVE ids are only found through the aliases of imported entries.
+        return next((x for x in aliases if not x.startswith('CVE-')), aliases[0])
+
+    async def _index(self, db: AsyncDb, found: Dict[str, dict], removed: List[str]):
+        # Makes the entries fetched from the api resolvable by their aliases, as the imported ones.
+        rows = {(alias.upper(), entry['id'].upper()): None
+                for entry in found.values() if 'id' in entry
+                for alias in [entry['id']] + entry.get('aliases', [])}
+
+        await db.bulk_upsert('osv_aliases', ['alias', 'osv_id'], list(rows), ['alias', 'osv_id'])
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import logging
+import math
+import os
+import threading
+import time
+from abc import abstractmethod
+from typing import Awaitable, Callable, Dict, Iterable, Optional, Tuple, Union
+
+
+class BloomFilter:
+    """
+    A fixed size Bloom filter over strings, sized for `capacity` items at a
+    false positive rate of `fp_rate`. Membership tests never have false
+    negatives.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float = 0.01):
+        capacity = max(capacity, 1)
+        self._size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self._hash_count = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+        self._count = 0
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self._count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def expected_fp_rate(self) -> float:
+        return (1 - math.exp(-self._hash_count * self._count / self._size)) ** self._hash_count
+
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing: the k positions are derived from two 64 bit hashes.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self._size for i in range(self._hash_count))
+
+
+class PresenceIndex:
+    """
+    Tells which cves a data source cannot have, so that `CveDataSource`
+    answers the uncached ones as missing without a request to the
+    source. An index that is not available (e.g., not built yet) answers
+    that every cve might be present, i.e., it never hides data.
+
+    `stats` reports the lookups the index `avoided`, and its false
+    positives: cves that the index let through but the source did not
+    have. The observed false positive rate is over all the cves the
+    source did not have.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._lock = threading.Lock()
+        self._lookups = 0
+        self._avoided = 0
+        self._passed = 0
+        self._false_positives = 0
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    async def lookup(self, cve_id: str) -> Optional[bool]:
+        """
+        False if the source cannot have the cve, True if it might, and None
+        if the index cannot tell.
+        """
+        present = await self._might_contain(cve_id)
+
+        with self._lock:
+            self._lookups += 1
+            if present is False:
+                self._avoided += 1
+            elif present is True:
+                self._passed += 1
+
+        return present
+
+    def record_false_positive(self):
+        """Records that the source did not have a cve that `lookup` let through."""
+        with self._lock:
+            self._false_positives += 1
+
+    def stats(self) -> Dict[str, Union[int, float, str, None]]:
+        with self._lock:
+            negatives = self._avoided + self._false_positives
+            return {
+                'name': self._name,
+                'lookups': self._lookups,
+                'avoided': self._avoided,
+                'passed': self._passed,
+                'false_positives': self._false_positives,
+                'observed_fp_rate': self._false_positives / negatives if negatives > 0 else 0.0,
+                **self._details(),
+            }
+
+    @abstractmethod
+    async def _might_contain(self, cve_id: str) -> Optional[bool]:
+        pass
+
+    def _details(self) -> Dict[str, Union[int, float, str, None]]:
+        return {}
+
+
+class PrefixPresenceIndex(PresenceIndex):
+    """Sources that only have ids of a given form, e.g., NVD only has `CVE-` ids."""
+
+    def __init__(self, name: str, prefixes: Tuple[str, ...]):
+        super().__init__(name)
+        self._prefixes = prefixes
+
+    async def _might_contain(self, cve_id: str) -> Optional[bool]:
+        return cve_id.startswith(self._prefixes)
+
+    def _details(self) -> Dict[str, Union[int, float, str, None]]:
+        return {'kind': 'prefix'}
+
+
+class MemberPresenceIndex(PresenceIndex):
+    """
+    The ids a source has, as returned by `load_members` from a bulk listing
+    or feed of the source (None if the listing is not available). The ids
+    are kept in an exact set, or in a Bloom filter once there are more than
+    `PRESENCE_INDEX_MAX_EXACT` of them. The index is rebuilt by the first
+    lookup after it is older than `refresh_interval` seconds; concurrent
+    lookups keep using the previous index in the meantime. Cves added to
+    the source since the last refresh are reported as absent until the
+    next one, which only matters for the cves that are not cached yet.
+    """
+
+    def __init__(
+            self,
+            name: str,
+            load_members: Callable[[], Awaitable[Optional[Iterable[str]]]],
+            refresh_interval: float = 3600):
+        super().__init__(name)
+        self._load_members = load_members
+        self._refresh_interval = refresh_interval
+
+        self._max_exact = int(os.getenv('PRESENCE_INDEX_MAX_EXACT', 50000))
+        self._fp_rate = float(os.getenv('PRESENCE_INDEX_FP_RATE', 0.01))
+
+        self._members: Optional[Union[frozenset, BloomFilter]] = None
+        self._refreshed_at: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+
+    async def refresh(self):
+        start = time.perf_counter()
+
+        try:
+            members = await self._load_members()
+        except Exception as e:
+            # Keep the previous index (if any) and retry on the next interval.
+            self._logger.error(f'Failed to build the presence index of {self._name}. {e}')
+            self._refreshed_at = time.monotonic()
+            return
+
+        if members is None:
+            self._members = None
+            self._logger.info(f'No listing of {self._name} is available, its presence index is disabled.')
+        else:
+            # Hashing hundreds of thousands of ids would block the event loop.
+            self._members = members = await asyncio.to_thread(self._build, members)
+            self._logger.info(f'Built the presence index of {self._name} with {len(members)} ids '
+                              f'in {time.perf_counter() - start:.2f}s.')
+
+        self._refreshed_at = time.monotonic()
+
+    def _build(self, members: Iterable[str]) -> Union[frozenset, BloomFilter]:
+        members = frozenset(x.upper() for x in members)
+        if len(members) <= self._max_exact:
+            return members
+
+        bloom = BloomFilter(len(members), self._fp_rate)
+        for member in members:
+            bloom.add(member)
+        return bloom
+
+    async def _might_contain(self, cve_id: str) -> Optional[bool]:
+        stale = self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self._refresh_interval
+
+        # Only one caller pays for the refresh, the others keep using the current index.
+        if stale and self._refresh_lock.acquire(blocking=False):
+            try:
+                await self.refresh()
+            finally:
+                self._refresh_lock.release()
+
+        members = self._members
+        return None if members is None else cve_id in members
+
+    def _details(self) -> Dict[str, Union[int, float, str, None]]:
+        members = self._members
+        if members is None:
+            return {'kind': None, 'members': 0}
+
+        if isinstance(members, BloomFilter):
+            return {'kind': 'bloom', 'members': len(members), 'size_bytes': members.size_bytes(),
+                    'expected_fp_rate': members.expected_fp_rate()}
+
+        return {'kind': 'exact', 'members': len(members), 'expected_fp_rate': 0.0}
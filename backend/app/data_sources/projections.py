@@ -0,0 +1,66 @@
+import os
+from typing import Callable, Dict
+
+
+def projection_enabled() -> bool:
+    return os.getenv('CVE_CACHE_PROJECTION', 'false').lower() == 'true'
+
+
+def project(source: str, data: dict) -> dict:
+    """
+    Drops the parts of a source's payload that neither the evaluation units
+    nor the llm prompts use, before it is cached. Sources without a
+    projection are returned unchanged. The payload is not modified in place.
+    """
+    projection = _PROJECTIONS.get(source)
+    return data if projection is None else projection(data)
+
+
+def _english_only(items: list) -> list:
+    english = [x for x in items if x.get('lang') == 'en']
+    return english if len(english) > 0 else items
+
+
+def _project_nist(data: dict) -> dict:
+    data = dict(data)
+
+    # Translations of the description.
+    if 'descriptions' in data:
+        data['descriptions'] = _english_only(data['descriptions'])
+
+    if 'weaknesses' in data:
+        data['weaknesses'] = [{**x, 'description': _english_only(x.get('description', []))}
+                              for x in data['weaknesses']]
+
+    # The submitter of every reference, only the url and the tags are used.
+    if 'references' in data:
+        data['references'] = [{k: v for k, v in x.items() if k != 'source'} for x in data['references']]
+
+    # The opaque NVD id of every cpe match criteria, which are the bulk of the
+    # configurations of widely deployed products.
+    if 'configurations' in data:
+        data['configurations'] = [
+            {**configuration, 'nodes': [
+                {**node, 'cpeMatch': [{k: v for k, v in x.items() if k != 'matchCriteriaId'}
+                                      for x in node.get('cpeMatch', [])]}
+                for node in configuration.get('nodes', [])]}
+            for configuration in data['configurations']]
+
+    return data
+
+
+def _project_osv(data: dict) -> dict:
+    data = dict(data)
+
+    # The enumerated affected versions, which the affected ranges already
+    # describe and which run into the thousands for long-lived packages.
+    if 'affected' in data:
+        data['affected'] = [{k: v for k, v in x.items() if k != 'versions'} for x in data['affected']]
+
+    return data
+
+
+_PROJECTIONS: Dict[str, Callable[[dict], dict]] = {
+    'nist': _project_nist,
+    'osv': _project_osv,
+}
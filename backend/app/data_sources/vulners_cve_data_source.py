@@ -1,3 +1,4 @@
+import asyncio
 import os
 from typing import Optional
 
@@ -15,8 +16,8 @@ class VulnersCveDataSource(CveDataSource):
     def name() -> str:
         return 'vulners'
 
-    def _load_data(self, cve_id: str) -> Optional[dict]:
+    async def _load_data(self, cve_id: str) -> Optional[dict]:
         try:
-            return self._vulners_api.get_bulletin(cve_id, fields=["*"])
+            return await asyncio.to_thread(self._vulners_api.get_bulletin, cve_id, fields=["*"])
         except:
             return None
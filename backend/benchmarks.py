@@ -0,0 +1,645 @@
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import random
+import statistics
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List, Tuple, Optional, Sequence
+
+import requests
+
+
+class _StubServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections under concurrent load.
+    request_queue_size = 1024
+
+
+def _serve(handler_class) -> Tuple[ThreadingHTTPServer, str]:
+    """Starts a local stub server on a free port and returns it with its base url."""
+    server = _StubServer(('127.0.0.1', 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+def _report(label: str, timings: List[float]):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+    print(f'{label}: n={len(timings)} '
+          f'mean={statistics.mean(timings) * 1000:.3f}ms '
+          f'p50={statistics.median(timings) * 1000:.3f}ms '
+          f'p95={p95 * 1000:.3f}ms '
+          f'total={sum(timings):.2f}s')
+
+
+def _time_each(items: List[str], fn: Callable[[str], object]) -> List[float]:
+    timings = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def start_kev_benchmark(cve_count: int = 10000, kev_count: int = 1200, legacy_sample: int = 500):
+    """
+    Compares the per-cve latency of the KEV lookup before (download the whole
+    feed and scan it on every lookup) and after (process-wide snapshot) on a
+    bulk task of `cve_count` cves, with the feed served from a local stub.
+    Most of the cves are not in the catalog, as in a real bulk task. The
+    legacy path is only timed on `legacy_sample` cves to keep the run short.
+    """
+    from app.data_sources.kev_catalog import KevCatalog
+
+    vulnerabilities = [
+        {
+            'cveID': f'CVE-2020-{i:05d}',
+            'vendorProject': 'Vendor',
+            'product': 'Product',
+            'vulnerabilityName': f'Vendor Product Remote Code Execution Vulnerability {i}',
+            'dateAdded': '2021-11-03',
+            'shortDescription': 'Vendor Product contains an unspecified vulnerability ' * 4,
+            'requiredAction': 'Apply updates per vendor instructions.',
+            'dueDate': '2021-11-17',
+            'knownRansomwareCampaignUse': 'Unknown',
+            'notes': f'https://vendor.example.com/advisories/{i}',
+            'cwes': ['CWE-78']
+        }
+        for i in range(kev_count)
+    ]
+    body = json.dumps({'title': 'CISA Catalog of Known Exploited Vulnerabilities',
+                       'vulnerabilities': vulnerabilities}).encode()
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    stats = {'full': 0, 'not_modified': 0}
+
+    class FeedHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.headers.get('If-None-Match') == etag:
+                stats['not_modified'] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+
+            stats['full'] += 1
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.send_header('ETag', etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server, url = _serve(FeedHandler)
+
+    # Roughly one in ten cves of the task is in the catalog.
+    cve_ids = [f'CVE-2020-{i:05d}' if i % 10 == 0 else f'CVE-2023-{i:05d}' for i in range(cve_count)]
+
+    def legacy_lookup(cve_id: str):
+        feed = requests.get(url).json()
+        return next((x for x in feed['vulnerabilities'] if x['cveID'] == cve_id), None)
+
+    try:
+        print(f'Feed size: {len(body) / 1024:.0f}KiB, {kev_count} entries, {cve_count} cves in the task.')
+
+        _report('before (download + scan per cve)', _time_each(cve_ids[:legacy_sample], legacy_lookup))
+
+        # A very short refresh interval exercises the conditional refresh path.
+        stats.update(full=0, not_modified=0)
+        catalog = KevCatalog(url=url, refresh_interval=0.001)
+        _report('after (indexed snapshot)', _time_each(cve_ids, catalog.contains))
+        print(f'Feed requests during the indexed run: {stats}')
+    finally:
+        server.shutdown()
+
+
+def start_aggregator_benchmark(runs: int = 20, latencies: Tuple[float, ...] = (0.40, 0.15, 0.30, 0.25)):
+    """
+    Measures the cold-path latency of `CveDataSourceAggregator.load` when
+    every source has to go to the network, simulated by sources that sleep
+    for the given latencies. Loading the sources one after the other costs
+    the sum of the latencies, loading them concurrently costs the maximum.
+    """
+    from app.data_sources.cve_data_source_aggregator import CveDataSourceAggregator
+    from utils import run_sync
+
+    class SlowDataSource:
+        def __init__(self, name: str, latency: float):
+            self._name = name
+            self._latency = latency
+
+        def name(self) -> str:
+            return self._name
+
+        def source_id(self, aliases: Sequence[str]) -> Optional[str]:
+            return aliases[0]
+
+        async def load_async(self, cve_id: str, reload: bool = False) -> Optional[dict]:
+            await asyncio.sleep(self._latency)
+            return {'id': cve_id}
+
+    data_sources = [SlowDataSource(name, latency) for name, latency in zip(['nist', 'kev', 'vulnrichment', 'osv'],
+                                                                           latencies)]
+    aggregator = CveDataSourceAggregator()
+    aggregator._data_sources = data_sources
+
+    def sequential_load(cve_id: str):
+        return {f'{x.name()}_data_source': run_sync(x.load_async(cve_id)) for x in data_sources}
+
+    cve_ids = [f'CVE-2024-{i:05d}' for i in range(runs)]
+    print(f'Source latencies: {latencies}, sum={sum(latencies):.2f}s, max={max(latencies):.2f}s')
+    _report('sequential', _time_each(cve_ids, sequential_load))
+    _report('concurrent', _time_each(cve_ids, aggregator.load))
+
+
+def start_single_flight_benchmark(callers: int = 8, cve_count: int = 20, latency: float = 0.3):
+    """
+    Simulates the aggregators of an evaluation racing for the same cold cve:
+    `callers` threads load every cve at the same time from a source that
+    sleeps for `latency`. Without coalescing every caller fetches, with it
+    one fetch per cve is issued and the other callers wait for it.
+    """
+    from single_flight import SingleFlight
+
+    fetches = []
+    fetches_lock = threading.Lock()
+
+    def fetch(cve_id: str) -> dict:
+        with fetches_lock:
+            fetches.append(cve_id)
+        time.sleep(latency)
+        return {'id': cve_id}
+
+    def race(load: Callable[[str], dict]):
+        fetches.clear()
+        start = time.perf_counter()
+        for i in range(cve_count):
+            cve_id = f'CVE-2024-{i:05d}'
+            threads = [threading.Thread(target=load, args=(cve_id,)) for _ in range(callers)]
+            [x.start() for x in threads]
+            [x.join() for x in threads]
+        return len(fetches), time.perf_counter() - start
+
+    flight = SingleFlight()
+    uncoalesced_fetches, uncoalesced_elapsed = race(fetch)
+    coalesced_fetches, coalesced_elapsed = race(lambda cve_id: flight.do(('nist', cve_id), lambda: fetch(cve_id)))
+
+    print(f'{callers} concurrent callers per cve, {cve_count} cves, {latency:.2f}s per fetch')
+    print(f'uncoalesced: fetches={uncoalesced_fetches} elapsed={uncoalesced_elapsed:.2f}s')
+    print(f'coalesced  : fetches={coalesced_fetches} elapsed={coalesced_elapsed:.2f}s {flight.stats()}')
+
+
+def start_async_fetch_benchmark(cve_count: int = 2000, latency: float = 0.1, workers: int = 50,
+                                concurrency: int = 500):
+    """
+    Compares the throughput of fetching `cve_count` cves from a stub api
+    that answers after `latency` seconds, with the thread pool the former
+    `fetchers.py` used (`workers` threads calling `http_get`) and with the
+    asyncio client (`concurrency` requests in flight on one event loop).
+    Only the http layer is measured, no database is involved.
+    """
+    from utils import async_http_get, http_get, run_sync
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            time.sleep(latency)
+            body = json.dumps({'vulnerabilities': [{'cve': {'id': self.path.rsplit('=', 1)[-1]}}]}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server, base_url = _serve(Handler)
+    urls = [f'{base_url}/rest/json/cves/2.0?cveId=CVE-2024-{i:05d}' for i in range(cve_count)]
+
+    def fetch(url: str) -> dict:
+        return http_get(url).json()
+
+    async def fetch_all() -> List[dict]:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch_async(url: str) -> dict:
+            async with semaphore:
+                return await (await async_http_get(url)).json()
+
+        return await asyncio.gather(*[fetch_async(x) for x in urls])
+
+    try:
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            threaded = list(executor.map(fetch, urls))
+        threaded_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        multiplexed = run_sync(fetch_all())
+        async_elapsed = time.perf_counter() - start
+    finally:
+        server.shutdown()
+
+    assert len(threaded) == len(multiplexed) == cve_count
+    print(f'{cve_count} fetches, {latency:.2f}s per response')
+    print(f'thread pool ({workers} workers): {threaded_elapsed:.2f}s, {cve_count / threaded_elapsed:.0f} cves/s')
+    print(f'asyncio ({concurrency} in flight): {async_elapsed:.2f}s, {cve_count / async_elapsed:.0f} cves/s')
+
+
+def _synthetic_nist_record(i: int, rng: random.Random) -> dict:
+    """An NVD 2.0 cve record shaped like the real ones, with a heavy tail of large cpe configurations."""
+    cpe_count = min(int(rng.paretovariate(1.2)) * 3, 600)
+    return {
+        'id': f'CVE-2023-{i:05d}',
+        'sourceIdentifier': 'security@example.com',
+        'published': '2023-05-01T10:15:09.403',
+        'lastModified': '2024-11-21T08:05:24.180',
+        'vulnStatus': 'Modified',
+        'descriptions': [
+            {'lang': 'en', 'value': 'A heap-based buffer overflow in the parser allows remote attackers ' * 3},
+            {'lang': 'es', 'value': 'Un desbordamiento de b\u00fafer en el analizador permite a atacantes ' * 3},
+        ],
+        'metrics': {'cvssMetricV31': [{
+            'source': 'nvd@nist.gov', 'type': 'Primary',
+            'cvssData': {'version': '3.1', 'vectorString': 'CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H',
+                         'baseScore': 9.8, 'baseSeverity': 'CRITICAL'},
+            'exploitabilityScore': 3.9, 'impactScore': 5.9}]},
+        'weaknesses': [{'source': 'nvd@nist.gov', 'type': 'Primary',
+                        'description': [{'lang': 'en', 'value': 'CWE-787'}, {'lang': 'es', 'value': 'CWE-787'}]}],
+        'configurations': [{'nodes': [{'operator': 'OR', 'negate': False, 'cpeMatch': [
+            {'vulnerable': True, 'criteria': f'cpe:2.3:a:vendor{i % 97}:product:{v}.{j}:*:*:*:*:*:*:*',
+             'matchCriteriaId': hashlib.md5(f'{i}-{v}-{j}'.encode()).hexdigest().upper()}
+            for v in range(1, 4) for j in range(cpe_count // 3)]}]}],
+        'references': [{'url': f'https://example.com/advisories/{i}/{r}', 'source': 'security@example.com',
+                        'tags': ['Third Party Advisory']} for r in range(rng.randint(3, 25))],
+    }
+
+
+def _synthetic_osv_record(i: int, rng: random.Random) -> dict:
+    version_count = min(int(rng.paretovariate(1.1)) * 10, 3000)
+    return {
+        'id': f'GHSA-{i:04d}-abcd-efgh',
+        'aliases': [f'CVE-2023-{i:05d}'],
+        'summary': 'Prototype pollution in the merge helper',
+        'affected': [{
+            'package': {'ecosystem': 'npm', 'name': f'package-{i}'},
+            'ranges': [{'type': 'SEMVER', 'events': [{'introduced': '0'}, {'fixed': '4.17.21'}]}],
+            'versions': [f'{v // 100}.{(v // 10) % 10}.{v % 10}' for v in range(version_count)],
+        }],
+    }
+
+
+def start_projection_benchmark(records: int = 5000, seed: int = 7):
+    """
+    Measures the effect of the per-source cache projection (see
+    `app.data_sources.projections`) on synthetic NVD and OSV records: the
+    bytes stored per record and the time it takes to parse a cache hit.
+    The deflate size is only a rough indication of how well the payload
+    compresses, Postgres uses lz4 (or pglz) for its toast values.
+    """
+    from app.data_sources.projections import project
+
+    rng = random.Random(seed)
+    datasets = {
+        'nist': [_synthetic_nist_record(i, rng) for i in range(records)],
+        'osv': [_synthetic_osv_record(i, rng) for i in range(records)],
+    }
+
+    for source, dataset in datasets.items():
+        for label, payloads in [('full', [json.dumps(x) for x in dataset]),
+                                ('projected', [json.dumps(project(source, x)) for x in dataset])]:
+            size = sum(len(x) for x in payloads)
+            deflated = sum(len(zlib.compress(x.encode(), 1)) for x in payloads)
+
+            start = time.perf_counter()
+            for payload in payloads:
+                json.loads(payload)
+            parse = (time.perf_counter() - start) / len(payloads)
+
+            print(f'{source} {label:9}: {size / len(payloads) / 1024:.1f}KiB/record '
+                  f'(deflate {deflated / len(payloads) / 1024:.1f}KiB), parse {parse * 1e6:.0f}us/record')
+
+
+_CVSS_VERSIONS = {
+    '2.0': ('', [('AV', 'LAN'), ('AC', 'HML'), ('Au', 'MSN'), ('C', 'NPC'), ('I', 'NPC'), ('A', 'NPC')]),
+    '3.0': ('CVSS:3.0/', [('AV', 'NALP'), ('AC', 'LH'), ('PR', 'NLH'), ('UI', 'NR'), ('S', 'UC'),
+                          ('C', 'HLN'), ('I', 'HLN'), ('A', 'HLN')]),
+    '3.1': ('CVSS:3.1/', [('AV', 'NALP'), ('AC', 'LH'), ('PR', 'NLH'), ('UI', 'NR'), ('S', 'UC'),
+                          ('C', 'HLN'), ('I', 'HLN'), ('A', 'HLN')]),
+    '4.0': ('CVSS:4.0/', [('AV', 'NALP'), ('AC', 'LH'), ('AT', 'NP'), ('PR', 'NLH'), ('UI', 'NPA'),
+                          ('VC', 'HLN'), ('VI', 'HLN'), ('VA', 'HLN'), ('SC', 'HLN'), ('SI', 'HLN'), ('SA', 'HLN')]),
+}
+
+
+def _legacy_classify_cvss(vector: str) -> Tuple[Optional[str], str]:
+    """
+    The dict and `"K:V"` list based parsing and membership tests the
+    heuristic units used to do, exactly as the baseline did them.
+    """
+    cvss = dict(map(lambda x: x.split(':'), vector.split('/')))
+    for old, new in [('C', 'VC'), ('I', 'VI'), ('A', 'VA')]:
+        if old in cvss and new not in cvss:
+            cvss[new] = cvss.pop(old)
+    cvss = list(map(lambda x: f'{x[0]}:{x[1]}', cvss.items()))
+
+    # The baseline exposure rule as it was, which only checked AV:N.
+    exposure = None
+    if 'AV:N' in cvss and 'PR:N' and 'UI:N':
+        exposure = 'open'
+    elif ('AV:N' in cvss or 'AV:A' in cvss) and ('PR:L' in cvss or 'PR:H' in cvss or 'UI:R' in cvss):
+        exposure = 'controlled'
+    elif 'AV:L' in cvss or 'AV:P' in cvss:
+        exposure = 'small'
+
+    if 'AV:N' in cvss and 'PR:N' in cvss and ('VC:H' in cvss or 'VI:H' in cvss or 'VA:H' in cvss):
+        value_density = 'concentrated'
+    elif 'AV:L' in cvss or 'AV:A' in cvss or 'PR:L' in cvss or 'PR:H' in cvss or 'UI:R' in cvss:
+        value_density = 'diffused'
+    elif 'S:C' in cvss:
+        value_density = 'concentrated'
+    else:
+        value_density = 'diffused'
+
+    return exposure, value_density
+
+
+def start_cvss_benchmark(vectors: int = 200000, distinct: int = 3000, seed: int = 7):
+    """
+    Compares classifying the cvss vectors of `vectors` cves with the
+    heuristics of the exposure and value density units: the legacy parsing,
+    `parse_cvss` without and with its memoization, and the NumPy bulk path
+    (`classify_cvss_bulk`), per cvss version. The vectors are drawn from
+    `distinct` random vectors per version, as most cves share a handful of
+    common vectors. Also checks that the bulk and the scalar paths agree.
+    """
+    from ssvc.utils import classify_cvss_bulk, cvss_exposure, cvss_value_density, parse_cvss
+
+    rng = random.Random(seed)
+
+    for version, (prefix, metrics) in _CVSS_VERSIONS.items():
+        pool = [prefix + '/'.join(f'{key}:{rng.choice(values)}' for key, values in metrics) for _ in range(distinct)]
+        column = [rng.choice(pool) for _ in range(vectors)]
+
+        def scalar(parse: Callable[[str], object]) -> list:
+            return [(cvss_exposure(cvss), cvss_value_density(cvss)) for cvss in map(parse, column)]
+
+        parse_cvss.cache_clear()
+        timings = {}
+
+        start = time.perf_counter()
+        [_legacy_classify_cvss(x) for x in column]
+        timings['legacy'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scalar(parse_cvss.__wrapped__)
+        timings['uncached'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = scalar(parse_cvss)
+        timings['memoized'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bulk = classify_cvss_bulk(column)
+        timings['bulk'] = time.perf_counter() - start
+
+        actual = [(x or None, y) for x, y in zip(bulk['exposure'].tolist(), bulk['value_density'].tolist())]
+        assert actual == expected, f'The bulk and scalar classification of v{version} vectors differ.'
+
+        print(f'v{version}: ' + ' '.join(f'{label}={elapsed / vectors * 1e9:.0f}ns/vector'
+                                        for label, elapsed in timings.items()))
+
+
+def start_presence_index_benchmark(members: int = 250000, lookups: int = 100000, seed: int = 7):
+    """
+    Measures the presence indexes (see `app.data_sources.presence_index`)
+    on a bulk task mixing cve ids with ids of other databases: the share of
+    the lookups they avoid, their observed false positive rate against the
+    expected one, their size and their latency. `members` is the size of the
+    source, which is above the exact set threshold so a Bloom filter is built.
+    """
+    import sys
+    from app.data_sources.presence_index import MemberPresenceIndex, PrefixPresenceIndex
+
+    rng = random.Random(seed)
+    present = [f'CVE-{rng.randint(1999, 2024)}-{i:07d}' for i in range(members)]
+    prefixes = ['CVE', 'CVE', 'CVE', 'GHSA', 'GO', 'PYSEC']
+    workload = [rng.choice(present) if rng.random() < 0.3
+                else f'{rng.choice(prefixes)}-2024-{rng.randint(0, 10 ** 8):08d}'
+                for _ in range(lookups)]
+    present_set = set(present)
+
+    async def load_members():
+        return present
+
+    async def run(index) -> float:
+        start = time.perf_counter()
+        for cve_id in workload:
+            if await index.lookup(cve_id) and cve_id not in present_set:
+                index.record_false_positive()
+        return time.perf_counter() - start
+
+    for index in [PrefixPresenceIndex('prefix', ('CVE-',)), MemberPresenceIndex('member', load_members)]:
+        # The first lookup builds the member index.
+        asyncio.run(index.lookup(present[0]))
+        elapsed = asyncio.run(run(index))
+        stats = index.stats()
+        print(f'{stats["name"]} ({stats["kind"]}): avoided {stats["avoided"] / lookups:.1%} of {lookups} lookups, '
+              f'observed fp rate {stats["observed_fp_rate"]:.4f} '
+              f'(expected {stats.get("expected_fp_rate", float("nan")):.4f}), '
+              f'{elapsed / lookups * 1e6:.1f}us/lookup'
+              + (f', {stats["size_bytes"] / 1024:.0f}KiB vs {sys.getsizeof(present_set) / 1024:.0f}KiB exact set'
+                 if 'size_bytes' in stats else ''))
+
+
+def start_bulk_write_benchmark(records: int = 20000, batch_size: int = 1000, seed: int = 7):
+    """
+    Compares the ways of writing synthetic NVD records to `cve_cache`: one
+    insert (and commit) per row, `execute_values`, and `COPY` into a staging
+    table (see `Db.bulk_upsert`), for fresh rows and for rows that conflict
+    with the existing ones. Needs a database; the rows are written under a
+    scratch source and deleted afterwards.
+    """
+    from database.db import Db
+
+    rng = random.Random(seed)
+    source = 'bulk_write_benchmark'
+    rows = [(f'CVE-2099-{i:06d}', source, json.dumps(_synthetic_nist_record(i, rng))) for i in range(records)]
+    on_conflict = 'DO UPDATE SET data = EXCLUDED.data'
+
+    def row_at_a_time(db: Db, batch: List[Tuple]):
+        for row in batch:
+            db.execute('INSERT INTO cve_cache(cve_id, source, data) VALUES (%s, %s, %s) '
+                       f'ON CONFLICT (cve_id, source) {on_conflict}', row)
+
+    def bulk(method: str) -> Callable[[Db, List[Tuple]], None]:
+        return lambda db, batch: db.bulk_upsert('cve_cache', ['cve_id', 'source', 'data'], batch,
+                                                ['cve_id', 'source'], on_conflict, method=method)
+
+    with Db() as db:
+        for label, write in [('row-at-a-time', row_at_a_time), ('values', bulk('values')), ('copy', bulk('copy'))]:
+            db.execute('DELETE FROM cve_cache WHERE source = %s', (source,))
+
+            # The second pass updates every row.
+            for run in ['insert', 'update']:
+                start = time.perf_counter()
+                for i in range(0, len(rows), batch_size):
+                    write(db, rows[i:i + batch_size])
+                elapsed = time.perf_counter() - start
+
+                print(f'{label:13} {run}: {records / elapsed:.0f} rows/s ({elapsed:.2f}s for {records} rows)')
+
+        db.execute('DELETE FROM cve_cache WHERE source = %s', (source,))
+
+
+def start_combined_llm_benchmark(records: int = 50, seed: int = 7):
+    """
+    Compares the prompts sent for a cold cve with per-point llm evaluations
+    and with the combined evaluation (see `CombinedLlmEvaluator`), over
+    synthetic NVD and OSV records: the number of llm calls and the input
+    size, in characters and in approximate tokens (4 characters each).
+    """
+    from ssvc.llm.llm_evaluators.combined_llm_evaluator import LLM_EVALUATORS, CombinedLlmEvaluator
+
+    rng = random.Random(seed)
+    combined = CombinedLlmEvaluator('gemini')
+    evaluators = [x('gemini', mode='per_point') for x in LLM_EVALUATORS]
+    names = [x.name() for x in evaluators]
+
+    per_point, single = [], []
+    for i in range(records):
+        cve_id = f'CVE-2024-{i:05d}'
+        cve_data = json.dumps({'nist_data_source': _synthetic_nist_record(i, rng),
+                               'osv_data_source': _synthetic_osv_record(i, rng)})
+        per_point.append(sum(len(x._get_prompt(cve_id, cve_data)) for x in evaluators))
+        single.append(len(combined._get_prompt(cve_id, names, cve_data)))
+
+    for label, calls, sizes in [('per-point', len(evaluators), per_point), ('combined', 1, single)]:
+        print(f'{label:9}: {calls} llm calls/cve, {statistics.mean(sizes) / 1024:.1f}KiB '
+              f'(~{statistics.mean(sizes) / 4:.0f} tokens) of prompts/cve')
+    print(f'input reduction: {statistics.mean(per_point) / statistics.mean(single):.1f}x')
+
+
+def _report_sizes(label: str, sizes: List[int]):
+    sizes = sorted(sizes)
+    print(f'{label}: n={len(sizes)} mean={statistics.mean(sizes):.0f} p50={sizes[len(sizes) // 2]} '
+          f'p95={sizes[max(int(len(sizes) * 0.95) - 1, 0)]} max={sizes[-1]} tokens')
+
+
+def start_prompt_compaction_benchmark(sample: int = 200, source: str = 'cache', llm_sample: int = 0,
+                                      decision_point: str = 'state_of_expolitation', seed: int = 7):
+    """
+    Reports the distribution of the (estimated) prompt tokens of a decision
+    point before and after the prompt compaction (see `prompt_compaction`),
+    over `sample` cves drawn from the nist records of `cve_cache`
+    (`source='cache'`, needs a database) or synthetic records
+    (`source='synthetic'`). With `llm_sample`, that many cves are also sent
+    to the llm with both prompts to compare the latencies.
+    """
+    from ssvc.llm.llm_evaluators.combined_llm_evaluator import LLM_EVALUATORS
+    from ssvc.llm.prompt_compaction import compact_cve_data_json
+    from ssvc.utils import estimate_tokens
+
+    if source == 'cache':
+        from app.data_sources.cve_data_source_aggregator import CveDataSourceAggregator
+        from database.db import Db
+
+        with Db() as db:
+            cve_ids = [x['cve_id'] for x in db.all(
+                "SELECT cve_id FROM cve_cache WHERE source = 'nist' ORDER BY random() LIMIT %s", (sample,))]
+        dataset = CveDataSourceAggregator().load_many(cve_ids)
+    else:
+        rng = random.Random(seed)
+        dataset = {f'CVE-2023-{i:05d}': {'nist_data_source': _synthetic_nist_record(i, rng),
+                                         'osv_data_source': _synthetic_osv_record(i, rng)} for i in range(sample)}
+
+    evaluator = next(x for x in LLM_EVALUATORS if x.name() == decision_point)('gemini', mode='per_point')
+
+    raw, compact, timings = dict(), dict(), []
+    for cve_id, cve_data in dataset.items():
+        raw[cve_id] = evaluator._get_prompt(cve_id, json.dumps(cve_data))
+        start = time.perf_counter()
+        compact[cve_id] = evaluator._get_prompt(cve_id, compact_cve_data_json(cve_data, [decision_point]))
+        timings.append(time.perf_counter() - start)
+
+    _report_sizes('raw prompts    ', [estimate_tokens(x) for x in raw.values()])
+    _report_sizes('compact prompts', [estimate_tokens(x) for x in compact.values()])
+    _report('compaction', timings)
+
+    if llm_sample > 0:
+        from ssvc.llm.llm_clients.gemini_llm_client import GeminiLlmClient
+
+        client = GeminiLlmClient()
+        cve_ids = list(dataset)[:llm_sample]
+        _report('llm latency, raw prompts', _time_each(cve_ids, lambda x: client.respond(raw[x])))
+        _report('llm latency, compact prompts', _time_each(cve_ids, lambda x: client.respond(compact[x])))
+
+
+def start_llm_rate_limit_benchmark(requests: int = 600, quota_rpm: int = 1200, latency: float = 0.2):
+    """
+    Sends `requests` requests to a stub llm provider that allows `quota_rpm`
+    requests per minute (and answers the others with a 429), once with the
+    client-side rpm budget of `LlmLimits` set to the quota and once without
+    it, and reports the throughput and the number of 429s. Needs no network.
+    """
+    import os
+    from ssvc.llm.llm_clients.llm_client import LlmClient
+    from utils import run_sync
+
+    class RateLimited(Exception):
+        code = 429
+
+    class StubProvider:
+        def __init__(self):
+            self.window_start = time.monotonic()
+            self.in_window = 0
+            self.rejected = 0
+
+        async def respond(self) -> str:
+            await asyncio.sleep(latency)
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start, self.in_window = now, 0
+            if self.in_window >= quota_rpm / 60:
+                self.rejected += 1
+                raise RateLimited()
+            self.in_window += 1
+            return '{}'
+
+    for label, rpm in [('no client budget', 0), (f'rpm budget {quota_rpm}', quota_rpm)]:
+        prefix = f'BENCHMARK_{rpm}'
+        os.environ.update({f'{prefix}_RPM': str(rpm), f'{prefix}_MAX_CONCURRENCY': '64',
+                           f'{prefix}_MAX_RETRIES': '20', f'{prefix}_BACKOFF_BASE': '0.5'})
+        provider = StubProvider()
+
+        class StubClient(LlmClient):
+            _limits_prefix = prefix
+
+            async def _respond_async(self, query: str) -> str:
+                return await provider.respond()
+
+            def _status_code(self, e: Exception) -> Optional[int]:
+                return getattr(e, 'code', None)
+
+        client = StubClient()
+
+        async def run():
+            return await asyncio.gather(*[client.respond_async('') for _ in range(requests)], return_exceptions=True)
+
+        start = time.perf_counter()
+        results = run_sync(run())
+        elapsed = time.perf_counter() - start
+
+        failed = sum(1 for x in results if isinstance(x, BaseException))
+        print(f'{label}: {requests} requests in {elapsed:.1f}s ({requests / elapsed * 60:.0f} rpm, '
+              f'quota {quota_rpm}), {provider.rejected} 429s, {failed} failed')
+
+
+if __name__ == '__main__':
+    start_kev_benchmark()
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import re
+import weakref
+from typing import Optional, Tuple, Union, List, Sequence, Literal
+
+import asyncpg
+
+from database.db import _last_per_key
+
+
+class AsyncDb:
+    """
+    The asyncio counterpart of `Db`, backed by an asyncpg connection pool
+    (one per event loop) configured through the same environment variables.
+    Queries use the same `%s` placeholders as `Db`, which are translated to
+    asyncpg's positional `$n` parameters, so statements can be shared by the
+    sync and async code paths. Every statement runs in autocommit mode.
+
+    Examples:
+        >>> async with AsyncDb() as db:
+        >>>     first_row = await db.first("SELECT * FROM cve_cache WHERE cve_id = %s", ('CVE-2024-3094',))
+        >>>     await db.execute_values("INSERT INTO osv_aliases(alias, osv_id) VALUES %s", rows)
+    """
+
+    _pools: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncpg.Pool]' = weakref.WeakKeyDictionary()
+    _pools_lock: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]' = weakref.WeakKeyDictionary()
+
+    def __init__(self):
+        self._logger = logging.getLogger(self.__class__.__name__)
+        self._pool: Optional[asyncpg.Pool] = None
+        self._conn: Optional[asyncpg.Connection] = None
+
+    @classmethod
+    async def _get_pool(cls) -> asyncpg.Pool:
+        loop = asyncio.get_running_loop()
+        lock = cls._pools_lock.setdefault(loop, asyncio.Lock())
+
+        async with lock:
+            if loop not in cls._pools:
+                cls._pools[loop] = await asyncpg.create_pool(
+                    database=os.getenv('DB_NAME'),
+                    user=os.getenv('DB_USER'),
+                    password=os.getenv('DB_PASS'),
+                    host=os.getenv('DB_HOST'),
+                    port=int(os.getenv('DB_PORT', 5432)),
+                    min_size=1,
+                    max_size=int(os.getenv('DB_ASYNC_POOL_SIZE', 20)),
+                    timeout=10,
+                    server_settings={'application_name': 'ssvc', 'timezone': 'UTC'})
+
+            return cls._pools[loop]
+
+    async def __aenter__(self):
+        self._pool = await self._get_pool()
+        self._conn = await self._pool.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if self._conn is not None:
+            await self._pool.release(self._conn)
+            self._conn = None
+
+    async def execute(self, query: str, data: Optional[Union[Tuple, list]] = None) -> None:
+        self._logger.info(f"Executing query: {query} with data: {data}")
+        await self._conn.execute(_to_positional(query), *(data or ()))
+
+    async def first(self, query: str, data: Optional[Union[Tuple, list]] = None) -> Optional[dict]:
+        self._logger.info(f"Fetching first result for query: {query} with data: {data}")
+        row = await self._conn.fetchrow(_to_positional(query), *(data or ()))
+        return None if row is None else dict(row)
+
+    async def all(self, query: str, data: Optional[Union[Tuple, list]] = None) -> List[dict]:
+        self._logger.info(f"Fetching all results for query: {query}")
+        return [dict(row) for row in await self._conn.fetch(_to_positional(query), *(data or ()))]
+
+    async def execute_values(self, query: str, rows: List[Tuple], page_size: int = 1000) -> None:
+        """
+        Same as `Db.execute_values`: the single `VALUES %s` placeholder is
+        expanded to `page_size` rows per statement. The pages are sent in one
+        transaction.
+        """
+        if len(rows) == 0:
+            return
+
+        self._logger.info(f"Executing query: {query} with {len(rows)} rows")
+        async with self._conn.transaction():
+            for i in range(0, len(rows), page_size):
+                page = rows[i:i + page_size]
+                width = len(page[0])
+                values = ', '.join(
+                    '(' + ', '.join(f'${r * width + c + 1}' for c in range(width)) + ')' for r in range(len(page)))
+                await self._conn.execute(query.replace('%s', values, 1), *[x for row in page for x in row])
+
+    async def bulk_upsert(self, table: str, columns: Sequence[str], rows: List[Tuple],
+                          conflict_columns: Sequence[str] = (), on_conflict: str = 'DO NOTHING',
+                          method: Optional[Literal['copy', 'values']] = None) -> None:
+        """
+        Same as `Db.bulk_upsert`, the `copy` method uses asyncpg's binary
+        `COPY` (`copy_records_to_table`). Runs in one transaction.
+        """
+        if len(conflict_columns) > 0:
+            rows = _last_per_key(rows, [list(columns).index(x) for x in conflict_columns])
+        if len(rows) == 0:
+            return
+
+        method = method or os.getenv('DB_BULK_METHOD', 'copy')
+        column_list = ', '.join(columns)
+        conflict = f'ON CONFLICT ({", ".join(conflict_columns)}) {on_conflict}' if len(conflict_columns) > 0 else ''
+
+        if method == 'values':
+            await self.execute_values(f'INSERT INTO {table}({column_list}) VALUES %s {conflict}', rows)
+            return
+
+        staging = f'_bulk_{table}'
+        self._logger.info(f"Copying {len(rows)} rows into {table}")
+        async with self._conn.transaction():
+            # Left over when the call is part of an enclosing transaction.
+            await self._conn.execute(f'DROP TABLE IF EXISTS {staging}')
+            await self._conn.execute(f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS '
+                                     f'SELECT {column_list} FROM {table} WITH NO DATA')
+            await self._conn.copy_records_to_table(staging, records=rows, columns=list(columns))
+            await self._conn.execute(
+                f'INSERT INTO {table}({column_list}) SELECT {column_list} FROM {staging} {conflict}')
+
+
+def _to_positional(query: str) -> str:
+    """Translates the `%s` placeholders of a psycopg2 query to asyncpg's `$1`, `$2`, ..."""
+    counter = iter(range(1, query.count('%s') + 1))
+    return re.sub(r'%s', lambda _: f'${next(counter)}', query).replace('%%', '%')
@@ -0,0 +1,172 @@
+import json
+import logging
+import statistics
+import time
+from typing import Callable, Dict, List, Literal, Optional, Tuple
+
+from database.db import Db
+
+# The columns that identify an entry of each cache table, i.e., what a cache hit looks up.
+_KEY_COLUMNS = {
+    'cve_cache': ('cve_id', 'source'),
+    'llm_evaluator_cache': ('llm', 'cve_id', 'decision_point'),
+}
+
+_FIRST_ID = '00000000-0000-0000-0000-000000000000'
+
+
+class CacheCompactor:
+    """
+    Rewrites the `data` of a cache table in batches of `batch_size` rows, so
+    that values stored before the column was switched to lz4 compression
+    (see migration 0011) are recompressed. Every batch is committed on its
+    own, so the table stays online and an interrupted run can simply be
+    restarted: values that are already lz4-compressed are skipped.
+
+    With `project`, the payload of every row is first passed through it
+    (e.g., `app.data_sources.projections.project`) and rewritten if it
+    changed. Only `cve_cache` rows are projected.
+
+    A rewritten row has its `modified_time` refreshed, which postpones its
+    revalidation (see `CveDataSource._ttl`) by up to one ttl.
+
+    Examples:
+        >>> compactor = CacheCompactor('cve_cache', project=project)
+        >>> compactor.report()
+        >>> {'total_bytes': 9153773568, 'toast_bytes': 7740137472, 'compression_pglz': 612488, ...}
+        >>> compactor.compact()
+        >>> {'rows': 1000000, 'projected': 402011, 'recompressed': 210477}
+    """
+
+    def __init__(
+            self,
+            table: Literal['cve_cache', 'llm_evaluator_cache'],
+            batch_size: int = 1000,
+            project: Optional[Callable[[str, dict], dict]] = None):
+        self._table = table
+        self._batch_size = batch_size
+        self._project = project if table == 'cve_cache' else None
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def compact(self) -> Dict[str, int]:
+        stats = {'rows': 0, 'projected': 0, 'recompressed': 0}
+
+        if self._project is not None:
+            self._for_each_batch(self._project_batch, stats)
+
+        self._for_each_batch(self._recompress_batch, stats)
+
+        self._logger.info(f'Compaction of {self._table} finished: {stats}')
+        return stats
+
+    def report(self, sample_size: int = 1000) -> Dict[str, float]:
+        """
+        The size of the table (heap, toast and indexes), how its values are
+        compressed, and the latency of a cache hit (the lookup by key plus
+        parsing the payload) over a random sample of entries.
+        """
+        key_columns = _KEY_COLUMNS[self._table]
+
+        with Db() as db:
+            report = db.first(
+                """
+                SELECT pg_total_relation_size(c.oid)                         AS total_bytes,
+                       pg_relation_size(c.oid)                               AS heap_bytes,
+                       COALESCE(pg_total_relation_size(c.reltoastrelid), 0) AS toast_bytes,
+                       pg_indexes_size(c.oid)                                AS index_bytes
+                FROM pg_class c
+                WHERE c.relname = %s
+                """,
+                (self._table,))
+
+            for row in db.all(f'SELECT pg_column_compression(data) AS method, count(*) AS rows '
+                              f'FROM {self._table} GROUP BY 1'):
+                report[f'compression_{row["method"] or "none"}'] = row['rows']
+
+            keys = [tuple(x[k] for k in key_columns) for x in db.all(
+                f'SELECT {", ".join(key_columns)} FROM {self._table} ORDER BY random() LIMIT %s', (sample_size,))]
+
+        lookup = f'SELECT data FROM {self._table} WHERE {" AND ".join(f"{k} = %s" for k in key_columns)}'
+        timings = []
+        with Db() as db:
+            for key in keys:
+                start = time.perf_counter()
+                row = db.first(lookup, key)
+                if row is None or row['data'] is None:
+                    continue
+                json.loads(row['data'])
+                timings.append(time.perf_counter() - start)
+
+        if len(timings) > 0:
+            timings.sort()
+            report['read_p50_ms'] = statistics.median(timings) * 1000
+            report['read_p95_ms'] = timings[max(0, int(len(timings) * 0.95) - 1)] * 1000
+
+        self._logger.info(f'Storage report of {self._table}: {report}')
+        return report
+
+    @staticmethod
+    def _for_each_batch(process: Callable[[str, Dict[str, int]], Optional[str]], stats: Dict[str, int]):
+        last_id = _FIRST_ID
+        while last_id is not None:
+            last_id = process(last_id, stats)
+
+    def _project_batch(self, after_id: str, stats: Dict[str, int]) -> Optional[str]:
+        with Db() as db:
+            rows = db.all(f'SELECT id, source, data FROM {self._table} WHERE id > %s ORDER BY id LIMIT %s',
+                          (after_id, self._batch_size))
+
+        if len(rows) == 0:
+            return None
+
+        changed: List[Tuple] = []
+        for row in rows:
+            if row['data'] is None:
+                continue
+
+            data = json.loads(row['data'])
+            projected = self._project(row['source'], data)
+            if projected != data:
+                changed.append((str(row['id']), json.dumps(projected)))
+
+        with Db() as db:
+            db.execute_values(
+                f"""
+                UPDATE {self._table} AS t SET data = v.data
+                FROM (VALUES %s) AS v(id, data)
+                WHERE t.id = v.id::uuid
+                """,
+                changed)
+
+        stats['projected'] += len(changed)
+        self._logger.info(f'Projected a batch of {len(rows)} {self._table} rows: {stats}')
+        return str(rows[-1]['id'])
+
+    def _recompress_batch(self, after_id: str, stats: Dict[str, int]) -> Optional[str]:
+        # Concatenating an empty string produces a new value, which is
+        # compressed with the column's current method; assigning the value
+        # as is would keep the existing pglz-compressed datum.
+        with Db() as db:
+            result = db.first(
+                f"""
+                WITH batch AS (SELECT id FROM {self._table} WHERE id > %s ORDER BY id LIMIT %s),
+                     rewritten AS (
+                         UPDATE {self._table} AS t SET data = t.data || ''
+                         FROM batch
+                         WHERE t.id = batch.id AND pg_column_compression(t.data) = 'pglz'
+                         RETURNING t.id)
+                SELECT (SELECT id FROM batch ORDER BY id DESC LIMIT 1) AS last_id,
+                       (SELECT count(*) FROM batch)                     AS rows,
+                       (SELECT count(*) FROM rewritten)                 AS rewritten
+                """,
+                (after_id, self._batch_size))
+            db.commit()
+
+        if result['last_id'] is None:
+            return None
+
+        stats['rows'] += result['rows']
+        stats['recompressed'] += result['rewritten']
+        self._logger.info(f'Recompressed a batch of {result["rows"]} {self._table} rows: {stats}')
+        return str(result['last_id'])
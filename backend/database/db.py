@@ -1,11 +1,12 @@
+import io
 import os
 import time
 import logging
-from typing import Optional, Tuple, Union
+from typing import Optional, Tuple, Union, List, Sequence, Literal, Iterable, Iterator
 import pandas as pd
 import psycopg2
 import pytz
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 from psycopg2 import pool
 
 
@@ -179,6 +180,107 @@ class Db:
             self._logger.error(f"Error fetching first result: {e}")
             raise
 
+    def execute_values(self, query: str, rows: List[Tuple], page_size: int = 1000) -> None:
+        """
+        Execute a multi-row statement, e.g., `INSERT INTO t(a, b) VALUES %s`,
+        expanding the single `%s` placeholder to `page_size` rows per
+        round trip, and commit once all rows have been sent.
+
+        Args:
+            query: SQL query string with a single `VALUES %s` placeholder
+            rows: The rows to substitute into the query
+            page_size: Maximum number of rows sent per statement (default: 1000)
+
+        Raises:
+            Exception: If query execution fails
+        """
+        if len(rows) == 0:
+            return
+
+        try:
+            self._check_connection()
+            self._logger.info(f"Executing query: {query} with {len(rows)} rows")
+            execute_values(self._cur, query, rows, page_size=page_size)
+            self._conn.commit()
+        except Exception as e:
+            self._conn.rollback()
+            self._logger.error(f"Error executing multi-row query: {e}")
+            raise
+
+    def bulk_upsert(self, table: str, columns: Sequence[str], rows: List[Tuple],
+                    conflict_columns: Sequence[str] = (), on_conflict: str = 'DO NOTHING',
+                    method: Optional[Literal['copy', 'values']] = None) -> None:
+        """
+        Insert many rows with a single commit, resolving conflicts on
+        `conflict_columns` with the `on_conflict` action, e.g.,
+        `DO UPDATE SET data = EXCLUDED.data`. When a key appears more than
+        once in `rows`, the last row wins.
+
+        With the `copy` method (the default, see `DB_BULK_METHOD`) the rows
+        are streamed with `COPY` into a temporary table and merged with an
+        `INSERT ... SELECT ... ON CONFLICT`; the `values` method sends them
+        with `execute_values` instead.
+
+        Args:
+            table: The table to insert into
+            columns: The columns of the rows
+            rows: The rows to insert
+            conflict_columns: The columns of the unique index the rows may conflict on (default: a plain insert)
+            on_conflict: The conflict action (default: DO NOTHING)
+            method: `copy` or `values` (default: the `DB_BULK_METHOD` environment variable, or `copy`)
+
+        Raises:
+            Exception: If query execution fails
+        """
+        if len(conflict_columns) > 0:
+            rows = _last_per_key(rows, [list(columns).index(x) for x in conflict_columns])
+        if len(rows) == 0:
+            return
+
+        method = method or os.getenv('DB_BULK_METHOD', 'copy')
+        column_list = ', '.join(columns)
+        conflict = f'ON CONFLICT ({", ".join(conflict_columns)}) {on_conflict}' if len(conflict_columns) > 0 else ''
+
+        if method == 'values':
+            self.execute_values(f'INSERT INTO {table}({column_list}) VALUES %s {conflict}', rows)
+            return
+
+        staging = f'_bulk_{table}'
+        try:
+            self._check_connection()
+            self._logger.info(f"Copying {len(rows)} rows into {table}")
+            self._cur.execute(f'DROP TABLE IF EXISTS {staging}')
+            self._cur.execute(f'CREATE TEMP TABLE {staging} ON COMMIT DROP AS '
+                              f'SELECT {column_list} FROM {table} WITH NO DATA')
+            self._cur.copy_expert(f'COPY {staging}({column_list}) FROM STDIN', _CopyStream(rows))
+            self._cur.execute(f'INSERT INTO {table}({column_list}) SELECT {column_list} FROM {staging} {conflict}')
+            self._conn.commit()
+        except Exception as e:
+            self._conn.rollback()
+            self._logger.error(f"Error copying rows into {table}: {e}")
+            raise
+
+    def all(self, query: str, data: Optional[Union[Tuple, list]] = None) -> List[dict]:
+        """
+        Execute a query and return all results as a list of dictionaries.
+
+        Args:
+            query: SQL query string with optional placeholders
+            data: Parameters to substitute into the query (default: None)
+
+        Returns:
+            List[dict]: All rows as dictionaries
+        """
+        data = data or ()
+        try:
+            self._check_connection()
+            self._logger.info(f"Fetching all results for query: {query}")
+            self._cur.execute(query, data)
+            return [self._process_row(dict(row)) for row in self._cur.fetchall()]
+        except Exception as e:
+            self._logger.error(f"Error fetching all results: {e}")
+            raise
+
     def query(self, query: str, data: Optional[Union[Tuple, list]] = None,
               index_column: Optional[str] = 'id') -> pd.DataFrame:
         """
@@ -280,3 +382,54 @@ class Db:
             else:
                 processed[key] = value
         return processed
+
+
+def _last_per_key(rows: List[Tuple], key_indexes: List[int]) -> List[Tuple]:
+    """
+    Drops the rows whose key appears again later, as a single `INSERT ... ON
+    CONFLICT DO UPDATE` cannot affect the same row twice.
+    """
+    return list({tuple(row[i] for i in key_indexes): row for row in rows}.values())
+
+
+def _copy_value(value) -> str:
+    """Formats a value for the text format of `COPY`."""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+class _CopyStream(io.TextIOBase):
+    """
+    A file-like view of rows in the text format of `COPY`, formatted as they
+    are read, so the rows are never held in memory as one large string.
+    """
+
+    def __init__(self, rows: Iterable[Tuple]):
+        self._lines: Iterator[str] = ('\t'.join(_copy_value(x) for x in row) + '\n' for row in rows)
+        self._buffer = ''
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        chunks = [self._buffer]
+        length = len(self._buffer)
+
+        for line in self._lines:
+            chunks.append(line)
+            length += len(line)
+            if 0 <= size <= length:
+                break
+
+        data = ''.join(chunks)
+        if size < 0:
+            self._buffer = ''
+            return data
+
+        self._buffer = data[size:]
+        return data[:size]
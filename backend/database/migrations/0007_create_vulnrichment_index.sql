@@ -0,0 +1,20 @@
+CREATE TABLE vulnrichment_index
+(
+    id            UUID PRIMARY KEY     DEFAULT gen_random_uuid(),
+    created_time  TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    modified_time TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    cve_id        VARCHAR(32) NOT NULL,
+    year          VARCHAR(4)  NOT NULL,
+    cve_group     VARCHAR(16) NOT NULL,
+    blob_hash     VARCHAR(40) NOT NULL,
+    data          TEXT
+);
+
+CREATE UNIQUE INDEX idx_vulnrichment_index_cve_id ON vulnrichment_index (cve_id);
+CREATE INDEX idx_vulnrichment_index_year_cve_group ON vulnrichment_index (year, cve_group);
+
+CREATE TRIGGER vulnrichment_index_update_modified_time
+    BEFORE UPDATE
+    ON vulnrichment_index
+    FOR EACH ROW
+EXECUTE FUNCTION update_modified_column();
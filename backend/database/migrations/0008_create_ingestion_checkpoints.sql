@@ -0,0 +1,16 @@
+CREATE TABLE ingestion_checkpoints
+(
+    id            UUID PRIMARY KEY      DEFAULT gen_random_uuid(),
+    created_time  TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    modified_time TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    source        VARCHAR(128) NOT NULL,
+    state         JSONB        NOT NULL
+);
+
+CREATE UNIQUE INDEX idx_ingestion_checkpoints_source ON ingestion_checkpoints (source);
+
+CREATE TRIGGER ingestion_checkpoints_update_modified_time
+    BEFORE UPDATE
+    ON ingestion_checkpoints
+    FOR EACH ROW
+EXECUTE FUNCTION update_modified_column();
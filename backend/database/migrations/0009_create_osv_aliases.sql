@@ -0,0 +1,10 @@
+CREATE TABLE osv_aliases
+(
+    id           UUID PRIMARY KEY     DEFAULT gen_random_uuid(),
+    created_time TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    alias        VARCHAR(64) NOT NULL,
+    osv_id       VARCHAR(64) NOT NULL
+);
+
+CREATE UNIQUE INDEX idx_osv_aliases_alias_osv_id ON osv_aliases (alias, osv_id);
+CREATE INDEX idx_osv_aliases_osv_id ON osv_aliases (osv_id);
@@ -0,0 +1,16 @@
+CREATE TABLE cve_cache_misses
+(
+    id            UUID PRIMARY KEY      DEFAULT gen_random_uuid(),
+    created_time  TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    modified_time TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    cve_id        VARCHAR(32)  NOT NULL,
+    source        VARCHAR(128) NOT NULL
+);
+
+CREATE UNIQUE INDEX idx_cve_cache_misses_cve_id_source ON cve_cache_misses (cve_id, source);
+
+CREATE TRIGGER cve_cache_misses_update_modified_time
+    BEFORE UPDATE
+    ON cve_cache_misses
+    FOR EACH ROW
+EXECUTE FUNCTION update_modified_column();
@@ -0,0 +1,7 @@
+-- Only affects values written from now on, existing values are recompressed
+-- in batches by `CacheCompactor`.
+ALTER TABLE cve_cache
+    ALTER COLUMN data SET COMPRESSION lz4;
+
+ALTER TABLE llm_evaluator_cache
+    ALTER COLUMN data SET COMPRESSION lz4;
@@ -0,0 +1,27 @@
+CREATE TABLE cve_cvss
+(
+    id            UUID PRIMARY KEY      DEFAULT gen_random_uuid(),
+    created_time  TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    modified_time TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    cve_id        VARCHAR(32)  NOT NULL,
+    version       VARCHAR(8)   NOT NULL,
+    vector        VARCHAR(255) NOT NULL,
+    av            CHAR(1),
+    ac            CHAR(1),
+    pr            CHAR(1),
+    ui            CHAR(1),
+    s             CHAR(1),
+    vc            CHAR(1),
+    vi            CHAR(1),
+    va            CHAR(1)
+);
+
+CREATE UNIQUE INDEX idx_cve_cvss_cve_id ON cve_cvss (cve_id);
+CREATE INDEX idx_cve_cvss_av_pr_ui ON cve_cvss (av, pr, ui);
+
+
+CREATE TRIGGER cve_cvss_update_modified_time
+    BEFORE UPDATE
+    ON cve_cvss
+    FOR EACH ROW
+EXECUTE FUNCTION update_modified_column();
@@ -0,0 +1,22 @@
+import json
+from typing import Optional
+
+from database.db import Db
+
+
+def load_checkpoint(source: str) -> Optional[dict]:
+    """Returns the last persisted ingestion state of the given source, if any."""
+    with Db() as db:
+        row = db.first('SELECT state FROM ingestion_checkpoints WHERE source = %s', (source,))
+
+    return None if row is None else row['state']
+
+
+def save_checkpoint(source: str, state: dict) -> None:
+    with Db() as db:
+        db.execute(
+            """
+            INSERT INTO ingestion_checkpoints(source, state) VALUES (%s, %s)
+            ON CONFLICT (source) DO UPDATE SET state = EXCLUDED.state;
+            """,
+            (source, json.dumps(state)))
@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, Tuple
+
+from app.data_sources.cvss_index import CVSS_ON_CONFLICT, CVSS_ROW_COLUMNS, split_cvss_rows
+from app.data_sources.projections import projection_enabled, project
+from database.db import Db
+from importers.checkpoints import load_checkpoint, save_checkpoint
+from utils import get_session, make_request
+
+_NIST_API_URL = 'https://services.nvd.nist.gov/rest/json/cves/2.0'
+
+# The NVD api rejects date ranges longer than 120 days.
+_MAX_WINDOW = timedelta(days=120)
+
+
+class NistBulkSyncer:
+    """
+    Keeps the `nist` entries of `cve_cache` in sync with the NVD 2.0 api by
+    paging through `lastModStartDate`/`lastModEndDate` windows. The position
+    inside the current window and the high-water mark (the end of the last
+    fully synced window) are persisted after every page, so a crashed sync
+    resumes from the page it was on.
+
+    The api url can be overridden through `NIST_API_URL`, e.g., to point the
+    syncer to a local stub.
+
+    Examples:
+        >>> NistBulkSyncer().sync()
+        >>> {'pages': 14, 'received': 26113, 'windows': 1}
+    """
+
+    checkpoint_name = 'nist_bulk_sync'
+
+    def __init__(
+            self,
+            base_url: Optional[str] = None,
+            api_key: Optional[str] = None,
+            page_size: int = 2000,
+            window: timedelta = _MAX_WINDOW,
+            start_date: datetime = datetime(1999, 1, 1, tzinfo=timezone.utc)):
+        self._base_url = base_url or os.getenv('NIST_API_URL', _NIST_API_URL)
+        self._api_key = api_key or os.getenv('NIST_API_KEY')
+        self._page_size = page_size
+        self._window = min(window, _MAX_WINDOW)
+        self._start_date = start_date
+
+        # The NVD quota is enforced by the rate limiter of the shared session.
+        self._session = get_session()
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def sync(self, until: Optional[datetime] = None) -> Dict[str, int]:
+        until = until or datetime.now(timezone.utc)
+        state = load_checkpoint(self.checkpoint_name) or {
+            'high_water_mark': self._start_date.isoformat(),
+            'start_index': 0
+        }
+
+        stats = {'windows': 0, 'pages': 0, 'received': 0}
+
+        window_start = datetime.fromisoformat(state['high_water_mark'])
+        start_index = state['start_index']
+
+        while window_start < until:
+            window_end = min(window_start + self._window, until)
+
+            done = False
+            while not done:
+                page = self._fetch_page(window_start, window_end, start_index)
+                vulnerabilities = [x['cve'] for x in page.get('vulnerabilities', [])]
+
+                self._upsert(vulnerabilities)
+
+                start_index += len(vulnerabilities)
+                stats['pages'] += 1
+                stats['received'] += len(vulnerabilities)
+
+                done = len(vulnerabilities) == 0 or start_index >= page.get('totalResults', 0)
+                if not done:
+                    save_checkpoint(self.checkpoint_name,
+                                    {'high_water_mark': window_start.isoformat(), 'start_index': start_index})
+
+            # The window is fully synced, move the high-water mark past it.
+            window_start, start_index = window_end, 0
+            save_checkpoint(self.checkpoint_name, {'high_water_mark': window_start.isoformat(), 'start_index': 0})
+            stats['windows'] += 1
+
+            self._logger.info(f'Synced NVD changes up to {window_start.isoformat()}: {stats}')
+
+        return stats
+
+    def _fetch_page(self, window_start: datetime, window_end: datetime, start_index: int) -> dict:
+        query = '&'.join([
+            f'lastModStartDate={_format_date(window_start)}',
+            f'lastModEndDate={_format_date(window_end)}',
+            f'resultsPerPage={self._page_size}',
+            f'startIndex={start_index}'
+        ])
+        headers = {} if self._api_key is None else {'apiKey': self._api_key}
+
+        response = make_request(self._session, f'{self._base_url}?{query}', headers=headers,
+                                logger=self._logger, timeout=120)
+        return response.json()
+
+    @staticmethod
+    def _upsert(vulnerabilities: List[dict]):
+        if projection_enabled():
+            vulnerabilities = [project('nist', x) for x in vulnerabilities]
+
+        rows: List[Tuple] = [(x['id'].upper(), 'nist', json.dumps(x)) for x in vulnerabilities]
+
+        # Unchanged records are rewritten too, the update refreshes their
+        # modified_time, so the data source does not see them as stale.
+        with Db() as db:
+            db.bulk_upsert('cve_cache', ['cve_id', 'source', 'data'], rows, ['cve_id', 'source'],
+                           'DO UPDATE SET data = EXCLUDED.data')
+
+            cvss, vectorless = split_cvss_rows({x['id'].upper(): x for x in vulnerabilities})
+            db.bulk_upsert('cve_cvss', CVSS_ROW_COLUMNS, cvss, ['cve_id'], CVSS_ON_CONFLICT)
+
+            # A changed record may have lost its vector, e.g., a rejected cve.
+            if len(vectorless) > 0:
+                db.execute('DELETE FROM cve_cvss WHERE cve_id = ANY(%s)', (vectorless,))
+
+
+def _format_date(date: datetime) -> str:
+    # NVD expects an extended ISO-8601 timestamp, the `+` of the offset must be escaped.
+    return date.isoformat(timespec='milliseconds').replace('+', '%2B')
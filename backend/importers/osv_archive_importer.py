@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import Dict, List, Tuple, IO
+from urllib.parse import quote
+
+from app.data_sources.projections import projection_enabled, project
+from database.db import Db
+from importers.checkpoints import load_checkpoint, save_checkpoint
+from utils import http_get
+
+_OSV_EXPORT_URL = 'https://osv-vulnerabilities.storage.googleapis.com'
+
+
+class OsvArchiveImporter:
+    """
+    Loads an OSV ecosystem export (`<ecosystem>/all.zip`) into `cve_cache`.
+    Entries are decompressed one at a time straight from the archive and
+    written in batches, so memory stays bounded by `batch_size` regardless
+    of the size of the ecosystem. The id of every entry and all of its
+    aliases are recorded in `osv_aliases`, which lets GO-, PYSEC-, GHSA- and
+    CVE- ids resolve to the entry locally. The position in the archive is
+    checkpointed after every batch, so a crashed import resumes from there.
+
+    Examples:
+        >>> OsvArchiveImporter('PyPI').ingest()
+        >>> {'entries': 16204, 'aliases': 41873}
+        >>> OsvArchiveImporter('/data/osv/Go/all.zip').ingest()
+    """
+
+    def __init__(self, ecosystem_or_path: str, batch_size: int = 1000):
+        self._source = ecosystem_or_path
+        self._batch_size = batch_size
+        self.checkpoint_name = f'osv_archive:{ecosystem_or_path}'
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def ingest(self) -> Dict[str, int]:
+        stats = {'entries': 0, 'aliases': 0}
+        projection = projection_enabled()
+
+        with self._open_archive() as file, zipfile.ZipFile(file) as archive:
+            members = [x for x in archive.infolist() if not x.is_dir() and x.filename.endswith('.json')]
+
+            # A crashed import resumes after the last written batch, unless
+            # a newer export (with other entries) is being imported.
+            archive_id = hashlib.sha1(''.join(f'{x.filename}:{x.CRC};' for x in members).encode()).hexdigest()
+            state = load_checkpoint(self.checkpoint_name) or {}
+            position = state['position'] if state.get('archive') == archive_id else 0
+            if position > 0:
+                self._logger.info(f'Resuming the OSV import of {self._source} at entry {position}/{len(members)}.')
+
+            cache_rows: List[Tuple] = []
+            alias_rows: Dict[Tuple, None] = dict()
+
+            for position, info in enumerate(members[position:], start=position + 1):
+                with archive.open(info) as member:
+                    try:
+                        entry = json.load(member)
+                    except ValueError as e:
+                        self._logger.error(f'Could not parse {info.filename}. {e}')
+                        continue
+
+                osv_id = entry['id'].upper()
+                cache_rows.append((osv_id, 'osv', json.dumps(project('osv', entry) if projection else entry)))
+                for alias in [osv_id] + [x.upper() for x in entry.get('aliases', [])]:
+                    alias_rows[(alias, osv_id)] = None
+
+                if len(cache_rows) >= self._batch_size:
+                    self._flush(cache_rows, list(alias_rows), stats)
+                    save_checkpoint(self.checkpoint_name, {'archive': archive_id, 'position': position})
+                    cache_rows.clear()
+                    alias_rows.clear()
+
+            self._flush(cache_rows, list(alias_rows), stats)
+
+            # The next import starts from the beginning of the (next) export.
+            save_checkpoint(self.checkpoint_name, {'archive': archive_id, 'position': 0})
+
+        self._logger.info(f'OSV import of {self._source} finished: {stats}')
+        return stats
+
+    def _flush(self, cache_rows: List[Tuple], alias_rows: List[Tuple], stats: Dict[str, int]):
+        if len(cache_rows) == 0:
+            return
+
+        with Db() as db:
+            db.bulk_upsert('cve_cache', ['cve_id', 'source', 'data'], cache_rows, ['cve_id', 'source'],
+                           'DO UPDATE SET data = EXCLUDED.data')
+            db.bulk_upsert('osv_aliases', ['alias', 'osv_id'], alias_rows, ['alias', 'osv_id'])
+
+        stats['entries'] += len(cache_rows)
+        stats['aliases'] += len(alias_rows)
+        self._logger.info(f'Imported a batch of {len(cache_rows)} OSV entries: {stats}')
+
+    def _open_archive(self) -> IO[bytes]:
+        if os.path.exists(self._source):
+            return open(self._source, 'rb')
+
+        # Zip archives need random access to their central directory, so the
+        # download is spooled to an anonymous temporary file (never extracted).
+        url = f'{_OSV_EXPORT_URL}/{quote(self._source)}/all.zip'
+        file = tempfile.TemporaryFile()
+        with http_get(url, stream=True, timeout=60, logger=self._logger) as response:
+            response.raise_for_status()
+            shutil.copyfileobj(response.raw, file, length=1024 * 1024)
+
+        file.seek(0)
+        return file
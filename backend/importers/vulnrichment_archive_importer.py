@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import re
+import tarfile
+import zipfile
+from typing import Iterator, Tuple, List, Dict
+
+from app.data_sources.cisa_vulnrichment_cve_data_source import extract_data_from_vulnrichment_json, \
+    vulnrichment_cve_url
+from database.db import Db
+from utils import http_get
+
+_CVE_FILE_PATTERN = re.compile(r'(?:^|/)(\d{4})/(\w+)/(CVE-\d{4}-\d+)\.json$', re.IGNORECASE)
+
+
+def git_blob_hash(content: bytes) -> str:
+    """
+    Computes the hash git assigns to a file with the given content, which
+    lets us compare archive members against the repository tree without
+    keeping the previous archive around.
+    """
+    return hashlib.sha1(b'blob %d\0' % len(content) + content).hexdigest()
+
+
+class VulnrichmentArchiveImporter:
+    """
+    Mirrors the cisagov/vulnrichment repository into `cve_cache` from a
+    repository archive (a tarball or a zip, given as a local path or, for
+    tarballs, as a url). Archive members are streamed one at a time and
+    only files whose git blob hash changed since the last import are parsed
+    and written, so re-ingesting a newer archive is cheap.
+
+    Examples:
+        >>> importer = VulnrichmentArchiveImporter('vulnrichment-develop.tar.gz')
+        >>> importer.ingest()
+        >>> {'scanned': 52311, 'changed': 118, 'cached': 117, 'removed': 1}
+    """
+
+    def __init__(self, archive: str, batch_size: int = 1000):
+        self._archive = archive
+        self._batch_size = batch_size
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def ingest(self) -> Dict[str, int]:
+        with Db() as db:
+            known_hashes = {x['cve_id']: x['blob_hash']
+                            for x in db.all('SELECT cve_id, blob_hash FROM vulnrichment_index')}
+
+        stats = {'scanned': 0, 'changed': 0, 'cached': 0, 'removed': 0}
+        index_rows: List[Tuple] = []
+        cache_rows: List[Tuple] = []
+        removed: List[str] = []
+        seen = set()
+
+        for path, content in self._iterate_members():
+            match = _CVE_FILE_PATTERN.search(path)
+            if match is None:
+                continue
+
+            stats['scanned'] += 1
+            year, group, cve_id = match.group(1), match.group(2), match.group(3).upper()
+            seen.add(cve_id)
+
+            blob_hash = git_blob_hash(content)
+            if known_hashes.get(cve_id) == blob_hash:
+                continue
+
+            stats['changed'] += 1
+
+            try:
+                cve_url = vulnrichment_cve_url(year, group, cve_id)
+                data = extract_data_from_vulnrichment_json(json.loads(content), cve_url)
+            except (ValueError, KeyError, TypeError, AttributeError, IndexError) as e:
+                self._logger.error(f'Could not parse {path}. {e}')
+                data = None
+
+            data = None if data is None else json.dumps(data)
+            index_rows.append((cve_id, year, group, blob_hash, data))
+
+            if data is None:
+                removed.append(cve_id)
+            else:
+                cache_rows.append((cve_id, 'vulnrichment', data))
+
+            if len(index_rows) >= self._batch_size:
+                self._flush(index_rows, cache_rows, removed, stats)
+
+        self._flush(index_rows, cache_rows, removed, stats)
+
+        # Only a fully read archive tells which files were removed upstream.
+        if stats['scanned'] > 0:
+            self._remove([x for x in known_hashes if x not in seen], stats)
+
+        self._logger.info(f'Vulnrichment import finished: {stats}')
+        return stats
+
+    def _flush(self, index_rows: List[Tuple], cache_rows: List[Tuple], removed: List[str], stats: Dict[str, int]):
+        if len(index_rows) == 0:
+            return
+
+        with Db() as db:
+            db.bulk_upsert('cve_cache', ['cve_id', 'source', 'data'], cache_rows, ['cve_id', 'source'],
+                           'DO UPDATE SET data = EXCLUDED.data')
+
+            if len(removed) > 0:
+                db.execute('DELETE FROM cve_cache WHERE cve_id = ANY(%s) AND source = %s', (removed, 'vulnrichment'))
+
+            # The index is written last, so an interrupted import re-processes the batch.
+            db.bulk_upsert('vulnrichment_index', ['cve_id', 'year', 'cve_group', 'blob_hash', 'data'], index_rows,
+                           ['cve_id'], 'DO UPDATE SET year = EXCLUDED.year, cve_group = EXCLUDED.cve_group, '
+                                       'blob_hash = EXCLUDED.blob_hash, data = EXCLUDED.data')
+
+        stats['cached'] += len(cache_rows)
+        stats['removed'] += len(removed)
+        self._logger.info(f'Imported a batch of {len(index_rows)} vulnrichment files: {stats}')
+
+        index_rows.clear()
+        cache_rows.clear()
+        removed.clear()
+
+    def _remove(self, cve_ids: List[str], stats: Dict[str, int]):
+        for i in range(0, len(cve_ids), self._batch_size):
+            batch = cve_ids[i:i + self._batch_size]
+            with Db() as db:
+                db.execute('DELETE FROM cve_cache WHERE cve_id = ANY(%s) AND source = %s', (batch, 'vulnrichment'))
+                db.execute('DELETE FROM vulnrichment_index WHERE cve_id = ANY(%s)', (batch,))
+
+            stats['removed'] += len(batch)
+
+        if len(cve_ids) > 0:
+            self._logger.info(f'Removed {len(cve_ids)} vulnrichment files that are no longer in the archive.')
+
+    def _iterate_members(self) -> Iterator[Tuple[str, bytes]]:
+        if self._archive.startswith('http://') or self._archive.startswith('https://'):
+            with http_get(self._archive, stream=True, timeout=60, logger=self._logger) as response:
+                response.raise_for_status()
+                response.raw.decode_content = True
+                yield from self._iterate_tar(tarfile.open(fileobj=response.raw, mode='r|*'))
+
+        elif zipfile.is_zipfile(self._archive):
+            with zipfile.ZipFile(self._archive) as archive:
+                for info in archive.infolist():
+                    if not info.is_dir():
+                        yield info.filename, archive.read(info)
+
+        else:
+            yield from self._iterate_tar(tarfile.open(self._archive, mode='r|*'))
+
+    @staticmethod
+    def _iterate_tar(archive: tarfile.TarFile) -> Iterator[Tuple[str, bytes]]:
+        with archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+
+                file = archive.extractfile(member)
+                if file is not None:
+                    yield member.name, file.read()
+
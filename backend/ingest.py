@@ -0,0 +1,257 @@
+"""
+Fills the caches from the data sources, either for a list of ids or from the
+bulk feeds and archives of a source. Every ingestion checkpoints its progress
+in `ingestion_checkpoints`, so an interrupted run resumes where it stopped
+when the same command is run again.
+
+Examples:
+    python ingest.py ids nist cves.txt --concurrency 10
+    python ingest.py nist
+    python ingest.py osv --ecosystems PyPI Go
+    python ingest.py kev
+    python ingest.py vulnrichment
+    python ingest.py cvss-backfill
+    python ingest.py compact
+"""
+import argparse
+import hashlib
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+
+from database.db import Db
+from importers.checkpoints import load_checkpoint, save_checkpoint
+from utils import http_get
+
+_KEV_FEED_URL = 'https://www.cisa.gov/sites/default/files/feeds/known_exploited_vulnerabilities.json'
+_VULNRICHMENT_ARCHIVE_URL = 'https://github.com/cisagov/vulnrichment/archive/refs/heads/develop.tar.gz'
+_OSV_ECOSYSTEMS = ['PyPI', 'Go', 'npm', 'Maven', 'crates.io', 'Hackage']
+
+logger = logging.getLogger('ingest')
+
+
+class Progress:
+    """Logs the progress, throughput and remaining time of an ingestion at most every `interval` seconds."""
+
+    def __init__(self, label: str, total: int, done: int = 0, interval: float = 10):
+        self._label = label
+        self._total = total
+        self._done = done
+        self._initial = done
+        self._interval = interval
+
+        self._start = time.perf_counter()
+        self._reported_at = 0.0
+
+    def advance(self, count: int, **details):
+        self._done += count
+        elapsed = time.perf_counter() - self._start
+
+        if elapsed - self._reported_at < self._interval and self._done < self._total:
+            return
+
+        self._reported_at = elapsed
+        rate = (self._done - self._initial) / elapsed if elapsed > 0 else 0
+        eta = (self._total - self._done) / rate if rate > 0 else float('inf')
+        logger.info(f'{self._label}: {self._done}/{self._total} ({self._done / max(self._total, 1):.1%}), '
+                    f'{rate:.1f}/s, eta {eta:.0f}s'
+                    + ''.join(f', {k} {v}' for k, v in details.items()))
+
+
+def _data_source(source: str):
+    from app.data_sources.cisa_kev_cve_data_source import CisaKevCveDataSource
+    from app.data_sources.cisa_vulnrichment_cve_data_source import CisaVulnrichmentCveDataSource
+    from app.data_sources.nist_cve_data_source import NistCveDataSource
+    from app.data_sources.osv_cve_data_source import OsvCveDataSource
+
+    return {
+        'nist': NistCveDataSource,
+        'osv': OsvCveDataSource,
+        'kev': CisaKevCveDataSource,
+        'vulnrichment': CisaVulnrichmentCveDataSource,
+    }[source]()
+
+
+def _read_ids(path: str) -> List[str]:
+    """The first column of every line, deduplicated and sorted so that the order is the same on every run."""
+    with open(path) as f:
+        ids = {line.split()[0].upper() for line in f if line.strip() != '' and not line.startswith('#')}
+
+    return sorted(ids)
+
+
+def ingest_ids(source: str, path: str, batch_size: int = 500, concurrency: int = 16,
+               reload: bool = False, restart: bool = False) -> Dict[str, int]:
+    """
+    Loads the ids listed in `path` from `source` in batches of `batch_size`,
+    `concurrency` at a time (see `CveDataSource.load_many`). Every batch is
+    written with a single insert, and the position in the list is
+    checkpointed after it; the checkpoint is specific to the list.
+    """
+    ids = _read_ids(path)
+    digest = hashlib.sha1('\n'.join(ids).encode()).hexdigest()[:16]
+    checkpoint_name = f'ingest_ids:{source}:{digest}'
+
+    state = None if restart else load_checkpoint(checkpoint_name)
+    position = 0 if state is None else state['position']
+    if position > 0:
+        logger.info(f'Resuming the ingestion of {path} from {source} at {position}/{len(ids)}.')
+
+    data_source = _data_source(source)
+    progress = Progress(f'{source} ids', len(ids), position)
+    stats = {'loaded': 0, 'found': 0}
+
+    while position < len(ids):
+        batch = ids[position:position + batch_size]
+        loaded = data_source.load_many(batch, reload=reload, max_workers=concurrency)
+
+        position += len(batch)
+        stats['loaded'] += len(batch)
+        stats['found'] += sum(1 for x in loaded.values() if x is not None)
+        save_checkpoint(checkpoint_name, {'position': position, 'total': len(ids)})
+
+        progress.advance(len(batch), found=stats['found'])
+
+    return stats
+
+
+def ingest_kev(batch_size: int = 1000, restart: bool = False) -> Dict[str, int]:
+    """
+    Writes every entry of the KEV feed to `cve_cache`, in batches, and
+    updates the stored evaluations of the cves added since the previous
+    catalog (see `run_kev_reevaluation`). The catalog version is
+    checkpointed, an unchanged catalog is skipped.
+    """
+    response = http_get(_KEV_FEED_URL, timeout=60, logger=logger)
+    response.raise_for_status()
+    feed = response.json()
+
+    state = None if restart else load_checkpoint('ingest_kev')
+    if state is not None and state.get('catalog_version') == feed.get('catalogVersion'):
+        logger.info(f'KEV catalog {feed.get("catalogVersion")} was already ingested.')
+        return {'entries': 0}
+
+    vulnerabilities = feed['vulnerabilities']
+    progress = Progress('kev', len(vulnerabilities))
+
+    for i in range(0, len(vulnerabilities), batch_size):
+        batch = vulnerabilities[i:i + batch_size]
+        with Db() as db:
+            db.bulk_upsert('cve_cache', ['cve_id', 'source', 'data'],
+                           [(x['cveID'].upper(), 'kev', json.dumps(x)) for x in batch], ['cve_id', 'source'],
+                           'DO UPDATE SET data = EXCLUDED.data WHERE cve_cache.data IS DISTINCT FROM EXCLUDED.data')
+        progress.advance(len(batch))
+
+    # Before the checkpoint, so that a failed re-evaluation is retried with the same catalog.
+    from ssvc.kev_reevaluation import run_kev_reevaluation
+    stats = run_kev_reevaluation([x['cveID'] for x in vulnerabilities])
+
+    save_checkpoint('ingest_kev', {'catalog_version': feed.get('catalogVersion')})
+    return {'entries': len(vulnerabilities), **{f'reevaluation.{k}': v for k, v in stats.items()}}
+
+
+def ingest_nist() -> Dict[str, int]:
+    from importers.nist_bulk_syncer import NistBulkSyncer
+
+    return NistBulkSyncer().sync()
+
+
+def ingest_osv(ecosystems: List[str], batch_size: int = 1000) -> Dict[str, int]:
+    from importers.osv_archive_importer import OsvArchiveImporter
+
+    stats = {'entries': 0, 'aliases': 0}
+    for ecosystem in ecosystems:
+        for key, value in OsvArchiveImporter(ecosystem, batch_size).ingest().items():
+            stats[key] += value
+
+    return stats
+
+
+def ingest_vulnrichment(archive: str = _VULNRICHMENT_ARCHIVE_URL, batch_size: int = 1000) -> Dict[str, int]:
+    from importers.vulnrichment_archive_importer import VulnrichmentArchiveImporter
+
+    # The blob hashes of `vulnrichment_index` are the checkpoint: the files
+    # written before an interruption are skipped by the next run.
+    return VulnrichmentArchiveImporter(archive, batch_size).ingest()
+
+
+def backfill_cvss(batch_size: int = 1000) -> Dict[str, int]:
+    from app.data_sources.cvss_index import backfill_cvss_index
+
+    return {'indexed': backfill_cvss_index(batch_size)}
+
+
+def compact_caches(batch_size: int = 1000) -> Dict[str, int]:
+    from app.data_sources.projections import projection_enabled, project
+    from database.cache_compactor import CacheCompactor
+
+    stats = dict()
+    for table in ['cve_cache', 'llm_evaluator_cache']:
+        compactor = CacheCompactor(table, batch_size, project=project if projection_enabled() else None)
+
+        before = compactor.report()
+        stats.update({f'{table}.{k}': v for k, v in compactor.compact().items()})
+        after = compactor.report()
+
+        for key in sorted(set(before) | set(after)):
+            logger.info(f'{table}.{key}: {before.get(key)} -> {after.get(key)}')
+
+    return stats
+
+
+def main(args: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Fills the caches from the data sources.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ids = commands.add_parser('ids', help='Load the ids listed in a file (one per line) from a data source.')
+    ids.add_argument('source', choices=['nist', 'osv', 'kev', 'vulnrichment'])
+    ids.add_argument('path')
+    ids.add_argument('--concurrency', type=int, default=16)
+    ids.add_argument('--reload', action='store_true', help='Refetch the ids that are already cached.')
+    ids.add_argument('--restart', action='store_true', help='Ignore the checkpoint of a previous run.')
+
+    commands.add_parser('nist', help='Sync the changes of the NVD api since the last sync.')
+
+    osv = commands.add_parser('osv', help='Import the OSV exports of the given ecosystems.')
+    osv.add_argument('--ecosystems', nargs='+', default=_OSV_ECOSYSTEMS)
+
+    kev = commands.add_parser('kev', help='Import the KEV catalog and re-evaluate the cves added to it.')
+    kev.add_argument('--restart', action='store_true', help='Import the catalog even if it was not updated.')
+
+    vulnrichment = commands.add_parser('vulnrichment', help='Mirror the vulnrichment repository.')
+    vulnrichment.add_argument('--archive', default=_VULNRICHMENT_ARCHIVE_URL)
+
+    commands.add_parser('cvss-backfill', help='Index the cvss of the cached nist records.')
+    commands.add_parser('compact', help='Recompress (and project) the cache tables.')
+
+    for command in commands.choices.values():
+        command.add_argument('--batch-size', type=int, default=None)
+
+    args = parser.parse_args(args)
+    batch_size = {} if args.batch_size is None else {'batch_size': args.batch_size}
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    start = time.perf_counter()
+
+    if args.command == 'ids':
+        stats = ingest_ids(args.source, args.path, concurrency=args.concurrency, reload=args.reload,
+                           restart=args.restart, **batch_size)
+    elif args.command == 'nist':
+        stats = ingest_nist()
+    elif args.command == 'osv':
+        stats = ingest_osv(args.ecosystems, **batch_size)
+    elif args.command == 'kev':
+        stats = ingest_kev(restart=args.restart, **batch_size)
+    elif args.command == 'vulnrichment':
+        stats = ingest_vulnrichment(args.archive, **batch_size)
+    elif args.command == 'cvss-backfill':
+        stats = backfill_cvss(**batch_size)
+    else:
+        stats = compact_caches(**batch_size)
+
+    logger.info(f'{args.command} finished in {time.perf_counter() - start:.1f}s: {stats}')
+
+
+if __name__ == '__main__':
+    main()
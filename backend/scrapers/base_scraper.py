@@ -2,12 +2,12 @@ import logging
 
 import requests
 
-from utils import create_session, make_request
+from utils import get_session, make_request
 
 
 class BaseScraper:
     def __init__(self):
-        self._session = create_session()
+        self._session = get_session()
 
         logging.basicConfig(level=logging.INFO)
         self._logger = logging.getLogger(__name__)
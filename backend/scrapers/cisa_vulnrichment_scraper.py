@@ -1,7 +1,7 @@
 import concurrent.futures
 import json
+from typing import Optional, Tuple
 
-import requests
 from lxml import html
 
 from base_scraper import BaseScraper
@@ -33,7 +33,7 @@ class CisaVulnrichmentScraper(BaseScraper):
         url = f'{self._base_url}/{year}'
 
         try:
-            response = requests.get(url)
+            response = self._make_request(url)
             tree = html.fromstring(response.content)
             repo = json.loads(tree.xpath('string(//react-app[@app-name="react-code-view"]/script)'))
             items = repo['payload']['tree']['items']
@@ -51,36 +51,32 @@ class CisaVulnrichmentScraper(BaseScraper):
     def _scrape_group(self, year: str, group: str):
         url = f'{self._base_url}/{year}/{group}'
         try:
-            response = requests.get(url)
+            response = self._make_request(url)
             tree = html.fromstring(response.content)
             repo = json.loads(tree.xpath('string(//react-app[@app-name="react-code-view"]/script)'))
             items = repo['payload']['tree']['items']
             files = [x['name'] for x in items]
 
             with concurrent.futures.ThreadPoolExecutor(max_workers=30) as executor:
-                futures = [
-                    executor.submit(self._scrape_file, year, group, file)
-                    for file in files
-                ]
-                concurrent.futures.wait(futures)
+                rows = [x for x in executor.map(lambda file: self._scrape_file(year, group, file), files)
+                        if x is not None]
+
+            # One insert for the whole group rather than one per file.
+            with Db() as db:
+                db.bulk_upsert('cve_cache', ['cve_id', 'source', 'data'], rows, ['cve_id', 'source'])
 
         except Exception as e:
             self._logger.error(f'Error processing group {group}: {e}')
 
-    def _scrape_file(self, year: str, group: str, file: str):
+    def _scrape_file(self, year: str, group: str, file: str) -> Optional[Tuple[str, str, str]]:
         url = f'{self._content_base_url}/{year}/{group}/{file}'
         try:
-            response = requests.get(url)
+            response = self._make_request(url)
             cve_data = response.json()
             cve_id = file.split('.')[0].upper()
 
-            with Db() as db:
-                db.execute(
-                    """
-                    INSERT INTO cve_cache(cve_id, source, data) VALUES (%s, %s, %s) 
-                    ON CONFLICT (cve_id, source) DO NOTHING;
-                    """,
-                    (cve_id, 'vulnrichment', json.dumps(cve_data)))
+            return cve_id, 'vulnrichment', json.dumps(cve_data)
 
         except Exception as e:
             self._logger.error(f'Error processing file {file}: {e}')
+            return None
@@ -0,0 +1,93 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls for the same key: the first caller (the
+    leader) runs the function, every caller that arrives while it is running
+    waits for and receives the leader's result (or exception) instead of
+    running the function again. Nothing is cached once the call finishes.
+
+    The returned value is shared by all callers of the flight and should be
+    treated as read-only.
+
+    Examples:
+        >>> flight = SingleFlight()
+        >>> flight.do(('nist', 'CVE-2024-3094'), lambda: load('CVE-2024-3094'))
+        >>> flight.stats()
+        >>> {'issued': 1, 'coalesced': 0, 'in_flight': 0}
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, concurrent.futures.Future] = dict()
+
+        self._issued = 0
+        self._coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+
+            if leader:
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+                self._issued += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        The coroutine counterpart of `do`. Flights are shared with `do`, and
+        with callers on other threads or event loops.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+
+            if leader:
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+                self._issued += 1
+            else:
+                self._coalesced += 1
+
+        if not leader:
+            return await asyncio.wrap_future(future)
+
+        try:
+            result = await fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'issued': self._issued, 'coalesced': self._coalesced, 'in_flight': len(self._calls)}
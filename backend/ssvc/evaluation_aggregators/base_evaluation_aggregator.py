@@ -1,21 +1,47 @@
+import logging
 from abc import abstractmethod
 from typing import Optional, Literal, List
 
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationResult, EvaluationUnit
 
 
 class BaseEvaluationAggregator:
     def __init__(self, llm: Literal['gemini', 'openai'] = 'gemini'):
-        pass
+        self._logger = logging.getLogger(self.__class__.__name__)
 
     @abstractmethod
     def _get_units(self) -> List[EvaluationUnit]:
         pass
 
-    def aggregate(self, cve_id: str, reevaluate: bool = False) -> Optional[EvaluationResult]:
+    def aggregate(self, context: EvaluationContext) -> Optional[EvaluationResult]:
         for unit in self._get_units():
-            result = unit.evaluate(cve_id, reevaluate)
+            result = self._evaluate(unit, context)
             if result is not None:
                 return result
 
         return None
+
+    def llm_decision_point(self, context: EvaluationContext) -> Optional[str]:
+        """
+        The decision point `aggregate` would ask an llm for the cve, i.e., when
+        none of the units before the llm one has a result, or None.
+        """
+        for unit in self._get_units():
+            decision_point = unit.llm_decision_point()
+            if decision_point is not None:
+                return decision_point
+
+            if self._evaluate(unit, context) is not None:
+                return None
+
+        return None
+
+    def _evaluate(self, unit: EvaluationUnit, context: EvaluationContext) -> Optional[EvaluationResult]:
+        # A unit whose data source is failing should not fail the whole
+        # evaluation, the next unit is tried instead.
+        try:
+            return unit.evaluate(context)
+        except Exception as e:
+            self._logger.error(f'{unit.__class__.__name__} failed to evaluate cve {context.cve_id}. {e}')
+            return None
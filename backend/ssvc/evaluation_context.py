@@ -0,0 +1,116 @@
+import json
+import threading
+from typing import Optional, Callable, Dict, Any, List, Sequence, Set
+
+from app.data_sources.cve_data_source_aggregator import CveDataSourceAggregator
+from app.data_sources.nist_cve_data_source import NistCveDataSource
+from database.db import Db
+from ssvc.utils import CvssVector, extract_cvss_from_nist, parse_cvss
+
+
+class EvaluationContext:
+    """
+    Created once per cve evaluation and passed through the aggregators, the
+    evaluation units and the llm evaluators. The data of every source is
+    loaded (and parsed) once, and so is the json sent to the llms, no matter
+    how many units ask for it. The context is shared by the threads that
+    run the aggregators, a value that is being computed by one thread is
+    awaited by the others rather than computed again.
+
+    `cve_id` is the canonical id of the vulnerability, and `aliases` all the
+    ids it is known by, canonical first (see `AliasGroup`). `cve_data` is
+    the data of the cve when it was already loaded, e.g., in bulk with
+    `CveDataSourceAggregator.load_many`.
+    """
+
+    def __init__(self, cve_id: str, reevaluate: bool = False,
+                 aggregator: Optional[CveDataSourceAggregator] = None,
+                 aliases: Optional[Sequence[str]] = None,
+                 cve_data: Optional[dict] = None):
+        self.cve_id = cve_id.upper()
+        self.aliases = tuple(aliases) if aliases else (self.cve_id,)
+        self.reevaluate = reevaluate
+        # The decision points an llm is asked for, as found by
+        # `SsvcScoreEvaluator.llm_decision_points`; None if not known yet.
+        self.llm_decision_points: Optional[Set[str]] = None
+
+        self._aggregator = aggregator or CveDataSourceAggregator()
+        self._values: Dict[str, Any] = dict()
+        self._locks: Dict[str, threading.Lock] = dict()
+        self._lock = threading.Lock()
+
+        if cve_data is not None:
+            self._values['cve_data'] = cve_data
+
+    @staticmethod
+    def prefetch_cvss(contexts: List['EvaluationContext']):
+        """Reads the indexed cvss vectors of many contexts with one query, rather than one per evaluation."""
+        contexts = [x for x in contexts if not x.reevaluate]
+        if len(contexts) == 0:
+            return
+
+        with Db() as db:
+            vectors = {x['cve_id']: x['vector'] for x in db.all(
+                'SELECT cve_id, vector FROM cve_cvss WHERE cve_id = ANY(%s)', ([x.cve_id for x in contexts],))}
+
+        for context in contexts:
+            vector = vectors.get(context.cve_id)
+            if vector is not None:
+                context._memoize('cvss', lambda: _parse_cvss_or_none(vector))
+
+    def cve_data(self) -> dict:
+        """The data of all sources, as returned by `CveDataSourceAggregator.load`."""
+        return self._memoize('cve_data', lambda: self._aggregator.load(self.cve_id, self.reevaluate, self.aliases))
+
+    def cve_data_json(self) -> str:
+        return self._memoize('cve_data_json', lambda: json.dumps(self.cve_data()))
+
+    def source_data(self, source_name: str) -> Optional[dict]:
+        """The data of a single source, e.g., `nist`, or None if the source does not have the cve."""
+        return self.cve_data().get(f'{source_name}_data_source')
+
+    def cvss(self) -> Optional[CvssVector]:
+        """
+        The parsed cvss vector of the cve, read from `cve_cvss` without
+        loading the nist record. Falls back to the nist record when the cvss
+        was not indexed yet, or when the cve is being reevaluated. None if the
+        cve has no (valid) cvss vector.
+        """
+        return self._memoize('cvss', self._load_cvss)
+
+    def _load_cvss(self) -> Optional[CvssVector]:
+        vector = None
+        if not self.reevaluate:
+            with Db() as db:
+                indexed = db.first('SELECT vector FROM cve_cvss WHERE cve_id = %s', (self.cve_id,))
+            vector = None if indexed is None else indexed['vector']
+
+        if vector is None:
+            vector = extract_cvss_from_nist(self.source_data(NistCveDataSource.name()))
+
+        return _parse_cvss_or_none(vector)
+
+    def shared(self, key: str, compute: Callable[[], Any]) -> Any:
+        """
+        A value computed once for the evaluation, whichever unit asks for it
+        first, e.g., the combined llm evaluation of all decision points.
+        """
+        return self._memoize(f'shared:{key}', compute)
+
+    def _memoize(self, key: str, compute: Callable[[], Any]) -> Any:
+        with self._lock:
+            if key in self._values:
+                return self._values[key]
+            lock = self._locks.setdefault(key, threading.Lock())
+
+        with lock:
+            if key not in self._values:
+                self._values[key] = compute()
+            return self._values[key]
+
+
+def _parse_cvss_or_none(vector: Optional[str]) -> Optional[CvssVector]:
+    try:
+        return None if vector is None else parse_cvss(vector)
+    except ValueError:
+        return None
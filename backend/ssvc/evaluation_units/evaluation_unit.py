@@ -2,6 +2,8 @@ from abc import abstractmethod
 from dataclasses import dataclass
 from typing import Literal, Optional, List
 
+from ssvc.evaluation_context import EvaluationContext
+
 
 @dataclass
 class EvaluationResult:
@@ -30,9 +32,13 @@ class EvaluationUnit:
         'public_wellbeing']:
         pass
 
-    def evaluate(self, cve_id: str, reevaluate: bool = False) -> Optional[EvaluationResult]:
-        return self._process_evaluation(cve_id.upper(), reevaluate)
+    def evaluate(self, context: EvaluationContext) -> Optional[EvaluationResult]:
+        return self._process_evaluation(context)
+
+    def llm_decision_point(self) -> Optional[str]:
+        """The decision point the unit asks an llm (see `BaseLlmEvaluator.name`), None if it asks none."""
+        return None
 
     @abstractmethod
-    def _process_evaluation(self, cve_id: str, reevaluate: bool) -> Optional[EvaluationResult]:
+    def _process_evaluation(self, context: EvaluationContext) -> Optional[EvaluationResult]:
         pass
@@ -1,14 +1,20 @@
 from typing import Optional, Literal
 
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationResult
 from ssvc.evaluation_units.exposure.base_exposure_evaluation_unit import BaseExposureEvaluationUnit
 from ssvc.llm.llm_evaluators.exposure_llm_evaluator import ExposureLlmEvaluator
 
 
 class GeminiExposureEvaluationUnit(BaseExposureEvaluationUnit):
-    def _process_evaluation(self, cve_id: str, reevaluate: bool) -> Optional[EvaluationResult]:
-        llm_evaluator = ExposureLlmEvaluator('gemini')
-        result = llm_evaluator.evaluate(cve_id, reevaluate)
+    def __init__(self):
+        self._llm_evaluator = ExposureLlmEvaluator('gemini')
+
+    def llm_decision_point(self) -> Optional[str]:
+        return self._llm_evaluator.name()
+
+    def _process_evaluation(self, context: EvaluationContext) -> Optional[EvaluationResult]:
+        result = self._llm_evaluator.evaluate(context)
 
         if result is None:
             return None
@@ -1,14 +1,14 @@
 from typing import Optional
 
-from app.data_sources.nist_cve_data_source import NistCveDataSource
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationResult
 from ssvc.evaluation_units.exposure.base_exposure_evaluation_unit import BaseExposureEvaluationUnit
-from ssvc.utils import extract_cvss_from_nist, standardize_cvss
+from ssvc.utils import cvss_exposure
 
 
 class HeuristicExposureEvaluationUnit(BaseExposureEvaluationUnit):
 
-    def _process_evaluation(self, cve_id: str, reevaluate: bool) -> Optional[EvaluationResult]:
+    def _process_evaluation(self, context: EvaluationContext) -> Optional[EvaluationResult]:
         """
         Exposure:
         if AV == "N" and PR == "N" and UI == "N":
@@ -19,22 +19,13 @@ class HeuristicExposureEvaluationUnit(BaseExposureEvaluationUnit):
             return "small"
         """
 
-        data_source = NistCveDataSource()
-        data = data_source.load(cve_id, reevaluate)
-        cvss = extract_cvss_from_nist(data)
+        cvss = context.cvss()
 
         if cvss is None:
             return None
 
-        cvss = standardize_cvss(cvss)
-
-        if 'AV:N' in cvss and 'PR:N' and 'UI:N':
-            return EvaluationResult('open', 1, 'Rule-based heuristic evaluation using the CVSS vector.', [])
-
-        if ('AV:N' in cvss or 'AV:A' in cvss) and ('PR:L' in cvss or 'PR:H' in cvss or 'UI:R' in cvss):
-            return EvaluationResult('controlled', 1, 'Rule-based heuristic evaluation using the CVSS vector.', [])
-
-        if 'AV:L' in cvss or 'AV:P' in cvss:
-            return EvaluationResult('small', 1, 'Rule-based heuristic evaluation using the CVSS vector.', [])
+        exposure = cvss_exposure(cvss)
+        if exposure is None:
+            return None
 
-        return None
+        return EvaluationResult(exposure, 1, 'Rule-based heuristic evaluation using the CVSS vector.', [])
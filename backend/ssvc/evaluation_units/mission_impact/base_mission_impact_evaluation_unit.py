@@ -1,6 +1,7 @@
 from abc import abstractmethod
 from typing import Literal, Optional
 
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationUnit, EvaluationResult
 
 
@@ -18,6 +19,5 @@ class BaseMissionImpactEvaluationUnit(EvaluationUnit):
         return 'mission_impact'
 
     @abstractmethod
-    def _process_evaluation(self, cve_id: str, reevaluate: bool) -> Optional[
-        EvaluationResult]:
+    def _process_evaluation(self, context: EvaluationContext) -> Optional[EvaluationResult]:
         pass
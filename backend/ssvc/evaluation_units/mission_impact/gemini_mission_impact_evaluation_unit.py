@@ -1,14 +1,20 @@
 from typing import Optional
 
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationResult
 from ssvc.evaluation_units.mission_impact.base_mission_impact_evaluation_unit import BaseMissionImpactEvaluationUnit
 from ssvc.llm.llm_evaluators.mission_impact_llm_evaluator import MissionImpactLlmEvaluator
 
 
 class GeminiMissionImpactEvaluationUnit(BaseMissionImpactEvaluationUnit):
-    def _process_evaluation(self, cve_id: str, reevaluate: bool) -> Optional[EvaluationResult]:
-        llm_evaluator = MissionImpactLlmEvaluator('gemini')
-        result = llm_evaluator.evaluate(cve_id, reevaluate)
+    def __init__(self):
+        self._llm_evaluator = MissionImpactLlmEvaluator('gemini')
+
+    def llm_decision_point(self) -> Optional[str]:
+        return self._llm_evaluator.name()
+
+    def _process_evaluation(self, context: EvaluationContext) -> Optional[EvaluationResult]:
+        result = self._llm_evaluator.evaluate(context)
 
         if result is None:
             return None
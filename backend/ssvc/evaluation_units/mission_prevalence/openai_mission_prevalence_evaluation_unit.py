@@ -1,5 +1,6 @@
 from typing import Optional
 
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationResult
 from ssvc.evaluation_units.mission_prevalence.base_mission_prevalence_evaluation_unit import \
     BaseMissionPrevalenceEvaluationUnit
@@ -7,9 +8,14 @@ from ssvc.llm.llm_evaluators.mission_prevalence_llm_evaluator import MissionPrev
 
 
 class OpenaiMissionPrevalenceEvaluationUnit(BaseMissionPrevalenceEvaluationUnit):
-    def _process_evaluation(self, cve_id: str, reevaluate: bool) -> Optional[EvaluationResult]:
-        llm_evaluator = MissionPrevalenceLlmEvaluator('openai')
-        result = llm_evaluator.evaluate(cve_id, reevaluate)
+    def __init__(self):
+        self._llm_evaluator = MissionPrevalenceLlmEvaluator('openai')
+
+    def llm_decision_point(self) -> Optional[str]:
+        return self._llm_evaluator.name()
+
+    def _process_evaluation(self, context: EvaluationContext) -> Optional[EvaluationResult]:
+        result = self._llm_evaluator.evaluate(context)
 
         if result is None:
             return None
@@ -1,5 +1,6 @@
 from typing import Optional
 
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationResult
 from ssvc.evaluation_units.public_wellbeing.base_public_wellbeing_evaluation_unit import \
     BasePublicWellbeingEvaluationUnit
@@ -7,9 +8,14 @@ from ssvc.llm.llm_evaluators.public_wellbeing_llm_evaluator import PublicWellbei
 
 
 class OpenaiPublicWellbeingEvaluationUnit(BasePublicWellbeingEvaluationUnit):
-    def _process_evaluation(self, cve_id: str, reevaluate: bool) -> Optional[EvaluationResult]:
-        llm_evaluator = PublicWellbeingLlmEvaluator('openai')
-        result = llm_evaluator.evaluate(cve_id, reevaluate)
+    def __init__(self):
+        self._llm_evaluator = PublicWellbeingLlmEvaluator('openai')
+
+    def llm_decision_point(self) -> Optional[str]:
+        return self._llm_evaluator.name()
+
+    def _process_evaluation(self, context: EvaluationContext) -> Optional[EvaluationResult]:
+        result = self._llm_evaluator.evaluate(context)
 
         if result is None:
             return None
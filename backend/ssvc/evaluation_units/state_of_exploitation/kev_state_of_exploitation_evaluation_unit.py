@@ -1,18 +1,20 @@
 from typing import Optional
 
-from app.data_sources.cisa_kev_cve_data_source import CisaKevCveDataSource
+from app.data_sources.kev_catalog import kev_catalog
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationResult
 from ssvc.evaluation_units.state_of_exploitation.base_state_of_exploitation_evaluation_unit import \
     BaseStateOfExploitationEvaluationUnit
 
 
 class KevStateOfExploitationEvaluationUnit(BaseStateOfExploitationEvaluationUnit):
-    def __init__(self):
-        self._kev_data_source = CisaKevCveDataSource()
+    @staticmethod
+    def result() -> EvaluationResult:
+        """The evaluation of a cve listed in KEV."""
+        return EvaluationResult('active', 1, 'Found in the CISA KEV dataset.', [])
 
-    def _process_evaluation(self, cve_id: str, reevaluate: bool) -> Optional[EvaluationResult]:
-        result = self._kev_data_source.load(cve_id, reevaluate)
-        if result is not None:
-            return EvaluationResult('active', 1, 'Found in the CISA KEV dataset.', [])
+    def _process_evaluation(self, context: EvaluationContext) -> Optional[EvaluationResult]:
+        if kev_catalog.contains(context.cve_id):
+            return self.result()
 
         return None
@@ -1,5 +1,6 @@
 from typing import Optional
 
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationResult
 from ssvc.evaluation_units.technical_impact.base_technical_impact_evaluation_unit import \
     BaseTechnicalImpactEvaluationUnit
@@ -7,9 +8,14 @@ from ssvc.llm.llm_evaluators.technical_impact_llm_evaluator import TechnicalImpa
 
 
 class OpenaiTechnicalImpactEvaluationUnit(BaseTechnicalImpactEvaluationUnit):
-    def _process_evaluation(self, cve_id: str, reevaluate: bool) -> Optional[EvaluationResult]:
-        llm_evaluator = TechnicalImpactLlmEvaluator('openai')
-        result = llm_evaluator.evaluate(cve_id, reevaluate)
+    def __init__(self):
+        self._llm_evaluator = TechnicalImpactLlmEvaluator('openai')
+
+    def llm_decision_point(self) -> Optional[str]:
+        return self._llm_evaluator.name()
+
+    def _process_evaluation(self, context: EvaluationContext) -> Optional[EvaluationResult]:
+        result = self._llm_evaluator.evaluate(context)
 
         if result is None:
             return None
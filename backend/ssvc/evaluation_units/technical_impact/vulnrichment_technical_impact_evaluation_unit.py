@@ -1,6 +1,7 @@
 from typing import Optional
 
 from app.data_sources.cisa_vulnrichment_cve_data_source import CisaVulnrichmentCveDataSource
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationResult
 from ssvc.evaluation_units.technical_impact.base_technical_impact_evaluation_unit import \
     BaseTechnicalImpactEvaluationUnit
@@ -8,10 +9,8 @@ from ssvc.evaluation_units.technical_impact.base_technical_impact_evaluation_uni
 
 class VulnrichmentTechnicalImpactEvaluationUnit(BaseTechnicalImpactEvaluationUnit):
 
-    def _process_evaluation(self, cve_id: str, reevaluate: bool) -> Optional[EvaluationResult]:
-        data_source = CisaVulnrichmentCveDataSource()
-
-        result = data_source.load(cve_id, reevaluate)
+    def _process_evaluation(self, context: EvaluationContext) -> Optional[EvaluationResult]:
+        result = context.source_data(CisaVulnrichmentCveDataSource.name())
         if result is None:
             return None
 
@@ -1,14 +1,14 @@
 from typing import Optional
 
-from app.data_sources.nist_cve_data_source import NistCveDataSource
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationResult
 from ssvc.evaluation_units.value_density.base_value_density_evaluation_unit import BaseValueDensityEvaluationUnit
-from ssvc.utils import extract_cvss_from_nist, standardize_cvss
+from ssvc.utils import cvss_value_density
 
 
 class HeuristicValueDensityEvaluationUnit(BaseValueDensityEvaluationUnit):
 
-    def _process_evaluation(self, cve_id: str, reevaluate: bool) -> Optional[EvaluationResult]:
+    def _process_evaluation(self, context: EvaluationContext) -> Optional[EvaluationResult]:
         """
         Value density:
         IF Attack Vector (AV) is Network (AV:N)
@@ -30,34 +30,13 @@ class HeuristicValueDensityEvaluationUnit(BaseValueDensityEvaluationUnit):
             Value Density = Diffused
         """
 
-        data_source = NistCveDataSource()
-        data = data_source.load(cve_id, reevaluate)
-        cvss = extract_cvss_from_nist(data)
+        cvss = context.cvss()
 
         if cvss is None:
             return None
 
-        cvss = standardize_cvss(cvss)
-
-        if 'AV:N' in cvss and 'PR:N' in cvss and ('VC:H' in cvss or 'VI:H' in cvss or 'VA:H' in cvss):
-            return EvaluationResult(
-                'concentrated',
-                1,
-                'Rule-based heuristic evaluation using the cvss vector string.',
-                [])
-
-        if 'AV:L' in cvss or 'AV:A' in cvss or 'PR:L' in cvss or 'PR:H' in cvss or 'UI:R' in cvss:
-            return EvaluationResult(
-                'diffused',
-                1,
-                'Rule-based heuristic evaluation using the cvss vector string.',
-                [])
-
-        if 'S:C' in cvss:
-            return EvaluationResult(
-                'concentrated',
-                1,
-                'Rule-based heuristic evaluation using the cvss vector string.',
-                [])
-
-        return EvaluationResult('diffused', 1, 'Rule-based heuristic evaluation using the cvss vector string.', [])
+        return EvaluationResult(
+            cvss_value_density(cvss),
+            1,
+            'Rule-based heuristic evaluation using the cvss vector string.',
+            [])
@@ -0,0 +1,91 @@
+import json
+import logging
+from dataclasses import asdict
+from typing import Dict, Iterable, List
+
+from database.db import Db
+from importers.checkpoints import load_checkpoint, save_checkpoint
+from ssvc.evaluation_units.state_of_exploitation.kev_state_of_exploitation_evaluation_unit import \
+    KevStateOfExploitationEvaluationUnit
+from ssvc.ssvc_score_evaluator import SsvcEvaluationResult, compute_action
+from ssvc.utils import from_json
+
+_CHECKPOINT = 'kev_reevaluation'
+
+logger = logging.getLogger('kev_reevaluation')
+
+
+def diff_kev_snapshot(cve_ids: Iterable[str]) -> List[str]:
+    """
+    The ids of the KEV feed snapshot `cve_ids` that were not in the previous
+    snapshot, which is replaced by this one. Every id is new on the first
+    run. Call `save_kev_snapshot` once the added ids are handled.
+    """
+    state = load_checkpoint(_CHECKPOINT)
+    previous = set() if state is None else set(state['cve_ids'])
+
+    return sorted({x.upper() for x in cve_ids} - previous)
+
+
+def save_kev_snapshot(cve_ids: Iterable[str]):
+    save_checkpoint(_CHECKPOINT, {'cve_ids': sorted({x.upper() for x in cve_ids})})
+
+
+def reevaluate_kev_additions(cve_ids: List[str], batch_size: int = 500) -> Dict[str, int]:
+    """
+    Updates the stored evaluations of cves that were added to KEV: their
+    exploitation becomes `active` and their action is recomputed from the
+    other (stored) decision points, so no LLM is called. The `modified_time`
+    of the updated rows is bumped by the trigger of `ssvc_results`. The cves
+    that were never evaluated, or already are `active`, are left as is.
+    """
+    stats = {'added': len(cve_ids), 'evaluated': 0, 'updated': 0, 'action_changed': 0}
+
+    for i in range(0, len(cve_ids), batch_size):
+        with Db() as db:
+            rows = db.all('SELECT id, cve_id, result FROM ssvc_results WHERE cve_id = ANY(%s)',
+                          (cve_ids[i:i + batch_size],))
+
+        updates = []
+        for row in rows:
+            stats['evaluated'] += 1
+            result = from_json(row['result'], SsvcEvaluationResult)
+            if result.exploitation.assessment == 'active':
+                continue
+
+            previous_action = result.action
+            result.exploitation = KevStateOfExploitationEvaluationUnit.result()
+            result.action = compute_action(vars(result))
+
+            updates.append((str(row['id']), json.dumps(asdict(result))))
+            if result.action != previous_action:
+                stats['action_changed'] += 1
+                logger.info(f'{row["cve_id"]} was added to KEV, its action is now {result.action} '
+                            f'(was {previous_action}).')
+
+        if len(updates) > 0:
+            with Db() as db:
+                db.execute_values(
+                    """
+                    UPDATE ssvc_results SET result = v.result
+                    FROM (VALUES %s) AS v(id, result)
+                    WHERE ssvc_results.id = v.id::uuid;
+                    """,
+                    updates)
+            stats['updated'] += len(updates)
+
+    return stats
+
+
+def run_kev_reevaluation(cve_ids: List[str]) -> Dict[str, int]:
+    """
+    Re-evaluates the cves added to KEV since the previous snapshot (see
+    `diff_kev_snapshot`), then records `cve_ids` as the new snapshot. Cves
+    removed from KEV keep their evaluation until they are re-evaluated.
+    """
+    added = diff_kev_snapshot(cve_ids)
+    stats = reevaluate_kev_additions(added)
+    save_kev_snapshot(cve_ids)
+
+    logger.info(f'Re-evaluated the cves added to KEV: {stats}')
+    return stats
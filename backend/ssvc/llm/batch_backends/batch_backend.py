@@ -0,0 +1,29 @@
+from abc import abstractmethod
+from typing import Iterable, Literal, Optional, Tuple
+
+
+class BatchBackend:
+    """
+    Runs a file of llm requests as one batch job, e.g., through the batch api
+    of a provider. The requests file is JSONL, one `{"custom_id": ...,
+    "prompt": ...}` object per line, and every result is returned with the
+    `custom_id` of its request.
+
+    `llm` is the llm whose answers the backend returns, or None if it uses
+    the client it is given.
+    """
+    llm: Optional[Literal['gemini', 'openai']] = None
+
+    @abstractmethod
+    def submit(self, path: str) -> str:
+        """Submits the requests of the file at `path` and returns the id of the job."""
+        pass
+
+    @abstractmethod
+    def status(self, job_id: str) -> Literal['running', 'completed', 'failed']:
+        pass
+
+    @abstractmethod
+    def results(self, job_id: str) -> Iterable[Tuple[str, Optional[str]]]:
+        """The `custom_id` and the response (None if the request failed) of every request of a job."""
+        pass
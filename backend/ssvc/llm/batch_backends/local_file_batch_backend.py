@@ -0,0 +1,85 @@
+import concurrent.futures
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from typing import Callable, Iterable, Literal, Optional, Tuple
+
+from ssvc.llm.batch_backends.batch_backend import BatchBackend
+
+
+class LocalFileBatchBackend(BatchBackend):
+    """
+    A stand-in for the batch api of a provider, which keeps its jobs as
+    directories of `directory` (default: `LLM_BATCH_DIR`). The requests of
+    a job are answered in a background thread of the submitting process, by
+    `respond` (e.g., the `respond` of an `LlmClient`, or canned answers to
+    run offline), and the results are written to the `results.jsonl` file of
+    the job. A job whose process exits before it completes stays `running`,
+    until the caller gives up on it.
+    """
+
+    def __init__(self, respond: Callable[[str], str], directory: Optional[str] = None, max_workers: int = 4):
+        self._respond = respond
+        self._directory = directory or os.getenv('LLM_BATCH_DIR', '/tmp/ssvc_llm_batches')
+        self._max_workers = max_workers
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def submit(self, path: str) -> str:
+        job_id = str(uuid.uuid4())
+        job_directory = os.path.join(self._directory, job_id)
+        os.makedirs(job_directory)
+        shutil.copy(path, os.path.join(job_directory, 'requests.jsonl'))
+
+        threading.Thread(target=self._run_job, args=(job_id,), name=f'batch-{job_id}', daemon=True).start()
+        return job_id
+
+    def status(self, job_id: str) -> Literal['running', 'completed', 'failed']:
+        job_directory = os.path.join(self._directory, job_id)
+        if os.path.exists(os.path.join(job_directory, 'results.jsonl')):
+            return 'completed'
+
+        if not os.path.isdir(job_directory) or os.path.exists(os.path.join(job_directory, 'error')):
+            return 'failed'
+
+        return 'running'
+
+    def results(self, job_id: str) -> Iterable[Tuple[str, Optional[str]]]:
+        with open(os.path.join(self._directory, job_id, 'results.jsonl')) as f:
+            for line in f:
+                if line.strip() != '':
+                    result = json.loads(line)
+                    yield result['custom_id'], result.get('response')
+
+    def _run_job(self, job_id: str):
+        job_directory = os.path.join(self._directory, job_id)
+
+        try:
+            with open(os.path.join(job_directory, 'requests.jsonl')) as f:
+                requests = [json.loads(line) for line in f if line.strip() != '']
+
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                results = list(executor.map(self._run, requests))
+
+            # Written then renamed, so a job is either completed or has no results.
+            results_path = os.path.join(job_directory, 'results.jsonl')
+            with open(results_path + '.tmp', 'w') as f:
+                for result in results:
+                    f.write(json.dumps(result) + '\n')
+            os.replace(results_path + '.tmp', results_path)
+
+            self._logger.info(f'Ran the {len(requests)} requests of job {job_id}.')
+        except Exception as e:
+            self._logger.error(f'Job {job_id} failed. {e}')
+            with open(os.path.join(job_directory, 'error'), 'w') as f:
+                f.write(str(e))
+
+    def _run(self, request: dict) -> dict:
+        try:
+            return {'custom_id': request['custom_id'], 'response': self._respond(request['prompt'])}
+        except Exception as e:
+            self._logger.error(f'Request {request["custom_id"]} failed. {e}')
+            return {'custom_id': request['custom_id'], 'error': str(e)}
@@ -0,0 +1,70 @@
+import json
+import os
+import tempfile
+from typing import Iterable, Literal, Optional, Tuple
+
+from openai import OpenAI
+
+from ssvc.llm.batch_backends.batch_backend import BatchBackend
+
+
+class OpenaiBatchBackend(BatchBackend):
+    """
+    Runs the requests through the OpenAI batch api, with the model of
+    `OpenaiLlmClient`. Jobs complete within the 24 hour window of the api;
+    the requests of an expired job that were answered are still returned.
+    """
+    llm = 'openai'
+
+    def __init__(self, model: str = 'gpt-4o'):
+        self._client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+        self._model = model
+
+    def submit(self, path: str) -> str:
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as f, open(path) as requests:
+            for line in requests:
+                if line.strip() == '':
+                    continue
+                request = json.loads(line)
+                f.write(json.dumps({
+                    'custom_id': request['custom_id'],
+                    'method': 'POST',
+                    'url': '/v1/chat/completions',
+                    'body': {'model': self._model, 'messages': [{'role': 'user', 'content': request['prompt']}]},
+                }) + '\n')
+
+        try:
+            with open(f.name, 'rb') as upload:
+                input_file = self._client.files.create(file=upload, purpose='batch')
+        finally:
+            os.remove(f.name)
+
+        batch = self._client.batches.create(
+            input_file_id=input_file.id, endpoint='/v1/chat/completions', completion_window='24h')
+        return batch.id
+
+    def status(self, job_id: str) -> Literal['running', 'completed', 'failed']:
+        status = self._client.batches.retrieve(job_id).status
+        if status in ('completed', 'expired'):
+            return 'completed'
+        if status in ('failed', 'cancelled'):
+            return 'failed'
+
+        return 'running'
+
+    def results(self, job_id: str) -> Iterable[Tuple[str, Optional[str]]]:
+        batch = self._client.batches.retrieve(job_id)
+        if batch.output_file_id is None:
+            return
+
+        for line in self._client.files.content(batch.output_file_id).text.splitlines():
+            if line.strip() == '':
+                continue
+
+            result = json.loads(line)
+            response = result.get('response') or {}
+            if response.get('status_code') != 200:
+                yield result['custom_id'], None
+                continue
+
+            yield result['custom_id'], response['body']['choices'][0]['message']['content']
@@ -1,11 +1,16 @@
+from typing import Optional
+
 import vertexai
+from google.api_core.exceptions import GoogleAPICallError, RetryError
 from vertexai.generative_models import SafetySetting, GenerativeModel
 
 from ssvc.llm.llm_clients.llm_client import LlmClient
 
 
 class GeminiLlmClient(LlmClient):
-    def __init__(self):
+    _limits_prefix = 'GEMINI'
+
+    def _setup(self):
         self._generation_config = {
             "max_output_tokens": 8192,
             "temperature": 1,
@@ -34,8 +39,8 @@ class GeminiLlmClient(LlmClient):
         vertexai.init(project="sw-supply-chain-sec-dev-1184", location="australia-southeast1")
         self._model = GenerativeModel("gemini-1.5-pro-001")
 
-    def respond(self, query) -> str:
-        responses = self._model.generate_content(
+    async def _respond_async(self, query: str) -> str:
+        responses = await self._model.generate_content_async(
             query,
             generation_config=self._generation_config,
             safety_settings=self._safety_settings,
@@ -43,12 +48,18 @@ class GeminiLlmClient(LlmClient):
 
         answer_parts = []
 
-        for response in responses:
+        async for response in responses:
             answer_parts.append(response.text)
 
         answer = ''.join(answer_parts)
 
         return answer
 
+    def _status_code(self, e: Exception) -> Optional[int]:
+        return e.code if isinstance(e, GoogleAPICallError) and isinstance(e.code, int) else None
+
+    def _is_retryable(self, e: Exception, status: Optional[int]) -> bool:
+        return super()._is_retryable(e, status) or isinstance(e, RetryError)
+
 
 gemini_llm_client = GeminiLlmClient()
@@ -1,14 +1,169 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
 from abc import abstractmethod
+from typing import Dict, Optional
+
+from ssvc.utils import estimate_tokens
+from utils import TokenBucket, run_sync
+
+
+class LlmLimits:
+    """
+    The client-side limits of an llm provider, shared by all the calls of a
+    process, and configured by environment variables named after the
+    provider (`prefix`):
+
+    - `{prefix}_MAX_CONCURRENCY` requests in flight at once (default 8),
+    - `{prefix}_RPM` requests and `{prefix}_TPM` (estimated) input and
+      output tokens per minute, unlimited if not set, so that a bulk task
+      runs at the quota of the provider rather than into its 429s,
+    - `{prefix}_MAX_RETRIES` retries of a rate limited or failed (5xx)
+      request (default 6), after an exponential backoff with full jitter
+      from `{prefix}_BACKOFF_BASE` (1s) up to `{prefix}_BACKOFF_MAX` (60s),
+      or after the `Retry-After` of the response. A rate limited request
+      holds every request to the provider back for the `Retry-After` (or
+      the base delay), whether or not a budget is set.
+    """
+
+    def __init__(self, prefix: str):
+        rpm = int(os.getenv(f'{prefix}_RPM', 0))
+        tpm = int(os.getenv(f'{prefix}_TPM', 0))
+        self.requests = TokenBucket(rpm, 60) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm, 60) if tpm > 0 else None
+
+        self.max_concurrency = int(os.getenv(f'{prefix}_MAX_CONCURRENCY', 8))
+        self.max_retries = int(os.getenv(f'{prefix}_MAX_RETRIES', 6))
+        self.backoff_base = float(os.getenv(f'{prefix}_BACKOFF_BASE', 1))
+        self.backoff_max = float(os.getenv(f'{prefix}_BACKOFF_MAX', 60))
+        # Output tokens count towards the tpm too, but are only known afterwards.
+        self.expected_output_tokens = int(os.getenv(f'{prefix}_EXPECTED_OUTPUT_TOKENS', 500))
+
+        self._semaphores: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]' = \
+            weakref.WeakKeyDictionary()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def semaphore(self) -> asyncio.Semaphore:
+        """The concurrency limit of the running event loop (usually the shared background loop)."""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    async def acquire(self, tokens: int):
+        while True:
+            wait = self._blocked_until - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+
+        if self.requests is not None:
+            await self.requests.acquire_async()
+        if self.tokens is not None:
+            await self.tokens.acquire_async(tokens)
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def block_for(self, seconds: float):
+        """Holds every request back, after the provider rate limited one."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+        for bucket in [self.requests, self.tokens]:
+            if bucket is not None:
+                bucket.block_for(seconds)
+
+
+_limits: Dict[str, LlmLimits] = dict()
+_limits_lock = threading.Lock()
 
 
 class LlmClient:
     _instance = None
+    _initialized = False
+    _init_lock = threading.Lock()
+    # Names the environment variables of the provider's limits, see `LlmLimits`.
+    _limits_prefix = 'LLM'
 
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
             cls._instance = super().__new__(cls, *args, **kwargs)
         return cls._instance
 
-    @abstractmethod
+    def __init__(self):
+        # Every construction returns the singleton, which is only set up once,
+        # so that a new evaluator does not replace a client in use.
+        with self._init_lock:
+            if not self._initialized:
+                self._setup()
+                self._initialized = True
+
+    def _setup(self):
+        """Creates the provider client."""
+        pass
+
     def respond(self, query) -> str:
+        """Blocking version of `respond_async`, run on the shared background event loop."""
+        return run_sync(self.respond_async(query))
+
+    async def respond_async(self, query: str) -> str:
+        """
+        Sends the query within the limits of the provider (see `LlmLimits`),
+        retrying rate limited and failed requests. The error of the last
+        attempt is raised.
+        """
+        limits = self.limits()
+        tokens = estimate_tokens(query) + limits.expected_output_tokens
+
+        for attempt in range(limits.max_retries + 1):
+            async with limits.semaphore():
+                await limits.acquire(tokens)
+
+                try:
+                    return await self._respond_async(query)
+                except Exception as e:
+                    status = self._status_code(e)
+                    if not self._is_retryable(e, status) or attempt == limits.max_retries:
+                        raise
+
+                    retry_after = self._retry_after(e)
+                    delay = retry_after if retry_after is not None else limits.backoff(attempt)
+                    if status == 429:
+                        # Only for the delay the provider asked for (or the base one): the requests
+                        # already in flight are rate limited too, and must not add up their backoffs.
+                        limits.block_for(retry_after if retry_after is not None else limits.backoff_base)
+
+                    logging.getLogger(self.__class__.__name__).warning(
+                        f'The llm request failed ({status or e.__class__.__name__}), '
+                        f'retrying in {delay:.1f}s (attempt {attempt + 1}/{limits.max_retries}).')
+
+            # Outside of the semaphore, so the requests backing off do not hold the others back.
+            await asyncio.sleep(delay)
+
+    def limits(self) -> LlmLimits:
+        with _limits_lock:
+            if self._limits_prefix not in _limits:
+                _limits[self._limits_prefix] = LlmLimits(self._limits_prefix)
+            return _limits[self._limits_prefix]
+
+    @abstractmethod
+    async def _respond_async(self, query: str) -> str:
         pass
+
+    def _status_code(self, e: Exception) -> Optional[int]:
+        """The http status of a failed request, if the error has one."""
+        return None
+
+    def _is_retryable(self, e: Exception, status: Optional[int]) -> bool:
+        return status is not None and (status == 429 or status >= 500)
+
+    def _retry_after(self, e: Exception) -> Optional[float]:
+        """The delay the provider asked for, if any."""
+        return None
@@ -1,16 +1,20 @@
 import os
-from openai import OpenAI
+from typing import Optional
+
+from openai import APIConnectionError, APIStatusError, AsyncOpenAI
 
 from ssvc.llm.llm_clients.llm_client import LlmClient
 
 
 class OpenaiLlmClient(LlmClient):
+    _limits_prefix = 'OPENAI'
 
-    def __init__(self):
-        self._client = OpenAI(api_key=os.environ.get('OPENAI_API_KEY'))
+    def _setup(self):
+        # The retries are made by `LlmClient`, within the rate limits.
+        self._client = AsyncOpenAI(api_key=os.environ.get('OPENAI_API_KEY'), max_retries=0)
 
-    def respond(self, query) -> str:
-        completion = self._client.chat.completions.create(
+    async def _respond_async(self, query: str) -> str:
+        completion = await self._client.chat.completions.create(
             model="gpt-4o",
             messages=[
                 {"role": "user", "content": query}
@@ -18,3 +22,19 @@ class OpenaiLlmClient(LlmClient):
         )
 
         return completion.choices[0].message.content
+
+    def _status_code(self, e: Exception) -> Optional[int]:
+        return e.status_code if isinstance(e, APIStatusError) else None
+
+    def _is_retryable(self, e: Exception, status: Optional[int]) -> bool:
+        # Includes the timeouts.
+        return super()._is_retryable(e, status) or isinstance(e, APIConnectionError)
+
+    def _retry_after(self, e: Exception) -> Optional[float]:
+        if not isinstance(e, APIStatusError):
+            return None
+
+        try:
+            return max(0.0, float(e.response.headers.get('retry-after')))
+        except (TypeError, ValueError):
+            return None
@@ -1,29 +1,64 @@
 import json
 import logging
+import os
 import re
+import threading
 from abc import abstractmethod
-from typing import Literal, Optional
+from typing import Literal, Optional, Dict, List, Set
 
-from app.data_sources.cve_data_source_aggregator import CveDataSourceAggregator
 from database.db import Db
+from single_flight import SingleFlight
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.llm.llm_clients.gemini_llm_client import GeminiLlmClient
 from ssvc.llm.llm_clients.llm_client import LlmClient
 from ssvc.llm.llm_clients.openai_llm_client import OpenaiLlmClient
+from ssvc.llm.prompt_compaction import compact_cve_data_json, compaction_enabled
 
 
 class BaseLlmEvaluator:
-    def __init__(self, llm: Literal['gemini', 'openai'] = 'gemini'):
+    # Shared by all evaluators, the llm and the decision point are part of the key.
+    _single_flight = SingleFlight()
+
+    def __init__(self, llm: Literal['gemini', 'openai'] = 'gemini',
+                 mode: Optional[Literal['combined', 'per_point']] = None):
         self._name = self.__class__.name()
         self._llm = llm
+        # `combined` asks all the pending decision points of a cve in one
+        # prompt (see `CombinedLlmEvaluator`), `per_point` asks each on its own.
+        self._mode = mode or os.getenv('LLM_EVALUATION_MODE', 'combined')
         self._llm_client: LlmClient = GeminiLlmClient() if llm == 'gemini' else OpenaiLlmClient()
-        self._cve_data_source_aggregator = CveDataSourceAggregator()
+        self._combined_evaluator = None
+        self._combined_evaluator_lock = threading.Lock()
 
         self._logger = logging.getLogger(self.__class__.__name__)
 
-    def evaluate(self, cve_id: str, reevaluate: bool = False) -> Optional[dict]:
-        cve_id = cve_id.upper()
+    def evaluate(self, context: EvaluationContext) -> Optional[dict]:
+        """
+        Concurrent evaluations of the same cve by the same llm and decision
+        point share one cache lookup and llm call.
+        """
+        key = (self._llm, self._name, context.cve_id, context.reevaluate)
+        return self._single_flight.do(key, lambda: self._evaluate(context))
+
+    @staticmethod
+    def single_flight_stats() -> Dict[str, int]:
+        return BaseLlmEvaluator._single_flight.stats()
+
+    @staticmethod
+    def cached_cve_ids(llm: str, decision_point: str, cve_ids: List[str]) -> Set[str]:
+        """The cves of `cve_ids` that have a cached evaluation of the decision point."""
+        with Db() as db:
+            return {x['cve_id'] for x in db.all(
+                """
+                SELECT cve_id FROM llm_evaluator_cache
+                WHERE llm = %s AND decision_point = %s AND cve_id = ANY(%s)
+                """,
+                (llm, decision_point, cve_ids))}
+
+    def _evaluate(self, context: EvaluationContext) -> Optional[dict]:
+        cve_id = context.cve_id
 
-        if not reevaluate:
+        if not context.reevaluate:
             with Db() as db:
                 cached_data = db.first(
                     'SELECT * FROM llm_evaluator_cache WHERE llm = %s AND cve_id = %s AND decision_point = %s',
@@ -34,14 +69,19 @@ class BaseLlmEvaluator:
 
             self._logger.info(f'No cached evaluation was found for cve {cve_id}, running llm evaluator.')
 
-        else:
+        if self._mode == 'combined':
+            evaluations = self._combined().evaluate(context)
+            if self._name in evaluations:
+                return evaluations[self._name]
+
+            self._logger.warning(f'The combined evaluation of cve {cve_id} has no {self._name}, asking it alone.')
+
+        if context.reevaluate:
             with Db() as db:
                 db.execute('DELETE FROM llm_evaluator_cache WHERE llm = %s AND cve_id = %s AND decision_point = %s',
                            (self._llm, cve_id, self._name))
 
-        cve_data = self._get_cve_data(cve_id)
-
-        query = self._get_prompt(cve_id, cve_data)
+        query = self.prompt(context)
 
         try:
             llm_response = self._llm_client.respond(query)
@@ -49,7 +89,7 @@ class BaseLlmEvaluator:
             self._logger.error(f'An error occurred while fetching llm response. {e}')
             return None
 
-        parsed_response = _parse_llm_response(llm_response)
+        parsed_response = parse_llm_response(llm_response)
 
         if parsed_response is None:
             self._logger.warning(f'Llm response could not be parsed.')
@@ -71,6 +111,25 @@ class BaseLlmEvaluator:
     def name() -> str:
         pass
 
+    def _combined(self):
+        """The `CombinedLlmEvaluator` of the llm, built on the first cache miss."""
+        with self._combined_evaluator_lock:
+            if self._combined_evaluator is None:
+                from ssvc.llm.llm_evaluators.combined_llm_evaluator import CombinedLlmEvaluator
+                self._combined_evaluator = CombinedLlmEvaluator(self._llm)
+
+            return self._combined_evaluator
+
+    def prompt(self, context: EvaluationContext) -> str:
+        """The prompt asking the decision point for the cve of the context."""
+        return self._get_prompt(context.cve_id, self._get_cve_data(context))
+
+    def instructions(self) -> str:
+        """The question and the description of the decision point, as embedded in the prompts."""
+        return f"""{self._get_question()}
+        
+        {self._get_description()}"""
+
     @abstractmethod
     def _get_question(self) -> str:
         pass
@@ -85,9 +144,7 @@ class BaseLlmEvaluator:
         assigned to another json object that represent the information about the given CVE from that data source. Your 
         role is to use the provided information from these data sources and answer the following question:
         
-        {self._get_question()}
-        
-        {self._get_description()}
+        {self.instructions()}
         
         You answer should be formatted as a json object with five properties: 1) "cve_id" which contains the id of the 
         cve in question, 2) "assessment" which holds your final assessment of the CVE, 3) "justification": explaining 
@@ -110,12 +167,14 @@ class BaseLlmEvaluator:
         JSON data: {cve_data}
         """
 
-    def _get_cve_data(self, cve_id) -> str:
-        cve_data = self._cve_data_source_aggregator.load(cve_id)
-        return json.dumps(cve_data)
+    def _get_cve_data(self, context: EvaluationContext) -> str:
+        if not compaction_enabled():
+            return context.cve_data_json()
+
+        return compact_cve_data_json(context.cve_data(), [self._name])
 
 
-def _parse_llm_response(llm_response: str) -> Optional[dict]:
+def parse_llm_response(llm_response: str) -> Optional[dict]:
     cleaned = llm_response.replace('\n', '').replace('\t', '')
     pattern = r'(?:```json)?(\{.+?\})(?:```)?'
     match = re.search(pattern, cleaned)
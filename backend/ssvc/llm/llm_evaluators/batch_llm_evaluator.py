@@ -0,0 +1,183 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import Dict, List, Literal, Optional, Union
+
+from database.db import Db
+from ssvc.evaluation_context import EvaluationContext
+from ssvc.llm.llm_clients.gemini_llm_client import GeminiLlmClient
+from ssvc.llm.llm_clients.llm_client import LlmClient
+from ssvc.llm.llm_clients.openai_llm_client import OpenaiLlmClient
+from ssvc.llm.llm_evaluators.base_llm_evaluator import BaseLlmEvaluator
+from ssvc.llm.llm_evaluators.combined_llm_evaluator import LLM_EVALUATORS
+from ssvc.llm.prompt_compaction import compact_cve_data_json, compaction_enabled
+from ssvc.utils import estimate_tokens
+from utils import run_sync
+
+# The number of batched prompts sent at a time.
+_WINDOW_SIZE = 50
+
+
+class BatchLlmEvaluator:
+    """
+    Evaluates one decision point for many cves per llm request, so that the
+    instructions of the decision point are sent once per batch rather than
+    once per cve. The cves of a batch are added until the prompt reaches
+    `LLM_BATCH_TOKEN_BUDGET` (estimated) tokens, or `LLM_BATCH_MAX_CVES`
+    cves, as the answers are bounded by the output limit of the llm. A cve
+    whose data alone exceeds the budget is not batched.
+
+    The answers are cached in `llm_evaluator_cache`, so this is a prefetch:
+    a cve missing from an answer (or not batched) is evaluated by the
+    regular, single cve, llm evaluators when its evaluation needs it.
+    """
+
+    def __init__(self, llm: Literal['gemini', 'openai'] = 'gemini', token_budget: Optional[int] = None,
+                 max_cves: Optional[int] = None):
+        self._llm = llm
+        self._llm_client: LlmClient = GeminiLlmClient() if llm == 'gemini' else OpenaiLlmClient()
+        self._token_budget = token_budget or int(os.getenv('LLM_BATCH_TOKEN_BUDGET', 60000))
+        self._max_cves = max_cves or int(os.getenv('LLM_BATCH_MAX_CVES', 10))
+        self._evaluators = [x(llm, mode='per_point') for x in LLM_EVALUATORS]
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def evaluate(self, contexts: List[EvaluationContext], decision_points: Optional[List[str]] = None) \
+            -> Dict[str, int]:
+        """
+        Evaluates the `decision_points` (default: all) of the cves of
+        `contexts` that have no cached evaluation, and that reach an llm for
+        the cve (see `SsvcScoreEvaluator.llm_decision_points`). Returns the
+        number of cves asked and answered.
+        """
+        evaluators = [x for x in self._evaluators if decision_points is None or x.name() in decision_points]
+        stats = {'requests': 0, 'asked': 0, 'answered': 0}
+
+        jobs = []
+        for evaluator in evaluators:
+            for batch in self._batches(evaluator, self._pending(evaluator.name(), contexts)):
+                jobs.append((evaluator, batch))
+
+        # The requests run concurrently within the limits of the llm client
+        # (see `LlmLimits`), a window at a time so the prompts are not all held in memory.
+        for i in range(0, len(jobs), _WINDOW_SIZE):
+            window = jobs[i:i + _WINDOW_SIZE]
+            responses = run_sync(self._respond_all([self._get_prompt(*x) for x in window]))
+
+            for (evaluator, batch), response in zip(window, responses):
+                stats['requests'] += 1
+                stats['asked'] += len(batch)
+                stats['answered'] += self._store(evaluator, batch, response)
+
+        self._logger.info(f'Evaluated {len(contexts)} cves in batches: {stats}')
+        return stats
+
+    def _pending(self, decision_point: str, contexts: List[EvaluationContext]) -> List[EvaluationContext]:
+        contexts = [x for x in contexts if x.llm_decision_points is None or decision_point in x.llm_decision_points]
+        if len(contexts) == 0:
+            return contexts
+
+        cached = BaseLlmEvaluator.cached_cve_ids(self._llm, decision_point, [x.cve_id for x in contexts])
+        return [x for x in contexts if x.cve_id not in cached]
+
+    def _batches(self, evaluator: BaseLlmEvaluator, contexts: List[EvaluationContext]) \
+            -> List[List[EvaluationContext]]:
+        batches, batch = [], []
+        tokens = base = estimate_tokens(self._get_prompt(evaluator, []))
+
+        for context in contexts:
+            size = estimate_tokens(self._get_entry(evaluator, context))
+            if base + size > self._token_budget:
+                self._logger.info(f'The data of cve {context.cve_id} exceeds the token budget, it is not batched.')
+                continue
+
+            if len(batch) >= self._max_cves or tokens + size > self._token_budget:
+                batches.append(batch)
+                batch, tokens = [], base
+
+            batch.append(context)
+            tokens += size
+
+        if len(batch) > 0:
+            batches.append(batch)
+        return batches
+
+    async def _respond_all(self, queries: List[str]) -> List[Union[str, BaseException]]:
+        return await asyncio.gather(*[self._llm_client.respond_async(x) for x in queries], return_exceptions=True)
+
+    def _store(self, evaluator: BaseLlmEvaluator, contexts: List[EvaluationContext],
+               llm_response: Union[str, BaseException]) -> int:
+        if isinstance(llm_response, BaseException):
+            self._logger.error(f'An error occurred while fetching the batched llm response. {llm_response}')
+            return 0
+
+        cve_ids = {x.cve_id for x in contexts}
+        answers = {cve_id: x for cve_id, x in _parse_batch_response(llm_response).items() if cve_id in cve_ids}
+        if len(answers) < len(cve_ids):
+            self._logger.warning(f'The batched {evaluator.name()} response has no answer for '
+                                 f'{sorted(cve_ids - set(answers))}, they will be evaluated on their own.')
+
+        with Db() as db:
+            db.bulk_upsert('llm_evaluator_cache', ['llm', 'cve_id', 'decision_point', 'data'],
+                           [(self._llm, cve_id, evaluator.name(), json.dumps(x)) for cve_id, x in answers.items()],
+                           ['llm', 'cve_id', 'decision_point'])
+
+        return len(answers)
+
+    @staticmethod
+    def _get_entry(evaluator: BaseLlmEvaluator, context: EvaluationContext) -> str:
+        cve_data = compact_cve_data_json(context.cve_data(), [evaluator.name()]) if compaction_enabled() \
+            else context.cve_data_json()
+        return f'CVE ID: {context.cve_id}\nJSON data: {cve_data}'
+
+    def _get_prompt(self, evaluator: BaseLlmEvaluator, contexts: List[EvaluationContext]) -> str:
+        entries = '\n\n'.join(self._get_entry(evaluator, x) for x in contexts)
+
+        return f"""I am going to give you the IDs of several CVEs, each followed by some data related to that CVE in a
+        json format. Each json object has at its roots properties that represent different data sources, each property
+        of these is assigned to another json object that represent the information about the given CVE from that data
+        source. Your role is to use the provided information from these data sources and answer the following question
+        for every one of the CVEs, independently of the others:
+
+        {evaluator.instructions()}
+
+        You answer should be formatted as a json array with one json object per CVE, each with five properties: 1)
+        "cve_id" which contains the id of the cve in question, 2) "assessment" which holds your final assessment of the
+        CVE, 3) "justification": explaining how you reached to the answer you provided in the "assessment" property
+        (the description should not refer to the json data but rather talks about the information that led you to this
+        conclusion, aka, avoid saying the json data shows etc. Also avoid giving generic descriptions like: "multiple
+        sources have reported etc." but rather provide concrete descriptions: e.g., name the sources, name the versions
+        or software, provide links if available, etc. In addition the style of the assessment should be passive for
+        instance, rather than saying "I am unable to find any information about this vulnerability", you should say "No
+        information was found about this vulnerability", you do not have to use those exact same words but you should
+        not use "I"), 4) "confidence": ranges between 0 and 1, which indicates how confident you are in your
+        assessment, 1 being very confident, and 5) "links": which is an array that contains the related links to the
+        assessment (if any) that support your justification.
+
+        You should only respond with the json array nothing more.
+
+        Here are the CVEs:
+
+        {entries}
+        """
+
+
+def _parse_batch_response(llm_response: str) -> Dict[str, dict]:
+    """The answers of the response that have a cve id and an assessment, by cve id."""
+    cleaned = re.sub(r'```(?:json)?', '', llm_response)
+    start, end = cleaned.find('['), cleaned.rfind(']')
+    if start < 0 or end < start:
+        return dict()
+
+    try:
+        parsed = json.loads(cleaned[start:end + 1])
+    except json.JSONDecodeError:
+        return dict()
+
+    if not isinstance(parsed, list):
+        return dict()
+
+    return {x['cve_id'].upper(): x for x in parsed
+            if isinstance(x, dict) and isinstance(x.get('cve_id'), str) and 'assessment' in x}
@@ -0,0 +1,171 @@
+import json
+import logging
+import re
+from typing import Dict, List, Literal, Optional, Type
+
+from database.db import Db
+from single_flight import SingleFlight
+from ssvc.evaluation_context import EvaluationContext
+from ssvc.llm.llm_clients.gemini_llm_client import GeminiLlmClient
+from ssvc.llm.llm_clients.llm_client import LlmClient
+from ssvc.llm.llm_clients.openai_llm_client import OpenaiLlmClient
+from ssvc.llm.llm_evaluators.automatability_llm_evaluator import AutomatabilityLlmEvaluator
+from ssvc.llm.llm_evaluators.base_llm_evaluator import BaseLlmEvaluator
+from ssvc.llm.llm_evaluators.exploitation_llm_evaluator import ExploitationLlmEvaluator
+from ssvc.llm.llm_evaluators.exposure_llm_evaluator import ExposureLlmEvaluator
+from ssvc.llm.llm_evaluators.mission_impact_llm_evaluator import MissionImpactLlmEvaluator
+from ssvc.llm.llm_evaluators.mission_prevalence_llm_evaluator import MissionPrevalenceLlmEvaluator
+from ssvc.llm.llm_evaluators.public_wellbeing_llm_evaluator import PublicWellbeingLlmEvaluator
+from ssvc.llm.llm_evaluators.technical_impact_llm_evaluator import TechnicalImpactLlmEvaluator
+from ssvc.llm.llm_evaluators.value_density_llm_evaluator import ValueDensityLlmEvaluator
+from ssvc.llm.prompt_compaction import compact_cve_data_json, compaction_enabled
+
+LLM_EVALUATORS: List[Type[BaseLlmEvaluator]] = [
+    ExploitationLlmEvaluator,
+    AutomatabilityLlmEvaluator,
+    TechnicalImpactLlmEvaluator,
+    ExposureLlmEvaluator,
+    MissionImpactLlmEvaluator,
+    MissionPrevalenceLlmEvaluator,
+    PublicWellbeingLlmEvaluator,
+    ValueDensityLlmEvaluator,
+]
+
+
+class CombinedLlmEvaluator:
+    """
+    Asks all the decision points of a cve that reach an llm and have no
+    cached evaluation in a single prompt, so that the cve data is sent once
+    rather than once per decision point. The answers are cached per decision point in
+    `llm_evaluator_cache`, the same as the ones of the per-point evaluators.
+
+    The first llm evaluator of an evaluation that misses the cache runs the
+    combined prompt, the others reuse its answers through the evaluation
+    context. A decision point the answer lacks (or got wrong) is asked on
+    its own by its evaluator.
+    """
+    _single_flight = SingleFlight()
+
+    def __init__(self, llm: Literal['gemini', 'openai'] = 'gemini'):
+        self._llm = llm
+        self._llm_client: LlmClient = GeminiLlmClient() if llm == 'gemini' else OpenaiLlmClient()
+        self._evaluators = {x.name(): x(llm, mode='per_point') for x in LLM_EVALUATORS}
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+    def evaluate(self, context: EvaluationContext) -> Dict[str, dict]:
+        """The parsed answer of every decision point that was asked, by decision point."""
+        key = (self._llm, 'combined', context.cve_id, context.reevaluate)
+        return context.shared(f'combined_llm_evaluation:{self._llm}',
+                              lambda: self._single_flight.do(key, lambda: self._evaluate(context)))
+
+    def _evaluate(self, context: EvaluationContext) -> Dict[str, dict]:
+        cve_id = context.cve_id
+        pending = self._pending(context)
+        if len(pending) == 0:
+            return dict()
+
+        cve_data = compact_cve_data_json(context.cve_data(), pending) if compaction_enabled() \
+            else context.cve_data_json()
+        query = self._get_prompt(cve_id, pending, cve_data)
+
+        try:
+            llm_response = self._llm_client.respond(query)
+        except Exception as e:
+            self._logger.error(f'An error occurred while fetching the combined llm response. {e}')
+            return dict()
+
+        evaluations = _parse_combined_response(llm_response, pending)
+        if len(evaluations) < len(pending):
+            self._logger.warning(f'The combined llm response for cve {cve_id} has no (valid) answer for '
+                                 f'{sorted(set(pending) - set(evaluations))}.')
+
+        with Db() as db:
+            db.bulk_upsert('llm_evaluator_cache', ['llm', 'cve_id', 'decision_point', 'data'],
+                           [(self._llm, cve_id, name, json.dumps(x)) for name, x in evaluations.items()],
+                           ['llm', 'cve_id', 'decision_point'])
+
+        self._logger.info(f'Evaluated {len(evaluations)} decision points of cve {cve_id} in one llm call.')
+        return evaluations
+
+    def _pending(self, context: EvaluationContext) -> List[str]:
+        """
+        The decision points that fall through to an llm (all of them if the
+        context does not tell) without a cached evaluation, or all of those
+        when reevaluating.
+        """
+        names = [x for x in self._evaluators
+                 if context.llm_decision_points is None or x in context.llm_decision_points]
+        if len(names) == 0:
+            return names
+
+        with Db() as db:
+            if context.reevaluate:
+                db.execute(
+                    'DELETE FROM llm_evaluator_cache WHERE llm = %s AND cve_id = %s AND decision_point = ANY(%s)',
+                    (self._llm, context.cve_id, names))
+                return names
+
+            cached = {x['decision_point'] for x in db.all(
+                'SELECT decision_point FROM llm_evaluator_cache WHERE llm = %s AND cve_id = %s',
+                (self._llm, context.cve_id))}
+
+        return [x for x in names if x not in cached]
+
+    def _get_prompt(self, cve_id: str, decision_points: List[str], cve_data: str) -> str:
+        questions = '\n\n'.join(f'"{name}": {self._evaluators[name].instructions()}' for name in decision_points)
+
+        return f"""I am going to give you an ID of a specific CVE and some data related to that CVE in a json format.
+        The json object has at its roots properties that represent different data sources, each property of these is
+        assigned to another json object that represent the information about the given CVE from that data source. Your
+        role is to use the provided information from these data sources and answer each of the following questions,
+        every question is preceded by its key:
+
+        {questions}
+
+        You answer should be formatted as a json object with one property per question, named after the key of the
+        question. Each property is a json object with five properties: 1) "cve_id" which contains the id of the cve in
+        question, 2) "assessment" which holds your final assessment of the CVE for this question, 3) "justification":
+        explaining how you reached to the answer you provided in the "assessment" property (the description should not
+        refer to the json data but rather talks about the information that led you to this conclusion, aka, avoid
+        saying the json data shows etc. Also avoid giving generic descriptions like: "multiple sources have reported
+        etc." but rather provide concrete descriptions: e.g., name the sources, name the versions or software, provide
+        links if available, etc. In addition the style of the assessment should be passive for instance, rather than
+        saying "I am unable to find any information about this vulnerability", you should say "No information was
+        found about this vulnerability", you do not have to use those exact same words but you should not use "I"),
+        4) "confidence": ranges between 0 and 1, which indicates how confident you are in your assessment, 1 being very
+        confident, and 5) "links": which is an array that contains the related links to the assessment (if any) that
+        support your justification. Answer every question independently of the others.
+
+        You should only respond with the json object nothing more.
+
+        Here are the two pieces of information:
+
+        CVE ID: {cve_id}
+        JSON data: {cve_data}
+        """
+
+
+def _parse_combined_response(llm_response: str, decision_points: List[str]) -> Dict[str, dict]:
+    """The answers of the response that have an assessment, by decision point."""
+    parsed = _parse_json_object(llm_response)
+    if parsed is None:
+        return dict()
+
+    return {name: parsed[name] for name in decision_points
+            if isinstance(parsed.get(name), dict) and 'assessment' in parsed[name]}
+
+
+def _parse_json_object(llm_response: str) -> Optional[dict]:
+    """The outermost json object of a response, which may be wrapped in a markdown code block."""
+    cleaned = re.sub(r'```(?:json)?', '', llm_response)
+    start, end = cleaned.find('{'), cleaned.rfind('}')
+    if start < 0 or end < start:
+        return None
+
+    try:
+        parsed = json.loads(cleaned[start:end + 1])
+    except json.JSONDecodeError:
+        return None
+
+    return parsed if isinstance(parsed, dict) else None
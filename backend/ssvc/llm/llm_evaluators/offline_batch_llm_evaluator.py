@@ -0,0 +1,185 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, Iterable, Literal, Optional, Set
+
+from database.db import Db
+from importers.checkpoints import load_checkpoint, save_checkpoint
+from ssvc.evaluation_context import EvaluationContext
+from ssvc.llm.batch_backends.batch_backend import BatchBackend
+from ssvc.llm.batch_backends.local_file_batch_backend import LocalFileBatchBackend
+from ssvc.llm.llm_clients.gemini_llm_client import GeminiLlmClient
+from ssvc.llm.llm_clients.openai_llm_client import OpenaiLlmClient
+from ssvc.llm.llm_evaluators.base_llm_evaluator import BaseLlmEvaluator, parse_llm_response
+from ssvc.llm.llm_evaluators.combined_llm_evaluator import LLM_EVALUATORS
+
+
+def batch_backend(llm: Literal['gemini', 'openai'] = 'gemini') -> BatchBackend:
+    """The backend selected by `LLM_BATCH_BACKEND`: `local` (default) or `openai`."""
+    backend = os.getenv('LLM_BATCH_BACKEND', 'local')
+
+    if backend == 'openai':
+        from ssvc.llm.batch_backends.openai_batch_backend import OpenaiBatchBackend
+        return OpenaiBatchBackend()
+
+    return LocalFileBatchBackend((GeminiLlmClient() if llm == 'gemini' else OpenaiLlmClient()).respond)
+
+
+class OfflineBatchLlmEvaluator:
+    """
+    Evaluates the decision points of the cves of a bulk task through the
+    batch api of a provider, which is cheaper and has a higher throughput
+    than individual requests, but answers within hours:
+
+    1. the per-point prompts of the uncached evaluations that reach an llm
+       (see `SsvcScoreEvaluator.llm_decision_points`) are written to a JSONL
+       file under `LLM_BATCH_DIR` by `write_requests`, a window of contexts
+       at a time, while the task evaluates the cves that need no answers,
+    2. `submit` submits the file to the batch backend (see `batch_backend`),
+    3. `status` checks the job once, without waiting: the task is expected
+       to re-schedule itself every `poll_interval` (`LLM_BATCH_POLL_INTERVAL`)
+       seconds while the job is running, for at most `LLM_BATCH_TIMEOUT`
+       seconds after the submission,
+    4. the answers are parsed and cached in `llm_evaluator_cache`, where the
+       evaluations of the remaining cves find them.
+
+    The job is checkpointed per task, so the re-scheduled (or retried) task
+    resumes the job it submitted rather than submitting it again. The
+    evaluations that are not answered, or all of them when the backend does
+    not answer with the llm of the evaluator, are made by the regular llm
+    evaluators afterwards.
+    """
+
+    def __init__(self, llm: Literal['gemini', 'openai'] = 'gemini', backend: Optional[BatchBackend] = None,
+                 poll_interval: Optional[float] = None, timeout: Optional[float] = None):
+        self._llm = llm
+        self._directory = os.getenv('LLM_BATCH_DIR', '/tmp/ssvc_llm_batches')
+        self.poll_interval = poll_interval if poll_interval is not None \
+            else float(os.getenv('LLM_BATCH_POLL_INTERVAL', 60))
+        self._timeout = timeout if timeout is not None else float(os.getenv('LLM_BATCH_TIMEOUT', 24 * 3600))
+        self._evaluators = [x(llm, mode='per_point') for x in LLM_EVALUATORS]
+
+        # The number of requests written per task, since the evaluator was created.
+        self._written: Dict[str, int] = dict()
+
+        self._logger = logging.getLogger(self.__class__.__name__)
+
+        self._backend: Optional[BatchBackend] = backend or batch_backend(llm)
+        if self._backend.llm not in (None, llm):
+            self._logger.error(f'The {self._backend.__class__.__name__} answers with {self._backend.llm}, not {llm}, '
+                               f'the evaluations will be made one by one.')
+            self._backend = None
+
+    def status(self, task_id: str) -> Optional[Literal['running', 'completed', 'failed']]:
+        """
+        The status of the job of the task, or None if the task did not submit
+        one yet. A job is `completed` once its answers were cached, and
+        `failed` if it did not complete within the timeout, or when there is
+        no backend to submit it to.
+        """
+        if self._backend is None:
+            return 'failed'
+
+        checkpoint = self._checkpoint(task_id)
+        state = load_checkpoint(checkpoint)
+
+        if state is None:
+            return None
+
+        if 'status' in state:
+            # The job of a re-run task was already ingested.
+            return state['status']
+
+        status = self._backend.status(state['job_id'])
+        if status == 'running':
+            if time.time() - state['submitted_at'] < self._timeout:
+                return 'running'
+
+            self._logger.error(f'The llm job {state["job_id"]} of task {task_id} did not complete within '
+                               f'{self._timeout:.0f}s, its evaluations will be made one by one.')
+            status = 'failed'
+        elif status == 'failed':
+            self._logger.error(f'The llm job {state["job_id"]} of task {task_id} failed, '
+                               f'its evaluations will be made one by one.')
+        else:
+            self._ingest(state['job_id'])
+
+        save_checkpoint(checkpoint, {**state, 'status': status})
+        return status
+
+    def write_requests(self, task_id: str, contexts: Iterable[EvaluationContext]) -> Set[str]:
+        """
+        Adds the prompts of the uncached evaluations of `contexts` that reach
+        an llm to the requests of the task, and returns the ids of the cves
+        that were asked. The first call of the evaluator starts the requests
+        over, e.g., those of a task that failed before submitting them.
+        """
+        path = self._requests_path(task_id)
+        if task_id not in self._written:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._written[task_id] = 0
+            open(path, 'w').close()
+
+        contexts = list(contexts)
+        asked = set()
+
+        with open(path, 'a') as f:
+            for evaluator in self._evaluators:
+                name = evaluator.name()
+                reached = [x for x in contexts if x.llm_decision_points is None or name in x.llm_decision_points]
+                if len(reached) == 0:
+                    continue
+
+                cached = BaseLlmEvaluator.cached_cve_ids(self._llm, name, [x.cve_id for x in reached])
+                for context in reached:
+                    if context.cve_id in cached:
+                        continue
+
+                    f.write(json.dumps({'custom_id': f'{name}|{context.cve_id}',
+                                        'prompt': evaluator.prompt(context)}) + '\n')
+                    asked.add(context.cve_id)
+                    self._written[task_id] += 1
+
+        return asked
+
+    def submit(self, task_id: str) -> Literal['running', 'completed']:
+        """Submits the requests written for the task, `completed` if there were none."""
+        count = self._written.pop(task_id, 0)
+        if count == 0:
+            return 'completed'
+
+        state = {'job_id': self._backend.submit(self._requests_path(task_id)), 'requests': count,
+                 'submitted_at': time.time()}
+        save_checkpoint(self._checkpoint(task_id), state)
+
+        self._logger.info(f'Submitted {count} llm requests of task {task_id} as job {state["job_id"]}.')
+        return 'running'
+
+    def _checkpoint(self, task_id: str) -> str:
+        return f'llm_batch:{self._llm}:{task_id}'
+
+    def _requests_path(self, task_id: str) -> str:
+        return os.path.join(self._directory, task_id, 'requests.jsonl')
+
+    def _ingest(self, job_id: str) -> int:
+        rows = []
+        for custom_id, response in self._backend.results(job_id):
+            try:
+                parsed = None if response is None else parse_llm_response(response)
+            except ValueError as e:
+                self._logger.warning(f'The answer to {custom_id} could not be parsed. {e}')
+                continue
+
+            if parsed is None:
+                continue
+
+            decision_point, cve_id = custom_id.split('|', 1)
+            rows.append((self._llm, cve_id, decision_point, json.dumps(parsed)))
+
+        with Db() as db:
+            db.bulk_upsert('llm_evaluator_cache', ['llm', 'cve_id', 'decision_point', 'data'], rows,
+                           ['llm', 'cve_id', 'decision_point'])
+
+        self._logger.info(f'Cached the {len(rows)} answers of the llm job {job_id}.')
+        return len(rows)
@@ -0,0 +1,210 @@
+import json
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.data_sources.projections import project
+from ssvc.utils import estimate_tokens
+
+# The fields of a source that do not inform a decision point, as dotted paths
+# (lists are traversed). A field is only dropped from a prompt if it is
+# irrelevant to every decision point the prompt asks.
+_IRRELEVANT_FIELDS: Dict[str, List[Tuple[str, str]]] = {
+    'state_of_expolitation': [('nist', 'configurations'), ('nist', 'weaknesses'), ('osv', 'affected')],
+    'automatability': [('nist', 'configurations'), ('osv', 'affected.ranges'), ('kev', 'requiredAction'),
+                       ('kev', 'dueDate')],
+    'technical_impact': [('nist', 'configurations'), ('osv', 'affected.ranges'), ('kev', 'requiredAction'),
+                         ('kev', 'dueDate')],
+    'exposure': [('osv', 'affected.ranges'), ('kev', 'requiredAction'), ('kev', 'dueDate')],
+    'mission_impact': [('osv', 'affected.ranges'), ('kev', 'requiredAction'), ('kev', 'dueDate')],
+    'mission_prevalence': [('nist', 'weaknesses'), ('nist', 'metrics'), ('kev', 'requiredAction'),
+                           ('kev', 'dueDate')],
+    'public_wellbeing': [('osv', 'affected.ranges'), ('kev', 'requiredAction'), ('kev', 'dueDate')],
+    'value_density': [('nist', 'configurations'), ('osv', 'affected.ranges'), ('kev', 'requiredAction'),
+                      ('kev', 'dueDate')],
+}
+
+# Bookkeeping fields of the sources that no decision point uses.
+_NEVER_RELEVANT: List[Tuple[str, str]] = [
+    ('nist', 'sourceIdentifier'), ('nist', 'vulnStatus'), ('nist', 'cveTags'),
+    ('osv', 'schema_version'), ('osv', 'database_specific'), ('osv', 'affected.database_specific'),
+    ('vulnrichment', 'dataType'), ('vulnrichment', 'dataVersion'),
+]
+
+# How many items of a truncated list and characters of a truncated text are kept.
+_MAX_LIST_ITEMS = 10
+_MAX_TEXT_LENGTH = 2000
+
+
+def compaction_enabled() -> bool:
+    return os.getenv('LLM_PROMPT_COMPACTION', 'true').lower() == 'true'
+
+
+def prompt_token_budget() -> int:
+    return int(os.getenv('LLM_PROMPT_TOKEN_BUDGET', 30000))
+
+
+def compact_cve_data(cve_data: dict, decision_points: Sequence[str], token_budget: Optional[int] = None) -> dict:
+    """
+    Compacts the aggregated data of a cve (see `CveDataSourceAggregator`)
+    for a prompt asking `decision_points`:
+
+    1. the payload of every source is projected (see `projections`) and the
+       fields irrelevant to all the decision points are dropped,
+    2. the references that several sources list are kept once, by the first
+       source (in the order of the aggregator) that lists them,
+    3. while the data exceeds `token_budget` (default:
+       `LLM_PROMPT_TOKEN_BUDGET`) estimated tokens, it is truncated step by
+       step, least useful parts first (see `_TRUNCATIONS`). The truncated
+       parts are listed under `truncated`, so the llm knows the data is
+       partial.
+
+    The data is not modified in place.
+    """
+    token_budget = token_budget or prompt_token_budget()
+
+    irrelevant = set(_NEVER_RELEVANT)
+    if len(decision_points) > 0:
+        irrelevant |= set.intersection(*[set(_IRRELEVANT_FIELDS.get(x, [])) for x in decision_points])
+
+    compacted = dict()
+    for key, value in cve_data.items():
+        source = _source_name(key)
+        if source is None or not isinstance(value, dict):
+            compacted[key] = value
+            continue
+
+        value = project(source, value)
+        for field_source, path in irrelevant:
+            if field_source == source:
+                value = _drop(value, path.split('.'))
+        compacted[key] = value
+
+    compacted = _dedupe_references(compacted)
+
+    truncated = []
+    for label, truncate in _TRUNCATIONS:
+        if estimate_tokens(json.dumps(compacted)) <= token_budget:
+            break
+
+        shortened = truncate(compacted)
+        if shortened != compacted:
+            compacted = shortened
+            truncated.append(label)
+
+    if len(truncated) > 0:
+        compacted['truncated'] = truncated
+
+    return compacted
+
+
+def compact_cve_data_json(cve_data: dict, decision_points: Sequence[str], token_budget: Optional[int] = None) -> str:
+    return json.dumps(compact_cve_data(cve_data, decision_points, token_budget))
+
+
+def _source_name(key: str) -> Optional[str]:
+    return key[:-len('_data_source')] if key.endswith('_data_source') else None
+
+
+def _drop(data, path: List[str]):
+    """A copy of `data` without the field at `path`, traversing lists."""
+    if isinstance(data, list):
+        return [_drop(x, path) for x in data]
+
+    if not isinstance(data, dict) or path[0] not in data:
+        return data
+
+    if len(path) == 1:
+        return {k: v for k, v in data.items() if k != path[0]}
+
+    return {**data, path[0]: _drop(data[path[0]], path[1:])}
+
+
+def _normalize_url(url: str) -> str:
+    return url.strip().rstrip('/').lower().replace('http://', 'https://', 1)
+
+
+def _dedupe_references(cve_data: dict) -> dict:
+    """Drops the references (lists of objects with a `url` under a `references` key) already listed earlier."""
+    seen = set()
+
+    def dedupe(data):
+        if isinstance(data, list):
+            return [dedupe(x) for x in data]
+
+        if not isinstance(data, dict):
+            return data
+
+        result = dict()
+        for key, value in data.items():
+            if key == 'references' and isinstance(value, list):
+                kept = []
+                for reference in value:
+                    url = reference.get('url') if isinstance(reference, dict) else None
+                    if url is None or _normalize_url(url) not in seen:
+                        kept.append(reference)
+                    if url is not None:
+                        seen.add(_normalize_url(url))
+                value = kept
+            else:
+                value = dedupe(value)
+            result[key] = value
+
+        return result
+
+    return dedupe(cve_data)
+
+
+def _map_source(source: str, transform: Callable[[dict], dict]) -> Callable[[dict], dict]:
+    key = f'{source}_data_source'
+
+    def apply(cve_data: dict) -> dict:
+        if not isinstance(cve_data.get(key), dict):
+            return cve_data
+        return {**cve_data, key: transform(cve_data[key])}
+
+    return apply
+
+
+def _shorten_lists(key: str, max_items: int) -> Callable[[dict], dict]:
+    """Keeps the first `max_items` items of every list under `key`, at any depth."""
+
+    def shorten(data):
+        if isinstance(data, list):
+            return [shorten(x) for x in data]
+        if not isinstance(data, dict):
+            return data
+        return {k: v[:max_items] if k == key and isinstance(v, list) else shorten(v) for k, v in data.items()}
+
+    return shorten
+
+
+def _shorten_texts(max_length: int) -> Callable[[dict], dict]:
+    def shorten(data):
+        if isinstance(data, list):
+            return [shorten(x) for x in data]
+        if isinstance(data, dict):
+            return {k: shorten(v) for k, v in data.items()}
+        if isinstance(data, str) and len(data) > max_length:
+            return data[:max_length] + '...'
+        return data
+
+    return shorten
+
+
+def _drop_source(source: str) -> Callable[[dict], dict]:
+    key = f'{source}_data_source'
+    return lambda cve_data: {k: v for k, v in cve_data.items() if k != key}
+
+
+# The truncation steps, in the order they are applied while the data exceeds
+# the budget: the bulky, repetitive parts first, the descriptions and the
+# exploitation evidence last.
+_TRUNCATIONS: List[Tuple[str, Callable[[dict], dict]]] = [
+    ('nist.configurations.cpeMatch', _map_source('nist', _shorten_lists('cpeMatch', _MAX_LIST_ITEMS))),
+    ('osv.affected', _map_source('osv', _shorten_lists('affected', _MAX_LIST_ITEMS))),
+    ('references', _shorten_lists('references', _MAX_LIST_ITEMS)),
+    ('texts', _shorten_texts(_MAX_TEXT_LENGTH)),
+    ('osv', _drop_source('osv')),
+    ('vulnrichment', _drop_source('vulnrichment')),
+    ('nist.configurations', _map_source('nist', lambda x: _drop(x, ['configurations']))),
+]
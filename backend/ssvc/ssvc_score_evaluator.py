@@ -1,11 +1,12 @@
 import json
 import uuid
 from dataclasses import dataclass, asdict
-from typing import Literal, Optional, Tuple
+from typing import Dict, Literal, Optional, Set, Tuple
 
 import concurrent.futures
 import pandas as pd
 
+from app.data_sources.aliases import AliasGroup, resolve_aliases
 from database.db import Db
 from ssvc.evaluation_aggregators.automatability_evaluation_aggregator import AutomatabilityEvaluationAggregator
 from ssvc.evaluation_aggregators.exploitation_evaluation_aggregator import ExploitationEvaluationAggregator
@@ -15,10 +16,71 @@ from ssvc.evaluation_aggregators.mission_prevalence_evaluation_aggregator import
 from ssvc.evaluation_aggregators.public_wellbeing_evaluation_aggregator import PublicWellbeingEvaluationAggregator
 from ssvc.evaluation_aggregators.technical_impact_evaluation_aggregator import TechnicalImpactEvaluationAggregator
 from ssvc.evaluation_aggregators.value_density_evaluation_aggregator import ValueDensityEvaluationAggregator
+from ssvc.evaluation_context import EvaluationContext
 from ssvc.evaluation_units.evaluation_unit import EvaluationResult
 from ssvc.utils import from_json
 
 
+_MISSION_PREVALENCE_WELLBEING_DF = pd.DataFrame({
+    'minimal': {'minimal': 'low', 'support': 'medium', 'essential': 'high'},
+    'material': {'minimal': 'medium', 'support': 'medium', 'essential': 'high'},
+    'irreversible': {'minimal': 'high', 'support': 'high', 'essential': 'high'}
+})
+
+_TREE_DF = pd.DataFrame({
+    'exploitation': ['none', 'none', 'none', 'none', 'none', 'none', 'none', 'none', 'none', 'none', 'none',
+                     'none',
+                     'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc',
+                     'active',
+                     'active', 'active', 'active', 'active', 'active', 'active', 'active', 'active', 'active',
+                     'active',
+                     'active'],
+    'automatability': ['no', 'no', 'no', 'no', 'no', 'no', 'yes', 'yes', 'yes', 'yes', 'yes', 'yes',
+                       'no', 'no', 'no', 'no', 'no', 'no', 'yes', 'yes', 'yes', 'yes', 'yes', 'yes',
+                       'no', 'no', 'no', 'no', 'no', 'no', 'yes', 'yes', 'yes', 'yes', 'yes', 'yes'],
+    'technical_impact': ['partial', 'partial', 'partial', 'total', 'total', 'total', 'partial', 'partial',
+                         'partial',
+                         'total', 'total', 'total', 'partial', 'partial', 'partial', 'total', 'total', 'total',
+                         'partial',
+                         'partial', 'partial', 'total', 'total', 'total', 'partial', 'partial', 'partial',
+                         'total',
+                         'total',
+                         'total', 'partial', 'partial', 'partial', 'total', 'total', 'total'],
+    'mission_and_wellbeing': ['low', 'medium', 'high', 'low', 'medium', 'high', 'low', 'medium', 'high', 'low',
+                              'medium', 'high',
+                              'low', 'medium', 'high', 'low', 'medium', 'high', 'low', 'medium', 'high', 'low',
+                              'medium', 'high',
+                              'low', 'medium', 'high', 'low', 'medium', 'high', 'low', 'medium', 'high', 'low',
+                              'medium', 'high'],
+    'decision': ['track', 'track', 'track', 'track', 'track', 'track*', 'track', 'track', 'attend', 'track',
+                 'track',
+                 'attend',
+                 'track', 'track', 'track*', 'track', 'track*', 'attend', 'track', 'track', 'attend', 'track',
+                 'track*',
+                 'attend',
+                 'track', 'track', 'attend', 'track', 'attend', 'act', 'attend', 'attend', 'act', 'attend',
+                 'act',
+                 'act']
+})
+
+
+def compute_action(results: Dict[str, EvaluationResult]) -> str:
+    """
+    The action of the decision tree for the assessments of the decision
+    points, keyed as in `SsvcEvaluationResult` (only exploitation,
+    automatability, technical impact, mission prevalence and public
+    wellbeing are used).
+    """
+    mission_prevalence_wellbeing = _MISSION_PREVALENCE_WELLBEING_DF.loc[
+        results['mission_prevalence'].assessment, results['public_wellbeing'].assessment]
+
+    return _TREE_DF[
+        (_TREE_DF['exploitation'] == results['exploitation'].assessment) &
+        (_TREE_DF['automatability'] == results['automatability'].assessment) &
+        (_TREE_DF['technical_impact'] == results['technical_impact'].assessment) &
+        (_TREE_DF['mission_and_wellbeing'] == mission_prevalence_wellbeing)].values[0][-1]
+
+
 @dataclass
 class SsvcEvaluationResult:
     action: Literal['track', 'track*', 'attend', 'act']
@@ -34,6 +96,7 @@ class SsvcEvaluationResult:
 
 class SsvcScoreEvaluator:
     def __init__(self, llm: Literal['gemini', 'openai'] = 'gemini'):
+        self.llm = llm
         self._aggregators = {
             'automatability': AutomatabilityEvaluationAggregator(llm),
             'exploitation': ExploitationEvaluationAggregator(llm),
@@ -45,49 +108,33 @@ class SsvcScoreEvaluator:
             'value_density': ValueDensityEvaluationAggregator(llm)
         }
 
-        self._mission_prevalence_wellbeing_df = pd.DataFrame({
-            'minimal': {'minimal': 'low', 'support': 'medium', 'essential': 'high'},
-            'material': {'minimal': 'medium', 'support': 'medium', 'essential': 'high'},
-            'irreversible': {'minimal': 'high', 'support': 'high', 'essential': 'high'}
-        })
-
-        self._tree_df = pd.DataFrame({
-            'exploitation': ['none', 'none', 'none', 'none', 'none', 'none', 'none', 'none', 'none', 'none', 'none',
-                             'none',
-                             'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc', 'poc',
-                             'active',
-                             'active', 'active', 'active', 'active', 'active', 'active', 'active', 'active', 'active',
-                             'active',
-                             'active'],
-            'automatability': ['no', 'no', 'no', 'no', 'no', 'no', 'yes', 'yes', 'yes', 'yes', 'yes', 'yes',
-                               'no', 'no', 'no', 'no', 'no', 'no', 'yes', 'yes', 'yes', 'yes', 'yes', 'yes',
-                               'no', 'no', 'no', 'no', 'no', 'no', 'yes', 'yes', 'yes', 'yes', 'yes', 'yes'],
-            'technical_impact': ['partial', 'partial', 'partial', 'total', 'total', 'total', 'partial', 'partial',
-                                 'partial',
-                                 'total', 'total', 'total', 'partial', 'partial', 'partial', 'total', 'total', 'total',
-                                 'partial',
-                                 'partial', 'partial', 'total', 'total', 'total', 'partial', 'partial', 'partial',
-                                 'total',
-                                 'total',
-                                 'total', 'partial', 'partial', 'partial', 'total', 'total', 'total'],
-            'mission_and_wellbeing': ['low', 'medium', 'high', 'low', 'medium', 'high', 'low', 'medium', 'high', 'low',
-                                      'medium', 'high',
-                                      'low', 'medium', 'high', 'low', 'medium', 'high', 'low', 'medium', 'high', 'low',
-                                      'medium', 'high',
-                                      'low', 'medium', 'high', 'low', 'medium', 'high', 'low', 'medium', 'high', 'low',
-                                      'medium', 'high'],
-            'decision': ['track', 'track', 'track', 'track', 'track', 'track*', 'track', 'track', 'attend', 'track',
-                         'track',
-                         'attend',
-                         'track', 'track', 'track*', 'track', 'track*', 'attend', 'track', 'track', 'attend', 'track',
-                         'track*',
-                         'attend',
-                         'track', 'track', 'attend', 'track', 'attend', 'act', 'attend', 'attend', 'act', 'attend',
-                         'act',
-                         'act']
-        })
-
-    def evaluate(self, cve_id: str, reevaluate: bool = False) -> Optional[Tuple[str, SsvcEvaluationResult]]:
+    def llm_decision_points(self, context: EvaluationContext) -> Set[str]:
+        """
+        The decision points of the cve that fall through to an llm, i.e., that
+        no data source or rule answers. They are set on the context, so that
+        the llm evaluators only ask for those (see `CombinedLlmEvaluator`).
+        """
+        if context.llm_decision_points is None:
+            decision_points = [x.llm_decision_point(context) for x in self._aggregators.values()]
+            context.llm_decision_points = {x for x in decision_points if x is not None}
+
+        return context.llm_decision_points
+
+    def evaluate(
+            self,
+            cve_id: str,
+            reevaluate: bool = False,
+            aliases: Optional[AliasGroup] = None,
+            context: Optional[EvaluationContext] = None) -> Optional[Tuple[str, SsvcEvaluationResult]]:
+        """
+        Evaluates the vulnerability under its canonical id, so that all the ids
+        it is known by (e.g., a GO advisory and its CVE) share one evaluation.
+        `aliases` can be passed when they were already resolved in bulk, and
+        the `context` of the evaluation when its data was loaded in bulk.
+        """
+        aliases = aliases or resolve_aliases([cve_id])[cve_id.upper()]
+        cve_id = aliases.canonical
+
         if not reevaluate:
             # Check the cache first
             with Db() as db:
@@ -98,21 +145,18 @@ class SsvcScoreEvaluator:
             with Db() as db:
                 db.execute('DELETE FROM ssvc_results WHERE cve_id=%s', (cve_id,))
 
+        # The context is shared by all aggregators, so the cve data is loaded once.
+        context = context or EvaluationContext(cve_id, reevaluate, aliases=aliases.ids)
+        self.llm_decision_points(context)
+
         with concurrent.futures.ThreadPoolExecutor() as executor:
             results = dict(
-                executor.map(lambda x: (x[0], x[1].aggregate(cve_id, reevaluate)), self._aggregators.items()))
+                executor.map(lambda x: (x[0], x[1].aggregate(context)), self._aggregators.items()))
 
         if results is None or any(r is None for r in results.values()):
             return None
 
-        mission_prevalence_wellbeing = self._mission_prevalence_wellbeing_df.loc[
-            results['mission_prevalence'].assessment, results['public_wellbeing'].assessment]
-
-        action = self._tree_df[
-            (self._tree_df['exploitation'] == results['exploitation'].assessment) &
-            (self._tree_df['automatability'] == results['automatability'].assessment) &
-            (self._tree_df['technical_impact'] == results['technical_impact'].assessment) &
-            (self._tree_df['mission_and_wellbeing'] == mission_prevalence_wellbeing)].values[0][-1]
+        action = compute_action(results)
 
         result = SsvcEvaluationResult(
             action,
@@ -1,6 +1,9 @@
 import json
-from typing import Optional, TypeVar, Type
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, TypeVar, Type, Dict, Sequence, Tuple
 
+import numpy as np
 from dacite import from_dict
 
 T = TypeVar('T')
@@ -14,6 +17,14 @@ def from_json(json_string: str, data_class: Type[T]) -> T:
         raise ValueError(f"Failed to parse JSON: {e}")
 
 
+def estimate_tokens(text: str) -> int:
+    """
+    A rough count of the llm tokens of a text, about 4 characters per token
+    for english and json. Used to size prompts, not to bill them.
+    """
+    return len(text) // 4 + 1
+
+
 def extract_cvss_from_nist(data: dict) -> Optional[str]:
     """
     Given the data return from the nist api, this method
@@ -39,20 +50,167 @@ def extract_cvss_from_nist(data: dict) -> Optional[str]:
     return None
 
 
-def standardize_cvss(cvss: str) -> list[str]:
+# The metrics used by the heuristic evaluation units, by their standardized
+# name. The impact metrics are named `C`, `I` and `A` before v4.0, where they
+# became `VC`, `VI` and `VA`.
+CVSS_METRICS = ('AV', 'AC', 'PR', 'UI', 'S', 'VC', 'VI', 'VA')
+_CVSS_ALIASES = {'VC': 'C', 'VI': 'I', 'VA': 'A'}
+
+
+@dataclass(frozen=True, slots=True)
+class CvssVector:
+    """
+    A parsed cvss vector string, reduced to its version and the metrics in
+    `CVSS_METRICS`. A metric that the version does not have (e.g., `PR` and
+    `UI` in v2.0) is None. Instances are shared by `parse_cvss` and must not
+    be modified.
+    """
+    vector: str
+    version: str
+    av: Optional[str] = None
+    ac: Optional[str] = None
+    pr: Optional[str] = None
+    ui: Optional[str] = None
+    s: Optional[str] = None
+    vc: Optional[str] = None
+    vi: Optional[str] = None
+    va: Optional[str] = None
+
+
+@lru_cache(maxsize=16384)
+def parse_cvss(vector: str) -> CvssVector:
+    """
+    Parses a v2.0, v3.0, v3.1 or v4.0 cvss vector string. The number of
+    distinct vectors is small compared to the number of cves, so parsed
+    vectors are memoized. Raises ValueError if the vector is malformed.
+    """
+    parts = vector.split('/')
+    if parts[0].startswith('CVSS:'):
+        version = parts.pop(0)[5:]
+    else:
+        version = '2.0'
+
+    metrics: Dict[str, str] = dict()
+    for part in parts:
+        key, separator, value = part.partition(':')
+        if separator == '' or key == '' or value == '':
+            raise ValueError(f'Malformed cvss vector: {vector}')
+        metrics[key] = value
+
+    for name, alias in _CVSS_ALIASES.items():
+        if name not in metrics and alias in metrics:
+            metrics[name] = metrics[alias]
+
+    return CvssVector(vector, version, *(metrics.get(x) for x in CVSS_METRICS))
+
+
+def cvss_exposure(cvss: CvssVector) -> Optional[str]:
+    """
+    The exposure heuristic of `HeuristicExposureEvaluationUnit`, or None if
+    the vector does not decide it.
+    """
+    if cvss.av == 'N' and cvss.pr == 'N' and cvss.ui == 'N':
+        return 'open'
+
+    if cvss.av in ('N', 'A') and (cvss.pr in ('L', 'H') or cvss.ui == 'R'):
+        return 'controlled'
+
+    if cvss.av in ('L', 'P'):
+        return 'small'
+
+    return None
+
+
+def cvss_value_density(cvss: CvssVector) -> str:
+    """The value density heuristic of `HeuristicValueDensityEvaluationUnit`."""
+    if cvss.av == 'N' and cvss.pr == 'N' and 'H' in (cvss.vc, cvss.vi, cvss.va):
+        return 'concentrated'
+
+    if cvss.av in ('L', 'A') or cvss.pr in ('L', 'H') or cvss.ui == 'R':
+        return 'diffused'
+
+    if cvss.s == 'C':
+        return 'concentrated'
+
+    return 'diffused'
+
+
+def _cvss_metric_codes(vectors: Sequence[Optional[str]]) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
     """
-    This method normalizes some of the fields found in the
-    cvss string. Different versions may have different field
-    names that represent the same data. For example the Integrity
-    impact in v3.0 has the field name `I`, whereas in v4.0, it has
-    the field name `VI`. The method would map it to `VI` regardless
-    of the version.
+    The vectors as a fixed width byte array, and the value of every metric in
+    `CVSS_METRICS` as an array of ascii codes (0 where a vector does not have
+    the metric).
     """
-    cvss = dict(map(lambda x: x.split(':'), cvss.split('/')))
+    # Delimiting every vector with slashes lets `/AV:` be searched without
+    # matching e.g. `/MAV:`, and `/A:` without matching `/VA:`.
+    delimited = np.asarray([f'/{x}/' for x in vectors], dtype=str).astype(bytes)
+    width = delimited.dtype.itemsize
+    matrix = delimited.view(np.uint8).reshape(len(delimited), width)
+    rows = np.arange(len(delimited))
+
+    def codes(key: str) -> np.ndarray:
+        # All the parsed metrics have single character values.
+        pattern = f'/{key}:'.encode()
+        position = np.char.find(delimited, pattern) + len(pattern)
+        found = (position >= len(pattern)) & (position < width)
+        return np.where(found, matrix[rows, np.minimum(position, width - 1)], 0).astype(np.uint8)
+
+    metrics = dict()
+    for name in CVSS_METRICS:
+        values = codes(name)
+        if name in _CVSS_ALIASES:
+            values = np.where(values == 0, codes(_CVSS_ALIASES[name]), values)
+        metrics[name] = values
+
+    return delimited, metrics
+
+
+def parse_cvss_bulk(vectors: Sequence[Optional[str]]) -> Dict[str, np.ndarray]:
+    """
+    The bulk counterpart of `parse_cvss`, for offline rescoring: parses a
+    whole column of vector strings with vectorized NumPy operations instead
+    of one vector at a time. Returns one array per lowercase metric name,
+    plus `version`, with an empty string where a vector does not have the
+    metric or is None.
+    """
+    delimited, metrics = _cvss_metric_codes(['' if x is None else x for x in vectors])
+
+    parsed = {name.lower(): values.view('S1').astype(str) for name, values in metrics.items()}
+
+    # The first metric of a v3.0+ vector is its version, e.g., `CVSS:3.1`.
+    prefix = np.char.partition(np.char.partition(delimited, b'/')[:, 2], b'/')[:, 0]
+    versions = np.where(np.char.startswith(prefix, b'CVSS:'), np.char.partition(prefix, b':')[:, 2],
+                        np.where(delimited == b'//', b'', b'2.0'))
+    parsed['version'] = versions.astype(str)
+    return parsed
+
+
+def classify_cvss_bulk(vectors: Sequence[Optional[str]]) -> Dict[str, np.ndarray]:
+    """
+    Applies `cvss_exposure` and `cvss_value_density` to a whole column of
+    vector strings (see `parse_cvss_bulk`). Returns the `exposure` and
+    `value_density` arrays, with an empty string where the heuristic does
+    not decide or the vector is None.
+    """
+    delimited, metrics = _cvss_metric_codes(['' if x is None else x for x in vectors])
+
+    def any_of(name: str, values: str) -> np.ndarray:
+        return np.isin(metrics[name], np.frombuffer(values.encode(), dtype=np.uint8))
+
+    av_n, pr_n = any_of('AV', 'N'), any_of('PR', 'N')
+
+    exposure = np.select(
+        [av_n & pr_n & any_of('UI', 'N'),
+         any_of('AV', 'NA') & (any_of('PR', 'LH') | any_of('UI', 'R')),
+         any_of('AV', 'LP')],
+        ['open', 'controlled', 'small'],
+        default='')
 
-    replacements = [('C', 'VC'), ('I', 'VI'), ('A', 'VA')]
-    for r in replacements:
-        if r[0] in cvss and r[1] not in cvss:
-            cvss[r[1]] = cvss.pop(r[0])
+    value_density = np.select(
+        [av_n & pr_n & (any_of('VC', 'H') | any_of('VI', 'H') | any_of('VA', 'H')),
+         any_of('AV', 'LA') | any_of('PR', 'LH') | any_of('UI', 'R'),
+         any_of('S', 'C')],
+        ['concentrated', 'diffused', 'concentrated'],
+        default='diffused')
 
-    return list(map(lambda x: f'{x[0]}:{x[1]}', cvss.items()))
+    return {'exposure': exposure, 'value_density': np.where(delimited == b'//', '', value_density)}
@@ -2,7 +2,7 @@ import json
 import os
 import re
 import uuid
-from typing import Literal, List, Optional
+from typing import Dict, Literal, List, Optional
 
 from . import config
 
@@ -13,6 +13,12 @@ from database.db import Db
 
 app = Celery(broker=f'pyamqp://guest@{os.getenv("RABBITMQ_HOST")}')
 
+# The number of evaluated cves whose task links are written at once.
+_TASK_LINKS_BATCH_SIZE = int(os.getenv('TASK_LINKS_BATCH_SIZE', 50))
+
+# The number of cves of a task whose data is loaded (and held) at once.
+_EVALUATION_WINDOW_SIZE = int(os.getenv('EVALUATION_WINDOW_SIZE', 500))
+
 
 def submit_task(
         task_type: Literal['ssvc_bulk_evaluation'],
@@ -53,10 +59,12 @@ def task_prerun_handler(task_id, task, *args, **kwargs):
 @task_postrun.connect
 def task_postrun_handler(task_id, task, *args, **kwargs):
     state = kwargs['state']
+    # A task that re-scheduled itself (e.g., to wait for an llm batch job) runs again later.
+    status = {'SUCCESS': 'succeeded', 'RETRY': 'queued'}.get(state, 'failed')
     with Db() as db:
         db.execute(
             'UPDATE tasks SET status = %s WHERE id = %s',
-            ('succeeded' if state == 'SUCCESS' else 'failed', task_id)
+            (status, task_id)
         )
 
 
@@ -64,47 +72,134 @@ def task_postrun_handler(task_id, task, *args, **kwargs):
 def ssvc_bulk_evaluation(self, cve_list: List[str], reevaluate: bool = False):
     task_id: str = self.request.id
 
+    from app.data_sources.aliases import resolve_aliases
+    from app.data_sources.cve_data_source_aggregator import CveDataSourceAggregator
+    from ssvc.evaluation_context import EvaluationContext
     from ssvc.ssvc_score_evaluator import SsvcScoreEvaluator
     ssvc = SsvcScoreEvaluator()
+    aggregator = CveDataSourceAggregator()
 
-    for cve_id in cve_list:
-        # check if the cve is evaluated for this task.
+    pattern = r'^(?:CVE|GO|HSEC|PYSEC)-\d{4}-\d{1,7}$'
+
+    # Skip the cves that were already evaluated for this task (e.g., when the task is retried).
+    with Db() as db:
+        linked = {x['cve_id'] for x in db.all('SELECT cve_id FROM ssvc_result_task_links WHERE task_id=%s',
+                                              (task_id,))}
+    pending = [x for x in cve_list if x not in linked]
+
+    # The ids of a vulnerability (e.g., a GO advisory and its CVE) are
+    # evaluated once, under their canonical id.
+    aliases = resolve_aliases([x for x in pending if re.match(pattern, x)])
+    ids_by_canonical = {x.canonical: x.ids for x in aliases.values()}
+
+    def load_contexts(cve_ids: List[str]) -> Dict[str, EvaluationContext]:
+        """
+        The contexts of the cves that have no stored evaluation, loaded in
+        bulk rather than paying a round trip per cve and data source during
+        their evaluations, and the decision points of each that reach an llm.
+        """
         with Db() as db:
-            result = db.first('SELECT * FROM ssvc_result_task_links WHERE task_id=%s AND cve_id=%s',
-                              (task_id, cve_id))
-            if result is not None:
+            evaluated = {x['cve_id'] for x in db.all('SELECT cve_id FROM ssvc_results WHERE cve_id = ANY(%s)',
+                                                     (cve_ids,))}
+
+        to_load = [x for x in cve_ids if x not in evaluated]
+        loaded = aggregator.load_many(to_load, {x: ids_by_canonical[x] for x in to_load})
+
+        # A cve a source failed to load as a whole for is loaded again by its evaluation.
+        contexts = {
+            x: EvaluationContext(x, aggregator=aggregator, aliases=ids_by_canonical[x], cve_data=loaded[x])
+            for x in to_load
+            if 'failed' not in loaded[x].get('unavailable_data_sources', dict()).values()
+        }
+
+        EvaluationContext.prefetch_cvss(list(contexts.values()))
+        for context in contexts.values():
+            ssvc.llm_decision_points(context)
+
+        return contexts
+
+    # Evaluate the decision points of many cves per llm request (`batched`)
+    # or through the batch api of the provider (`offline`), the evaluations
+    # then find their llm answers in the cache.
+    bulk_mode = 'per_cve' if reevaluate else os.getenv('LLM_BULK_MODE', 'per_cve')
+
+    # In `offline` mode, the first run asks the batch api for the decision
+    # points of its cves and evaluates those that need no answers. The task
+    # is then re-scheduled, rather than holding the worker while the job
+    # runs, and evaluates the remaining cves once their answers are cached.
+    defer = False
+    if bulk_mode == 'offline':
+        from ssvc.llm.llm_evaluators.offline_batch_llm_evaluator import OfflineBatchLlmEvaluator
+        offline_evaluator = OfflineBatchLlmEvaluator(ssvc.llm)
+
+        offline_status = offline_evaluator.status(task_id)
+        if offline_status == 'running':
+            raise self.retry(countdown=offline_evaluator.poll_interval, max_retries=None)
+        defer = offline_status is None
+
+    if bulk_mode == 'batched':
+        from ssvc.llm.llm_evaluators.batch_llm_evaluator import BatchLlmEvaluator
+        batch_evaluator = BatchLlmEvaluator(ssvc.llm)
+
+    # With `reevaluate`, the aliases of a vulnerability reuse the evaluation made earlier in this task.
+    evaluated_in_task = dict()
+
+    # The links are written in batches; a retried task re-evaluates at most
+    # the cves of the last unwritten batch, which reuse their stored results.
+    links = []
+
+    def flush_links():
+        with Db() as db:
+            db.bulk_upsert('ssvc_result_task_links', ['task_id', 'cve_id', 'result_id', 'notes'], links)
+        links.clear()
+
+    # The canonical ids that wait for the answers of the batch job, they are
+    # loaded again once it completed.
+    deferred = set()
+
+    # The cves are loaded a window at a time, so that the data of only one
+    # window is held in memory.
+    for start in range(0, len(pending), _EVALUATION_WINDOW_SIZE):
+        window = pending[start:start + _EVALUATION_WINDOW_SIZE]
+
+        contexts = dict()
+        if not reevaluate:
+            contexts = load_contexts(list(dict.fromkeys(
+                aliases[x].canonical for x in window if x in aliases
+                and aliases[x].canonical not in evaluated_in_task and aliases[x].canonical not in deferred)))
+
+        if bulk_mode == 'batched':
+            batch_evaluator.evaluate(list(contexts.values()))
+
+        if defer:
+            deferred.update(offline_evaluator.write_requests(task_id, contexts.values()))
+
+        for cve_id in window:
+            if len(links) >= _TASK_LINKS_BATCH_SIZE:
+                flush_links()
+
+            # Check if valid cve:
+            if not bool(re.match(pattern, cve_id)):
+                links.append((task_id, cve_id, None, 'Invalid cve id format.'))
                 continue
 
-        # Check if valid cve:
-        pattern = r'^(?:CVE|GO|HSEC|PYSEC)-\d{4}-\d{1,7}$'
-        if not bool(re.match(pattern, cve_id)):
-            with Db() as db:
-                db.execute(
-                    """
-                    INSERT INTO ssvc_result_task_links(task_id, cve_id, notes)
-                    VALUES(%s, %s, %s)
-                    """,
-                    (task_id, cve_id, 'Invalid cve id format.'))
+            # Evaluate
+            canonical_id = aliases[cve_id].canonical
+            if canonical_id in deferred:
                 continue
 
-        # Evaluate
-        result = ssvc.evaluate(cve_id, reevaluate)
-
-        if result is None:
-            with Db() as db:
-                db.execute(
-                    """
-                    INSERT INTO ssvc_result_task_links(task_id, cve_id, notes)
-                    VALUES(%s, %s, %s)
-                    """,
-                    (task_id, cve_id, 'Could not evaluate the cve.'))
+            if canonical_id not in evaluated_in_task:
+                evaluated_in_task[canonical_id] = ssvc.evaluate(cve_id, reevaluate, aliases[cve_id],
+                                                                contexts.pop(canonical_id, None))
+            result = evaluated_in_task[canonical_id]
+
+            if result is None:
+                links.append((task_id, cve_id, None, 'Could not evaluate the cve.'))
                 continue
 
-        with Db() as db:
-            db.execute(
-                """
-                INSERT INTO ssvc_result_task_links(task_id, cve_id, result_id)
-                VALUES(%s, %s, %s)
-                """,
-                (task_id, cve_id, result[0])
-            )
+            links.append((task_id, cve_id, result[0], None))
+
+    flush_links()
+
+    if defer and offline_evaluator.submit(task_id) == 'running':
+        raise self.retry(countdown=offline_evaluator.poll_interval, max_retries=None)
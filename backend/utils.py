@@ -1,10 +1,28 @@
+import asyncio
 import logging
+import os
+import threading
 import time
+import weakref
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Awaitable, TypeVar, Mapping
+from urllib.parse import urlparse
 
+import aiohttp
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3 import Retry
 
+DEFAULT_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 30))
+
+# Connections the async client keeps open at once, across all hosts.
+MAX_ASYNC_CONNECTIONS = int(os.getenv('HTTP_MAX_ASYNC_CONNECTIONS', 500))
+
+T = TypeVar('T')
+
+# Statuses that mean "slow down" rather than "failed".
+_RATE_LIMITED_STATUSES = [429, 503]
+
 
 def create_session() -> requests.Session:
     session = requests.Session()
@@ -15,13 +33,271 @@ def create_session() -> requests.Session:
         max_retries=Retry(
             total=3,
             backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504]))
+            status_forcelist=[500, 502, 504]))
     session.mount('http://', adapter)
     session.mount('https://', adapter)
 
     return session
 
 
+class RateLimitExceeded(Exception):
+    """Raised rather than waiting for a rate limit longer than the caller allows."""
+
+
+class TokenBucket:
+    """
+    Allows `capacity` requests per `period` seconds, in bursts of at most
+    `capacity`. `acquire` blocks until a token is available, or raises
+    `RateLimitExceeded` right away if that would take more than `max_wait`
+    seconds. `block_for` holds every caller back, e.g., for the duration of
+    a `Retry-After`. A request can take several tokens, e.g., to budget llm
+    tokens per minute; a request larger than the capacity waits for a full
+    bucket.
+    """
+
+    def __init__(self, capacity: int, period: float):
+        self._capacity = capacity
+        self._rate = capacity / period
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1, max_wait: Optional[float] = None):
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            wait = self._take(amount, deadline)
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, amount: float = 1, max_wait: Optional[float] = None):
+        deadline = None if max_wait is None else time.monotonic() + max_wait
+        while True:
+            wait = self._take(amount, deadline)
+            if wait == 0:
+                return
+            await asyncio.sleep(wait)
+
+    def block_for(self, seconds: float):
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0
+
+    def _take(self, amount: float = 1, deadline: Optional[float] = None) -> float:
+        """
+        Takes `amount` tokens and returns 0, or returns how long to wait before
+        trying again. Raises `RateLimitExceeded` if that is past the `deadline`.
+        """
+        amount = min(amount, self._capacity)
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+            self._updated_at = now
+
+            if now >= self._blocked_until and self._tokens >= amount:
+                self._tokens -= amount
+                return 0
+
+            wait = max(self._blocked_until - now, (amount - self._tokens) / self._rate)
+
+        if deadline is not None and now + wait > deadline:
+            raise RateLimitExceeded(f'The rate limit allows the next request in {wait:.1f}s.')
+
+        return wait
+
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_rate_limiters: Dict[str, TokenBucket] = dict()
+
+
+def get_session() -> requests.Session:
+    """The keep-alive session shared by all data sources, importers and scrapers."""
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+            _register_default_rate_limits()
+
+    return _session
+
+
+def set_rate_limit(host: str, capacity: int, period: float):
+    """Limits the requests sent to `host` (through any session) to `capacity` per `period` seconds."""
+    _rate_limiters[host] = TokenBucket(capacity, period)
+
+
+def _register_default_rate_limits():
+    # NVD: 5 requests per rolling 30 seconds without an api key, 50 with one.
+    if 'services.nvd.nist.gov' not in _rate_limiters:
+        set_rate_limit('services.nvd.nist.gov', 50 if os.getenv('NIST_API_KEY') else 5, 30)
+
+    # GitHub rest api: 60 requests per hour unauthenticated, 5000 with a token.
+    if 'api.github.com' not in _rate_limiters:
+        set_rate_limit('api.github.com', 5000 if os.getenv('GITHUB_PAT') else 60, 3600)
+
+
+def http_get(
+        url: str,
+        headers: dict = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        stream: bool = False,
+        session: requests.Session = None,
+        max_rate_limit_retries: int = 5,
+        logger: logging.Logger = None,
+        max_rate_limit_wait: Optional[float] = None) -> requests.Response:
+    """
+    Sends a GET through the shared session (unless one is given), waiting for
+    the host's rate limiter first. Rate-limited responses (429/503) are
+    retried after their `Retry-After` (or an increasing back-off), during
+    which all other requests to the host are held back as well. The final
+    response is returned as is, it is up to the caller to check its status.
+
+    With `max_rate_limit_wait`, `RateLimitExceeded` is raised instead of
+    waiting longer than that for the rate limiter or a `Retry-After`.
+    """
+    # Creating the shared session also registers the default rate limits.
+    shared_session = get_session()
+    session = session or shared_session
+    limiter = _rate_limiters.get(urlparse(url).hostname)
+
+    for attempt in range(max_rate_limit_retries + 1):
+        if limiter is not None:
+            limiter.acquire(max_wait=max_rate_limit_wait)
+
+        response = session.get(url, headers={} if headers is None else headers, timeout=timeout, stream=stream)
+
+        if response.status_code not in _RATE_LIMITED_STATUSES or attempt == max_rate_limit_retries:
+            return response
+
+        delay = _retry_after(response.headers)
+        delay = delay if delay is not None else 2 ** attempt
+        response.close()
+        _check_rate_limit_wait(url, delay, max_rate_limit_wait, limiter)
+
+        if logger is not None:
+            logger.warning(f'Rate limited by {url} ({response.status_code}), retrying in {delay:.1f}s.')
+
+        if limiter is not None:
+            limiter.block_for(delay)
+        time.sleep(delay)
+
+
+_async_sessions: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, aiohttp.ClientSession]' = \
+    weakref.WeakKeyDictionary()
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """The keep-alive aiohttp session of the running event loop."""
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+
+    if session is None or session.closed:
+        session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=MAX_ASYNC_CONNECTIONS))
+        _async_sessions[loop] = session
+
+    return session
+
+
+async def async_http_get(
+        url: str,
+        headers: dict = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        max_rate_limit_retries: int = 5,
+        logger: logging.Logger = None,
+        max_rate_limit_wait: Optional[float] = None) -> aiohttp.ClientResponse:
+    """
+    The asyncio counterpart of `http_get`, sharing its per-host rate limiters.
+    The body is read before returning, so `json()`/`text()` can be awaited
+    on the response without holding on to the connection.
+    """
+    # Creating the shared session also registers the default rate limits.
+    get_session()
+    session = get_async_session()
+    limiter = _rate_limiters.get(urlparse(url).hostname)
+
+    for attempt in range(max_rate_limit_retries + 1):
+        if limiter is not None:
+            await limiter.acquire_async(max_wait=max_rate_limit_wait)
+
+        response = await session.get(url, headers={} if headers is None else headers,
+                                     timeout=aiohttp.ClientTimeout(total=timeout))
+        try:
+            await response.read()
+        finally:
+            response.release()
+
+        if response.status not in _RATE_LIMITED_STATUSES or attempt == max_rate_limit_retries:
+            return response
+
+        delay = _retry_after(response.headers)
+        delay = delay if delay is not None else 2 ** attempt
+        _check_rate_limit_wait(url, delay, max_rate_limit_wait, limiter)
+
+        if logger is not None:
+            logger.warning(f'Rate limited by {url} ({response.status}), retrying in {delay:.1f}s.')
+
+        if limiter is not None:
+            limiter.block_for(delay)
+        await asyncio.sleep(delay)
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_pid: Optional[int] = None
+_loop_lock = threading.Lock()
+
+
+def run_sync(coroutine: Awaitable[T]) -> T:
+    """
+    Runs a coroutine on the process-wide background event loop and blocks
+    until it finishes. This is what the sync apis of the async layers wrap,
+    so the loop (with its http and database pools) is shared by all threads.
+    It must not be called from the background loop itself.
+    """
+    global _loop, _loop_pid
+
+    with _loop_lock:
+        # A forked worker (e.g., celery prefork) does not inherit the loop thread.
+        if _loop is None or _loop_pid != os.getpid():
+            _loop = asyncio.new_event_loop()
+            _loop_pid = os.getpid()
+            threading.Thread(target=_loop.run_forever, name='background-event-loop', daemon=True).start()
+
+        loop = _loop
+
+    return asyncio.run_coroutine_threadsafe(coroutine, loop).result()
+
+
+def _check_rate_limit_wait(url: str, delay: float, max_wait: Optional[float], limiter: Optional[TokenBucket]):
+    """Raises `RateLimitExceeded` if the host asked to wait longer than the caller allows."""
+    if max_wait is None or delay <= max_wait:
+        return
+
+    # The other requests to the host are still held back for the delay.
+    if limiter is not None:
+        limiter.block_for(delay)
+    raise RateLimitExceeded(f'Rate limited by {url}, which asked to retry in {delay:.1f}s.')
+
+
+def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    value = headers.get('Retry-After')
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
 def make_request(
         session: requests.Session,
         url: str,
@@ -31,7 +307,7 @@ def make_request(
         timeout=10) -> requests.Response:
     for attempt in range(max_retries):
         try:
-            response = session.get(url, timeout=timeout, headers={} if headers is None else headers)
+            response = http_get(url, headers=headers, timeout=timeout, session=session, logger=logger)
             response.raise_for_status()
             return response
         except requests.RequestException as e: